@@ -2,24 +2,126 @@
 from .system_runner import Runner
 from .logger import Logger
 from .sytemd_service_installer import ServiceInstaller
+from .config import MountsConfig, ConfigError
+from .supervisor import Supervisor
+from .mount_table import MountTable
+from .ssh_control import SshControl
+from . import sshfs_options
+from .bench import MountBenchmark, measure_startup
+from .binaries import BinaryResolver
+from . import metrics
+from .reconcile import Reconciler, Action, installed_units
+from .users import RemoteUser, load_users, provision_script, parse_results
+from .stats import MountStats
+from .foreground import ForegroundSupervisor
+from . import control
+from .precheck import TcpPrecheck, DnsCache
+from .replicas import (ReplicaSelector, replica_servers, remote_devices, parse_replica, set_active_replica, main_servername,
+                       policies as replica_policies)
 import re
 import os
+import sys
+import threading
+import json
 import time
 import argparse
 import getpass
+import hashlib
 
 runner = Runner()
+# asyncio is imported only for batch mounts, see async_command_runner
+async_runner = None
 logger = Logger()
+mount_table = None
+mount_table_lock = threading.Lock()
+ssh_control = SshControl(control_persist='no')
+binaries = None
+precheck = None
 
 path_pattern = r"^((~?/?|(\./)?)([a-zA-Z0-9_.\-]+/?)+)$"
+host_pattern = (r"^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$|"
+    r"(?:(?:[a-zA-Z0-9](?:[a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,6}\.?|[a-zA-Z0-9](?:[a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)$")
+user_pattern = r"^[a-zA-Z0-9_][a-zA-Z0-9_.\-]*\$?$"
 
 scriptname="ssh_mounter"
 
-def init_logger(log_path):
+default_ssh_key_path = '~/.ssh/id_rsa'
+default_new_key_path = '~/.ssh/id_ed25519'
+default_key_type = 'ed25519'
+default_log_path = f'/var/log/{scriptname}.log'
+default_service_period = 60
+default_probe_timeout = 5
+default_max_backoff = 600
+default_idle_timeout = 300
+default_jobs = 8
+default_host_jobs = 2
+default_control_persist = '10m'
+default_precheck_timeout = 1.0
+default_dns_ttl = 60
+default_failback_after = 300
+# max time of ssh and sshfs started by service loop, stalled handshake must not block other mounts
+default_command_timeout = 60
+
+def init_logger(log_path, args=None):
     global logger
     global runner
-    logger = Logger(log_path)
+    global async_runner
+    if args is None:
+        logger = Logger(log_path)
+    else:
+        logger = Logger(log_path,
+                        max_bytes=int(args.log_max_size * 1024 * 1024),
+                        backup_count=args.log_backups,
+                        rotate_when=args.log_rotate or '',
+                        json_format=args.log_json,
+                        # console of interactive run shows every error
+                        repeat_interval=args.log_repeat_interval if is_service_mode(args) else None)
     runner = Runner(logger)
+    async_runner = None
+
+def is_service_mode(args):
+    return bool(getattr(args, 'period', None) or getattr(args, 'supervise', None))
+
+def log_rotate_when(value):
+    """
+    argparse type of --log-rotate, the same values as at logging.handlers.TimedRotatingFileHandler
+    """
+    if not re.match(r'^([SMHD]|MIDNIGHT|W[0-6])$', value.upper()):
+        raise argparse.ArgumentTypeError(f"invalid value {value}, use S, M, H, D, midnight or W0-W6")
+    return value
+
+def log_options_line(args):
+    line = f" --log-max-size {args.log_max_size} --log-backups {args.log_backups} --log-repeat-interval {args.log_repeat_interval}"
+    if args.log_rotate: line += f" --log-rotate {args.log_rotate}"
+    if args.log_json: line += " --log-json"
+    return line
+
+def init_ssh_control(control_persist):
+    global ssh_control
+    ssh_control = SshControl(control_persist, external_logger=logger)
+
+def init_precheck(args):
+    global precheck
+    # precheck with zero timeout checks nothing, replicas are then chosen by order
+    precheck = TcpPrecheck(timeout=max(args.precheck_timeout, 0), dns_cache=DnsCache(ttl=args.dns_ttl))
+
+def precheck_server(args):
+    '''
+    Returns False if server does not accept connections, checked without start of ssh process,
+    True if precheck is not initialized, e.g. for bench
+    '''
+    if precheck is None:
+        return True
+    options = sshfs_options.build_options(getattr(args, 'profile', 'default'), getattr(args, 'sshfs_options', None))
+    port = sshfs_options.option_value(options, 'port')
+    reachable, reason = precheck.check(args.servername, int(port) if port and port.isdigit() else None)
+    if not reachable:
+        logger.error(reason)
+    return reachable
+
+def ssh_options():
+    options = ssh_control.options()
+    return f'{options} ' if options else ''
 
 def input_username():
     user = input("Enter remote username: ").strip()
@@ -76,48 +178,129 @@ def check_and_create_directory(args):
         logger.error(f"Local mount directory '{args.local_path}' was not created.")
         exit(1)
 
+def binary_resolver():
+    global binaries
+    if binaries is None:
+        binaries = BinaryResolver()
+    return binaries
+
+def async_command_runner():
+    global async_runner
+    if async_runner is None:
+        from .async_runner import AsyncRunner
+        async_runner = AsyncRunner(logger)
+    return async_runner
+
 def is_package_installed(package):
     try:
-        package_installed = runner.run(f"which {package}", silent=True)
-        if package_installed == 0: 
-            return True
-        else:
-            return False
+        return binary_resolver().find(package) is not None
     except Exception as e:
         logger.error(f"Error during check {package} installed.")
         exit(1)
 
-def mount_sshfs(args):
+def require_packages(*packages):
+    for package in packages:
+        if not is_package_installed(package):
+            logger.error(f'Error: {package} is not installed. Please install it first. Example: apt install {package}')
+            exit(1)
+
+def sshfs_options_line(args):
+    options = sshfs_options.build_options(args.profile, args.sshfs_options)
     if args.ssh_key_path:
-        cmd = f"sshfs -o IdentityFile={args.ssh_key_path} {args.username}@{args.servername}:{args.remote_path} {args.local_path}"
-    else:
-        cmd = f"sshfs {args.username}@{args.servername}:{args.remote_path} {args.local_path}"
+        options = [f'IdentityFile={args.ssh_key_path}'] + options
+    return ''.join(f'-o {option} ' for option in options)
+
+def sshfs_command(args):
+    return f"sshfs {sshfs_options_line(args)}{args.username}@{args.servername}:{args.remote_path} {args.local_path}"
+
+def mount_sshfs(args, exit_on_err: bool = True):
+    cmd = sshfs_command(args)
+    if not precheck_server(args):
+        logger.error(f"Not mounted {args.username}@{args.servername}:{args.remote_path} to {args.local_path}")
+        if exit_on_err: exit(1)
+        return False
 
     try:
-        result_mount = runner.run(cmd)
+        result_mount = runner.run(cmd, timeout=None if exit_on_err else default_command_timeout)
         if result_mount == 0:
             logger.log(f"Mounted {args.username}@{args.servername}:{args.remote_path} to {args.local_path}")
+            return True
         else:
             logger.error(f"Not mounted {args.username}@{args.servername}:{args.remote_path} to {args.local_path}")
-            exit(1)
+            if exit_on_err: exit(1)
     except Exception as e:
         logger.error("Error during mounting. Please ensure sshfs is installed and SSH keys are set up correctly.")
-        exit(1)
+        if exit_on_err: exit(1)
+    return False
 
-def test_ssh_connection(args):
+async def mount_sshfs_async(args):
+    """
+    The same as mount_sshfs with exit_on_err False, sshfs runs at event loop without shell
+    """
+    import asyncio
+    remote_device = f"{args.username}@{args.servername}:{args.remote_path}"
+    if not await asyncio.get_running_loop().run_in_executor(None, precheck_server, args):
+        logger.error(f"Not mounted {remote_device} to {args.local_path}")
+        return False
+    if await async_command_runner().run(sshfs_command(args), timeout=default_command_timeout) == 0:
+        logger.log(f"Mounted {remote_device} to {args.local_path}")
+        return True
+    logger.error(f"Not mounted {remote_device} to {args.local_path}")
+    return False
+
+def fusermount_binary():
+    """
+    Returns fusermount3 of fuse3 hosts or fusermount of fuse2 hosts
+    """
+    for name in ('fusermount3', 'fusermount'):
+        if binary_resolver().find(name):
+            return name
+    return 'fusermount'
+
+def unmount_sshfs(local_path, lazy: bool = False):
+    lazy_flag = 'z' if lazy else ''
+    result_unmount = runner.run(f"{fusermount_binary()} -u{lazy_flag} {local_path}")
+    if result_unmount == 0:
+        logger.log(f"Unmounted {local_path}")
+        return True
+    logger.error(f"Not unmounted {local_path}")
+    return False
+
+def ssh_test_command(args):
     if args.ssh_key_path:
-        cmd = f'ssh -o BatchMode=yes {args.username}@{args.servername} -i {args.ssh_key_path} exit'
-    else:
-        cmd = f'ssh -o BatchMode=yes {args.username}@{args.servername} exit'
+        return f'ssh {ssh_options()}-o BatchMode=yes {args.username}@{args.servername} -i {args.ssh_key_path} exit'
+    return f'ssh {ssh_options()}-o BatchMode=yes {args.username}@{args.servername} exit'
+
+def test_ssh_connection(args, exit_on_err: bool = True):
+    if not precheck_server(args):
+        return False
+    cmd = ssh_test_command(args)
     try:
-        result_ssh = runner.run(cmd)
+        started = time.monotonic()
+        result_ssh = runner.run(cmd, timeout=None if exit_on_err else default_command_timeout)
+        metrics.registry.observe('ssh_mounter_ssh_test_duration_seconds', time.monotonic() - started,
+                                 {'server': args.servername})
         if result_ssh == 0:
             return True
         else:
             return False
     except Exception as e:
         logger.error("Error during test ssh connection. Please ensure ssh is installed and SSH keys are set up correctly.")
-        exit(1)
+        if exit_on_err: exit(1)
+        return False
+
+async def test_ssh_connection_async(args):
+    """
+    The same as test_ssh_connection with exit_on_err False, ssh runs at event loop without shell
+    """
+    import asyncio
+    if not await asyncio.get_running_loop().run_in_executor(None, precheck_server, args):
+        return False
+    started = time.monotonic()
+    result_ssh = await async_command_runner().run(ssh_test_command(args), timeout=default_command_timeout)
+    metrics.registry.observe('ssh_mounter_ssh_test_duration_seconds', time.monotonic() - started,
+                             {'server': args.servername})
+    return result_ssh == 0
 
 
 
@@ -140,7 +323,12 @@ def validate_args(args, parser):
         if not validate:
             display_error_with_args("Invalid log path", args, parser)
             exit(1)
-        init_logger(args.log_path)
+        init_logger(args.log_path, args)
+
+    for option in args.sshfs_options:
+        if not sshfs_options.validate_option(option):
+            display_error_with_args(f"Invalid sshfs option {option}", args, parser)
+            exit(1)
 
     if args.quiet_mode and args.create_remote:
         display_error_with_args("Can't use simultaneously -c -q parameters", args, parser)
@@ -154,8 +342,6 @@ def validate_args(args, parser):
             display_error_with_args("Invalid username", args, parser)
             exit(1)
 
-    host_pattern = (r"^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$|"
-        r"(?:(?:[a-zA-Z0-9](?:[a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,6}\.?|[a-zA-Z0-9](?:[a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)$")
     if not args.servername and not args.quiet_mode:
         args.servername = input_host("Enter remote host (e.g. cloud.server.com or 192.168.0.20): ", host_pattern)
     else: 
@@ -163,6 +349,14 @@ def validate_args(args, parser):
         if not validate:
             display_error_with_args("Invalid hostname or IP address", args, parser)
             exit(1)
+    for replica in args.replicas:
+        try:
+            replica_servername, _ = parse_replica(replica)
+        except ValueError:
+            replica_servername = ''
+        if not validate_input(replica_servername, host_pattern):
+            display_error_with_args(f"Invalid replica {replica}", args, parser)
+            exit(1)
     if not args.remote_path and not args.quiet_mode:
         args.remote_path = input_path(f"Enter remote path (e.g. /home/{args.username}): ", path_pattern)
     else:
@@ -194,30 +388,36 @@ def display_error_with_args(error_message, args, parser):
         print('')
         parser.print_help()
 
-def is_path_mounted(local_path):
+def shared_mount_table():
+    """
+    Returns mount table of process, created at first call, safe for call from many threads
+    """
+    global mount_table
+    with mount_table_lock:
+        if mount_table is None:
+            mount_table = MountTable()
+        return mount_table
+
+def is_path_mounted(local_path, exit_on_err: bool = True):
     """
     Check if at mount path somthing already mounted
 
     Args:
         local_path (str): local mount point
-        remote_path (str): remote device
     
     Returns:
         mounted_device or False if it is not busy
     """
     try:
-        with open("/proc/mounts", "r") as f:
-            mounts = f.readlines()
-        for mount in mounts:
-            parts = mount.split()
-            mounted_path = parts[1]
-            mounted_device = parts[0]
-            if mounted_path == local_path:
-                return mounted_device
-        return False
+        table = shared_mount_table()
+        # table is re-read on kernel change event, only one thread must read event and table
+        with mount_table_lock:
+            mounted_device = table.get(local_path)
+        return mounted_device if mounted_device else False
     except Exception as e:
         logger.error(f"Error checking mount status: {e}")
-        exit(1)
+        if exit_on_err: exit(1)
+        return False
 
 def input_remote_user_password(args):
     remote_user_password = getpass.getpass(f'Input remote user {args.username} password length > 4: ')
@@ -226,27 +426,46 @@ def input_remote_user_password(args):
         remote_user_password = getpass.getpass(f'Input remote user {args.username} password length > 4: ')
     return remote_user_password
 
-def create_remote_user(args):
+def provision_remote_users(remote_admin, servername, users):
+    """
+    Create users at server through one admin ssh session, script and passwords are sent through stdin.
+    Returns dict username -> status, see users.parse_results
+    """
+    script = provision_script(users, sudo=remote_admin != 'root')
+    output = []
+    cmd = f'ssh {ssh_options()}{remote_admin}@{servername} sh -s'
+    try:
+        runner.run(cmd, silent=True, input=script, output=output, interactive=True)
+    except Exception as e:
+        logger.error(f"Error during creating remote users at {servername}: {e}")
+    results = parse_results(output, users)
+    for username, status in results.items():
+        message = f'User {username} at {servername}: {status}'
+        if status in ('created', 'exists'):
+            logger.log(message)
+        else:
+            logger.error(message)
+    return results
+
+def input_remote_admin():
     default_admin = 'root'
     remote_admin = input(f'Input remote admin username (default: {default_admin}): ').strip()
     if not remote_admin: remote_admin = default_admin
+    return remote_admin
+
+def create_remote_user(args):
+    remote_admin = input_remote_admin()
 
     if len(args.create_remote) < 5:
         args.create_remote = input_remote_user_password(args)
 
-    if remote_admin == default_admin:
-        cmd = f'ssh {remote_admin}@{args.servername} \'useradd -m {args.username} && echo "{args.username}:{args.create_remote}" | chpasswd && exit \''
-    else:
-        cmd = f'ssh {remote_admin}@{args.servername} \'sudo useradd -m {args.username} && echo "{args.username}:{args.create_remote}" | sudo chpasswd && exit \''
-    try:
-        result_ssh = runner.run(cmd)
-        if result_ssh == 0:
-            logger.log(f'User {args.username} with password {args.create_remote} successfully created at {args.servername}')
-    except Exception as e:
+    results = provision_remote_users(remote_admin, args.servername, [RemoteUser(args.username, args.create_remote)])
+    if results[args.username] not in ('created', 'exists'):
         logger.error("Error during creating remote user. Please ensure that credentials set up correctly.")
         exit(1)
 
 def create_and_install_ssh_key(args):
+    require_packages('ssh-keygen', 'ssh-copy-id')
     args.ssh_key_path = create_ssh_key(args)
     if args.ssh_key_path:
         install_key_to_server(args)
@@ -254,7 +473,7 @@ def create_and_install_ssh_key(args):
 def create_ssh_key(args):
     create_ssh_key = input("Would you like to create local SSH keyfile for connect without password? (yes/no, default yes): ").strip().lower()
     if create_ssh_key == 'yes' or create_ssh_key == '':
-        keypath = '~/.ssh/id_rsa'
+        keypath = default_new_key_path
         new_keypath = input(f"Input key path and name? (e.g. ~/.ssh/{args.username}, default: {keypath}): ").strip()
         if not new_keypath: new_keypath = keypath
         while not validate_input(new_keypath, path_pattern): 
@@ -262,7 +481,7 @@ def create_ssh_key(args):
             if not new_keypath: new_keypath = keypath
         try:
             if new_keypath: keypath = new_keypath
-            cmd = f'ssh-keygen -f {keypath} -q -P ""'
+            cmd = f'ssh-keygen -t {default_key_type} -f {keypath} -q -P ""'
             create_result = runner.run(cmd)
             if create_result == 0:
                 logger.log(f'Created keyfile at {keypath}')
@@ -302,43 +521,312 @@ def install_key_to_server(args):
         logger.error(f'Error while install keyfile {args.ssh_key_path} to {args.username}@{args.servername}')
         exit(1)
 
-    cmd = f'ssh-copy-id -i {args.ssh_key_path}.pub {args.username}@{args.servername}'
+    cmd = f'ssh-copy-id {ssh_options()}-i {args.ssh_key_path}.pub {args.username}@{args.servername}'
     try:
-        install_key_result = runner.run(cmd)
+        install_key_result = runner.run(cmd, interactive=True)
         if install_key_result != 0:
             error_install()
     except Exception as e:
         error_install()
 
 
-def check_mounted_path(args):
-    remote_device = f'{args.username}@{args.servername}:{args.remote_path}'
-    result = is_path_mounted(args.local_path)
+def check_mounted_path(args, exit_on_err: bool = True):
+    """
+    Returns True if remote device or any its replica mounted to local path, False if local path is free
+    and None if local path busy by other device and exit_on_err is False.
+    If replica is mounted, args.servername is set to it.
+    """
+    result = is_path_mounted(args.local_path, exit_on_err)
     if not result: return False
-    if remote_device in result:
+    devices = remote_devices(args)
+    if result in devices:
+        set_active_replica(args, devices[result])
         return True
-    elif result:
-        logger.error(f"{result} already mounted to {args.local_path}")
-        exit(1)
+    for remote_device, servername in devices.items():
+        if remote_device in result:
+            set_active_replica(args, servername)
+            return True
+    logger.error(f"{result} already mounted to {args.local_path}")
+    if exit_on_err: exit(1)
+    return None
 
-def install_or_remove_service(args, default_service_period):
-    period = args.period if args.period is not None else default_service_period
+def choose_replica(args):
+    """
+    Set args.servername to the fastest answering replica, if args has replicas
+    """
+    servers = replica_servers(args)
+    if len(servers) < 2:
+        return
+    selector = ReplicaSelector(servers, args.replica_policy, args.failback_after,
+                               precheck=precheck, external_logger=logger)
+    servername = selector.choose()
+    if servername is None:
+        logger.error(f'No replica of {args.remote_path} answers: {", ".join(name for name, _ in servers)}')
+    elif servername != args.servername:
+        logger.log(f'Use replica {servername} for {args.remote_path}')
+        set_active_replica(args, servername)
+
+def automount_units(args, installer):
+    """
+    Returns dict unit file name -> content of .mount and .automount units for args
+    """
+    local_path = os.path.abspath(os.path.expanduser(args.local_path))
+    unit_name = installer.unit_name_from_path(local_path)
+    servername = main_servername(args)
+    if len(replica_servers(args)) > 1:
+        logger.error(f"Automount units of {local_path} mount only {servername}, "
+                     f"replicas {', '.join(args.replicas)} are used only by service or --supervise")
+    options = sshfs_options.build_options(args.profile, args.sshfs_options)
+    if args.ssh_key_path:
+        options = [f'IdentityFile={os.path.abspath(os.path.expanduser(args.ssh_key_path))}'] + options
+    # mount starts without terminal, so ssh must not ask anything
+    options.append('BatchMode=yes')
+    description = f'Mount remote path {args.remote_path} to local {local_path}'
+    mount_content = installer.prepare_mount(
+        what=f'{args.username}@{servername}:{args.remote_path}',
+        where=local_path,
+        options=options,
+        description=description,
+    )
+    automount_content = installer.prepare_automount(
+        where=local_path,
+        description=description,
+        idle_timeout=args.idle_timeout,
+    )
+    return {f'{unit_name}.mount': mount_content, f'{unit_name}.automount': automount_content}
+
+def install_or_remove_automount(args):
+    installer = ServiceInstaller(quiet_mode=args.quiet_mode,external_logger=logger)
+    unit_name = installer.unit_name_from_path(os.path.abspath(os.path.expanduser(args.local_path)))
+
+    if args.install_service:
+        logger.log('Prepare mount and automount units...')
+        units = automount_units(args, installer)
+        if installer.install_automount(unit_name, units[f'{unit_name}.mount'], units[f'{unit_name}.automount']):
+            logger.log(f'Units {unit_name}.mount and {unit_name}.automount installed successfully')
+
+    if args.delete_service:
+        if installer.remove_automount(unit_name):
+            logger.log(f'Units {unit_name}.mount and {unit_name}.automount removed successfully')
+
+def legacy_mount_service_name(args):
     replaced_slash = args.remote_path.replace('/', '-')
     whithout_first = replaced_slash[1:]
-    service_name = f'{whithout_first}@ssh-mounter'
+    return f'{whithout_first}@ssh-mounter'
+
+def mount_service_name(args):
+    """
+    Returns service name from server and remote path with hash of full mount definition,
+    e.g. remote-server.com-home-username-1a2b3c4d@ssh-mounter,
+    so the same remote path from other server or to other local path gets other service
+    """
+    servername = main_servername(args)
+    readable = re.sub(r'[^a-zA-Z0-9_.\-]+', '-', f'{servername}{args.remote_path}').strip('-')
+    definition = f'{args.username}@{servername}:{args.remote_path} {os.path.abspath(os.path.expanduser(args.local_path))}'
+    return f'{readable}-{hashlib.sha1(definition.encode("utf-8")).hexdigest()[:8]}@ssh-mounter'
+
+def config_service_args(args, mount_args, config):
+    """
+    Returns args of generated service for config mount: command line options overridden by mount values,
+    period of mount, else -p, else config period
+    """
+    service_args = argparse.Namespace(**{**vars(args), **vars(mount_args)})
+    if getattr(mount_args, 'period', None) is None:
+        service_args.period = args.period if args.period else config.period
+    service_args.period = f'{float(service_args.period):g}'
+    return service_args
+
+def mount_service_content(args, default_service_period, installer):
+    period = args.period if args.period is not None else default_service_period
+    # current_path = os.path.dirname(os.path.abspath(__file__)) # todo delete
+    # current_path = os.path.expanduser('~/.local/bin/ssh-mounter') # todo delete
+    current_path = 'ssh-mounter'
+    script_path = (current_path + f" -u {args.username} -s {main_servername(args)}" +
+                f" -r {args.remote_path} -m {args.local_path} -l -p {period} -q -k {args.ssh_key_path}" +
+            f" --probe-timeout {args.probe_timeout} --max-backoff {args.max_backoff}" +
+            f" --control-persist {args.control_persist}" + (" --foreground" if args.foreground else "") +
+            f" --precheck-timeout {args.precheck_timeout} --dns-ttl {args.dns_ttl}" +
+            ''.join(f" --replica {replica}" for replica in args.replicas) +
+            f" --replica-policy {args.replica_policy} --failback-after {args.failback_after}" +
+            f" --profile {args.profile}" + ''.join(f" -o {option}" for option in args.sshfs_options) +
+            metrics_options_line(args) + log_options_line(args))
+    return installer.prepare(
+        service_name=mount_service_name(args),
+        script_path=script_path,
+        description=f'Mount remote path {args.remote_path} to local {args.local_path}',
+        start_after='network.target auditd.service',
+        restart_always=True,
+    )
+
+def install_or_remove_service(args, default_service_period):
+    if args.automount:
+        install_or_remove_automount(args)
+        return
+    service_name = mount_service_name(args)
     installer = ServiceInstaller(quiet_mode=args.quiet_mode,external_logger=logger)
 
     if args.install_service:
-        # current_path = os.path.dirname(os.path.abspath(__file__)) # todo delete
-        # current_path = os.path.expanduser('~/.local/bin/ssh-mounter') # todo delete
-        current_path = 'ssh-mounter'
-        script_path = (current_path + f" -u {args.username} -s {args.servername}" +
-                    f" -r {args.remote_path} -m {args.local_path} -l -p {period} -q -k {args.ssh_key_path}")
+        logger.log('Prepare service...')
+        service_content = mount_service_content(args, default_service_period, installer)
+        if installer.install(service_name, service_content):
+            logger.log(f'Service {service_name}.service installed successfully')
+            installer.start(service_name)
+
+    if args.delete_service:
+        if (not os.path.exists(f'/etc/systemd/system/{service_name}.service') and
+                os.path.exists(f'/etc/systemd/system/{legacy_mount_service_name(args)}.service')):
+            # service installed by previous version
+            service_name = legacy_mount_service_name(args)
+        if installer.remove(service_name):
+            logger.log(f'Service {service_name}.service removed successfully')
+
+def install_or_remove_services(args, default_service_period):
+    """
+    Install or remove one service, or automount units, for each mount from config file
+    with one daemon-reload
+    """
+    if args.metrics_port or args.metrics_textfile:
+        logger.error("Metrics options can't be shared by many services, use --supervise for metrics")
+        exit(1)
+    config = load_supervise_config(args.services, default_service_period)
+    installer = ServiceInstaller(quiet_mode=args.quiet_mode,external_logger=logger)
+    units = {}
+    for mount_args in config.mounts:
+        mount_args = config_service_args(args, mount_args, config)
+        if args.automount:
+            units.update(automount_units(mount_args, installer))
+        else:
+            units[f'{mount_service_name(mount_args)}.service'] = mount_service_content(mount_args, default_service_period, installer)
+
+    if args.install_service:
+        if installer.install_many(units):
+            logger.log(f'{len(units)} units from {config.path} installed successfully')
+            return True
+    if args.delete_service:
+        if installer.remove_many(list(units)):
+            logger.log(f'{len(units)} units from {config.path} removed successfully')
+            return True
+    return False
+
+def init_metrics(args):
+    metrics.registry.textfile_path = args.metrics_textfile or ''
+    if args.metrics_port:
+        try:
+            metrics.registry.serve(args.metrics_port, args.metrics_address)
+            logger.log(f"Metrics available at http://{args.metrics_address}:{args.metrics_port}/metrics")
+        except OSError as e:
+            logger.error(f"Error during start metrics server at {args.metrics_address}:{args.metrics_port}: {e}")
+            exit(1)
+
+def metrics_options_line(args):
+    line = ''
+    if args.metrics_port: line += f" --metrics-port {args.metrics_port} --metrics-address {args.metrics_address}"
+    if args.metrics_textfile: line += f" --metrics-textfile {args.metrics_textfile}"
+    return line
+
+def validate_supervise_args(args, parser):
+    if args.install_service and args.delete_service:
+        display_error_with_args("Can't use simultaneously -i -d parameters", args, parser)
+        exit(1)
+
+    if args.period and not str(args.period).isdigit():
+        display_error_with_args("Invalid period", args, parser)
+        exit(1)
+
+    if args.log_path:
+        validate = validate_input(args.log_path, path_pattern)
+        if not validate:
+            display_error_with_args("Invalid log path", args, parser)
+            exit(1)
+        init_logger(args.log_path, args)
+
+def is_valid_period(period):
+    if period is None:
+        return True
+    try:
+        return float(period) > 0
+    except (TypeError, ValueError):
+        return False
+
+def is_valid_replica(replica):
+    try:
+        replica_servername, _ = parse_replica(replica)
+    except ValueError:
+        return False
+    return validate_input(replica_servername, host_pattern)
+
+def read_supervise_config(config_path, default_service_period):
+    """
+    Returns MountsConfig, raises ConfigError if config or any mount is invalid
+    """
+    config = MountsConfig(config_path, default_period=default_service_period)
+    for mount_args in config.mounts:
+        if (not validate_input(str(mount_args.username), user_pattern) or
+                not validate_input(mount_args.servername, host_pattern) or
+                not validate_input(mount_args.remote_path, path_pattern) or
+                not validate_input(mount_args.local_path, path_pattern) or
+                (mount_args.ssh_key_path and not validate_input(str(mount_args.ssh_key_path), path_pattern)) or
+                not all(is_valid_replica(replica) for replica in getattr(mount_args, 'replicas', None) or []) or
+                not is_valid_period(getattr(mount_args, 'period', None)) or
+                mount_args.profile not in sshfs_options.PROFILES or
+                not all(sshfs_options.validate_option(option) for option in mount_args.sshfs_options)):
+            raise ConfigError(f"Invalid mount {mount_args.username}@{mount_args.servername}:{mount_args.remote_path} "
+                              f"to {mount_args.local_path} in {config.path}")
+    local_paths = [os.path.abspath(os.path.expanduser(mount_args.local_path)) for mount_args in config.mounts]
+    duplicates = sorted(set(local_path for local_path in local_paths if local_paths.count(local_path) > 1))
+    if duplicates:
+        raise ConfigError(f"Config {config.path} has many mounts to the same local path: {', '.join(duplicates)}")
+    return config
+
+def load_supervise_config(config_path, default_service_period):
+    try:
+        return read_supervise_config(config_path, default_service_period)
+    except ConfigError as e:
+        logger.error(str(e))
+        exit(1)
+
+def mount_batch(args, mounts):
+    from .batch import BatchMounter
+    batch = BatchMounter(check_mounted_path, mount_sshfs_async, test_ssh_connection_async, prepare=choose_replica,
+                         max_workers=args.jobs, max_per_host=args.host_jobs, external_logger=logger)
+    results = batch.run(mounts)
+    return all(result.ok for result in results)
+
+def supervise(args, default_service_period):
+    config = load_supervise_config(args.supervise, default_service_period)
+    period = float(args.period) if args.period else config.period
+    control_name = 'supervise-' + os.path.splitext(os.path.basename(config.path))[0]
+    if args.foreground:
+        ForegroundSupervisor(config.mounts, sshfs_command, check_mounted_path, unmount_sshfs, period,
+                             precheck=precheck_server, probe_timeout=args.probe_timeout, max_backoff=args.max_backoff,
+                             control_name=control_name, external_logger=logger).run()
+    else:
+        mount_batch(args, config.mounts)
+        supervisor = Supervisor(config.mounts, check_mounted_path, mount_sshfs, unmount_sshfs, period,
+                                probe_timeout=args.probe_timeout, max_backoff=args.max_backoff,
+                                precheck=precheck, control_name=control_name,
+                                reload=lambda: read_supervise_config(config.path, default_service_period).mounts,
+                                external_logger=logger)
+        supervisor.run()
+
+def install_or_remove_supervisor_service(args, default_service_period):
+    config = load_supervise_config(args.supervise, default_service_period)
+    config_name = os.path.splitext(os.path.basename(config.path))[0]
+    service_name = f'{config_name}@ssh-mounter-supervisor'
+    installer = ServiceInstaller(quiet_mode=args.quiet_mode,external_logger=logger)
+
+    if args.install_service:
+        script_path = (f"ssh-mounter --supervise {config.path} -l -q --jobs {args.jobs} --host-jobs {args.host_jobs}" +
+                       f" --control-persist {args.control_persist}" + metrics_options_line(args) + log_options_line(args))
+        if args.period: script_path += f" -p {args.period}"
+        if args.foreground: script_path += " --foreground"
+        script_path += f" --probe-timeout {args.probe_timeout} --max-backoff {args.max_backoff}"
+        script_path += f" --precheck-timeout {args.precheck_timeout} --dns-ttl {args.dns_ttl}"
         logger.log('Prepare service...')
         service_content = installer.prepare(
             service_name=service_name,
             script_path=script_path,
-            description=f'Mount remote path {args.remote_path} to local {args.local_path}',
+            description=f'Supervise {len(config.mounts)} remote mounts from {config.path}',
             start_after='network.target auditd.service',
             restart_always=True,
         )
@@ -350,17 +838,306 @@ def install_or_remove_service(args, default_service_period):
         if installer.remove(service_name):
             logger.log(f'Service {service_name}.service removed successfully')
 
-def main():
-    default_ssh_key_path = '~/.ssh/id_rsa'
-    default_log_path = f'/var/log/{scriptname}.log'
-    default_service_period = 60
+def bench_main(argv):
+    parser = argparse.ArgumentParser(prog="ssh-mounter bench",
+                                     description="Measure throughput and latency of mounted path, print results as JSON." +
+                                     "\nCompare profiles: ssh-mounter bench -u username -s remote-server.com -r /data -m /mnt/bench --profiles default,throughput")
+    parser.add_argument("-m", "--local-path", help="Mounted path for benchmark")
+    parser.add_argument("-u", "--username", help="Username for SSH connection, required for --profiles")
+    parser.add_argument("-s", "--servername", help="Server hostname or IP address, required for --profiles")
+    parser.add_argument("-r", "--remote-path", help="Remote path, required for --profiles")
+    parser.add_argument("-k", "--ssh-key-path", default='~/.ssh/id_rsa', help="SSH key path for connecting")
+    parser.add_argument("-o", "--sshfs-option", dest="sshfs_options", action="append", default=[], metavar="OPTION",
+                        help="Raw sshfs option added to every profile")
+    parser.add_argument("--profiles",
+                        help=f"Comma separated profiles for compare, mount remote path under each profile, e.g. {','.join(sshfs_options.PROFILES)}")
+    parser.add_argument("--size", type=int, default=64, help="Sequential read and write file size in MB, default 64")
+    parser.add_argument("--files", type=int, default=200, help="Number of small files, default 200")
+    parser.add_argument("--startup", action="store_true",
+                        help="Measure ssh-mounter start time instead of mount, exit with error if median is above --max-ms")
+    parser.add_argument("--runs", type=int, default=10, help="Number of starts for --startup, default 10")
+    parser.add_argument("--max-ms", type=float, help="Max allowed median start time in milliseconds for --startup")
+    parser.add_argument("--output", help="Write JSON results to file instead of stdout")
+    parser.add_argument("-l", "--log-path", help="Enable log and set log path")
+    args = parser.parse_args(argv)
+    args.quiet_mode = True
+    if args.log_path: init_logger(args.log_path)
 
-    required_packages = [ 'ssh', 'ssh-keygen', 'sshfs', 'ssh-copy-id']
-    for package in required_packages:
-        if not is_package_installed(package):
-            logger.error(f'Error: {package} is not installed. Please install it first. Example: apt install {package}')
+    if args.startup:
+        results = measure_startup(args.runs)
+        print_bench_results(results, args.output)
+        if args.max_ms is not None and results['median_ms'] > args.max_ms:
+            logger.error(f"Start time {results['median_ms']} ms is above {args.max_ms} ms")
             exit(1)
-    
+        return
+
+    if not args.local_path:
+        parser.error("the following arguments are required: -m/--local-path")
+
+    def bench(profile=None):
+        benchmark = MountBenchmark(args.local_path, size_mb=args.size, files=args.files, external_logger=logger)
+        result = benchmark.run()
+        if profile: result['profile'] = profile
+        return result
+
+    for option in args.sshfs_options:
+        if not sshfs_options.validate_option(option):
+            logger.error(f"Invalid sshfs option {option}")
+            exit(1)
+
+    if not args.profiles:
+        try:
+            results = bench()
+        except Exception as e:
+            logger.error(f"Benchmark error: {e}")
+            exit(1)
+    else:
+        profiles = [profile.strip() for profile in args.profiles.split(',') if profile.strip()]
+        for profile in profiles:
+            if profile not in sshfs_options.PROFILES:
+                logger.error(f"Unknown profile {profile}")
+                exit(1)
+        if not args.username or not args.servername or not args.remote_path:
+            logger.error("--profiles requires -u, -s and -r")
+            exit(1)
+        require_packages('sshfs')
+        if is_path_mounted(args.local_path):
+            logger.error(f"{args.local_path} already mounted, use free path for compare profiles")
+            exit(1)
+        results = []
+        for profile in profiles:
+            args.profile = profile
+            if not mount_sshfs(args, exit_on_err=False):
+                results.append({'profile': profile, 'error': 'mount failed'})
+                continue
+            try:
+                results.append(bench(profile))
+            except Exception as e:
+                results.append({'profile': profile, 'error': str(e)})
+            finally:
+                unmount_sshfs(args.local_path)
+
+    print_bench_results(results, args.output)
+
+def print_bench_results(results, output_path=''):
+    output = json.dumps(results, indent=2)
+    if output_path:
+        with open(output_path, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+def apply_main(argv):
+    parser = argparse.ArgumentParser(prog="ssh-mounter apply",
+                                     description="Make live mounts and installed services equal to config file, " +
+                                     "do only missing mounts, unmounts, unit installs and removals. " +
+                                     "Other ssh-mounter options, e.g. -p or --profile, are used for generated services.")
+    parser.add_argument("config", help="Config file with mounts, e.g. /etc/ssh-mounter/mounts.yaml")
+    parser.add_argument("--units", action="store_true",
+                        help="Also install one service for each mount and remove other *@ssh-mounter services, services mount paths")
+    parser.add_argument("--prune", action="store_true", help="Unmount sshfs mounts, which are not in config")
+    parser.add_argument("--dry-run", action="store_true", help="Print planned actions as JSON and exit")
+    apply_args, other_argv = parser.parse_known_args(argv)
+    args = build_parser().parse_args(other_argv)
+    args.quiet_mode = True
+    if args.log_path:
+        validate_supervise_args(args, parser)
+    init_precheck(args)
+    config = load_supervise_config(apply_args.config, default_service_period)
+
+    desired_units = None
+    current_units = None
+    if apply_args.units:
+        installer = ServiceInstaller(quiet_mode=True, external_logger=logger)
+        desired_units = {}
+        for mount_args in config.mounts:
+            mount_args = config_service_args(args, mount_args, config)
+            desired_units[f'{mount_service_name(mount_args)}.service'] = mount_service_content(mount_args, default_service_period, installer)
+        current_units = installed_units()
+
+    actions = Reconciler(shared_mount_table()).plan(config.mounts, desired_units, current_units, prune=apply_args.prune)
+    if apply_args.dry_run:
+        print(json.dumps([action.as_dict() for action in actions], indent=2))
+        return
+    if not actions:
+        logger.log(f'Nothing to do, mounts are equal to {config.path}')
+        return
+
+    ok = True
+    for action in actions:
+        if action.kind == Action.conflict:
+            logger.error(str(action))
+            ok = False
+    installer = ServiceInstaller(quiet_mode=True, external_logger=logger)
+    # services of removed units are stopped first, so they don't mount unmounted paths again
+    to_remove = [action.target for action in actions if action.kind == Action.remove_unit]
+    if to_remove:
+        ok = installer.remove_many(to_remove) and ok
+    for action in actions:
+        if action.kind == Action.unmount:
+            logger.log(str(action))
+            ok = unmount_sshfs(action.target) and ok
+    to_install = {action.target: action.content for action in actions if action.kind == Action.install_unit}
+    if to_install:
+        ok = installer.install_many(to_install) and ok
+    to_mount = [action.args for action in actions if action.kind == Action.mount]
+    if to_mount:
+        require_packages('ssh', 'sshfs')
+        for mount_args in to_mount:
+            if not os.path.exists(os.path.expanduser(mount_args.local_path)):
+                os.makedirs(os.path.expanduser(mount_args.local_path))
+                logger.log(f"Directory '{mount_args.local_path}' created successfully!")
+        ok = mount_batch(args, to_mount) and ok
+    if not ok:
+        exit(1)
+
+def users_main(argv):
+    parser = argparse.ArgumentParser(prog="ssh-mounter users",
+                                     description="Create many remote users through one admin ssh session. " +
+                                     "Passwords are sent through ssh stdin, they are never at command line and logs.")
+    parser.add_argument("users", help="Users list, .csv with username,password lines or .yaml list of username and password")
+    parser.add_argument("-s", "--servername", required=True, help="Remote server")
+    parser.add_argument("-a", "--admin", default='',
+                        help="Remote admin username, by default asked, not root admin needs sudo without password")
+    parser.add_argument("--output", default='', help="Write per-user results as JSON to file instead of stdout")
+    users_args = parser.parse_args(argv)
+    if not validate_input(users_args.servername, host_pattern):
+        logger.error(f'Invalid server name {users_args.servername}')
+        exit(1)
+    try:
+        users = load_users(users_args.users)
+    except ConfigError as e:
+        logger.error(str(e))
+        exit(1)
+    require_packages('ssh')
+    remote_admin = users_args.admin or input_remote_admin()
+    logger.log(f'Create {len(users)} users at {users_args.servername} as {remote_admin}')
+    results = provision_remote_users(remote_admin, users_args.servername, users)
+    output = json.dumps([{'username': username, 'status': status} for username, status in results.items()], indent=2)
+    if users_args.output:
+        with open(users_args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if any(status not in ('created', 'exists') for status in results.values()):
+        exit(1)
+
+def keys_main(argv):
+    parser = argparse.ArgumentParser(prog="ssh-mounter keys",
+                                     description="Create or reuse one SSH key and install it to many servers at once without prompts. " +
+                                     "Servers, which already accept the key, are skipped.")
+    parser.add_argument("targets", nargs='*', help="Targets for key, e.g. username@remote-server.com")
+    parser.add_argument("-f", "--targets-file", default='', help="File with username@server targets, one at line")
+    parser.add_argument("-k", "--ssh-key-path", default=default_new_key_path,
+                        help=f'SSH key path, created if it does not exist, default value "{default_new_key_path}"')
+    parser.add_argument("-t", "--key-type", default=default_key_type, help=f'Type of new key, default value "{default_key_type}"')
+    parser.add_argument("--jobs", type=int, default=16, help="Max number of servers in progress, default value 16")
+    parser.add_argument("--timeout", type=float, default=10, help="SSH connect timeout in seconds, default value 10")
+    parser.add_argument("--password-env", default='',
+                        help="Name of environment variable with password for servers without key, e.g. SSH_MOUNTER_PASSWORD, " +
+                        "requires OpenSSH 8.4 or later, by default only already working authentication is used")
+    parser.add_argument("--accept-new-host-keys", action="store_true", help="Add host keys of unknown servers to known_hosts")
+    parser.add_argument("--output", default='', help="Write per-target results as JSON to file instead of stdout")
+    keys_args = parser.parse_args(argv)
+
+    targets = list(keys_args.targets)
+    if keys_args.targets_file:
+        if not os.path.exists(keys_args.targets_file):
+            error_file_not_exist(keys_args.targets_file)
+        with open(keys_args.targets_file, 'r') as f:
+            targets += [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+    if not targets:
+        parser.error('at least one target or --targets-file is required')
+    for target in targets:
+        username, _, servername = target.rpartition('@')
+        if not username or not validate_input(servername, host_pattern):
+            logger.error(f'Invalid target {target}, use username@remote-server.com')
+            exit(1)
+    require_packages('ssh', 'ssh-keygen', 'ssh-copy-id')
+    from .keys import KeyDistributor, ensure_keypair
+    if not ensure_keypair(keys_args.ssh_key_path, keys_args.key_type, runner):
+        logger.error(f'Error while create keyfile at {keys_args.ssh_key_path}')
+        exit(1)
+
+    distributor = KeyDistributor(keys_args.ssh_key_path, jobs=keys_args.jobs, timeout=keys_args.timeout,
+                                 password_env=keys_args.password_env,
+                                 accept_new_host_keys=keys_args.accept_new_host_keys, external_logger=logger)
+    try:
+        results = distributor.run(targets)
+    except ValueError as e:
+        logger.error(str(e))
+        exit(1)
+    output = json.dumps([{'target': target, 'status': status} for target, status in results.items()], indent=2)
+    if keys_args.output:
+        with open(keys_args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if 'failed' in results.values():
+        exit(1)
+
+def stats_main(argv):
+    parser = argparse.ArgumentParser(prog="ssh-mounter stats",
+                                     description="Show read and write rates of sshfs mounts as JSON, the most loaded mount first. " +
+                                     "Rates are I/O of sshfs process, so both directions of FUSE and ssh traffic are counted.")
+    parser.add_argument("local_paths", nargs='*', help="Mount points, by default all sshfs mounts")
+    parser.add_argument("--window", type=float, default=1.0, help="Sampling window in seconds, default value 1")
+    parser.add_argument("--watch", action="store_true", help="Print rates for each window as JSON line until interrupted")
+    stats_args = parser.parse_args(argv)
+    if stats_args.window <= 0:
+        parser.error('--window must be positive')
+    mount_stats = MountStats()
+    try:
+        while True:
+            rates = mount_stats.rates(stats_args.window, stats_args.local_paths)
+            if not stats_args.watch:
+                print(json.dumps(rates, indent=2))
+                break
+            print(json.dumps({'time': round(time.time(), 3), 'mounts': rates}), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+def status_main(argv):
+    parser = argparse.ArgumentParser(prog="ssh-mounter status",
+                                     description="Show state of all running ssh-mounter services (-p and --supervise) as JSON " +
+                                     "through their control sockets, or send command to them.")
+    command = parser.add_mutually_exclusive_group()
+    command.add_argument("--remount", metavar="LOCAL_PATH", help="Mount path again at once, use all for all paths")
+    command.add_argument("--unmount", metavar="LOCAL_PATH", help="Unmount path and stop its checks until --remount")
+    command.add_argument("--reload", action="store_true", help="Read config of --supervise services again")
+    parser.add_argument("--lazy", action="store_true", help="Lazy unmount for --unmount")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Max wait for answer of each service in seconds, default value 1")
+    status_args = parser.parse_args(argv)
+    request = {'command': 'status'}
+    if status_args.remount:
+        request = {'command': 'remount'}
+        if status_args.remount != 'all':
+            request['local_path'] = os.path.abspath(os.path.expanduser(status_args.remount))
+    elif status_args.unmount:
+        request = {'command': 'unmount', 'local_path': os.path.abspath(os.path.expanduser(status_args.unmount)),
+                   'lazy': status_args.lazy}
+    elif status_args.reload:
+        request = {'command': 'reload'}
+    answers = control.query_all(request, timeout=status_args.timeout)
+    if request.get('local_path'):
+        # other services answer, that path is not their
+        managed = {path: answer for path, answer in answers.items() if answer is None or answer.get('managed', True)}
+        answers = managed or answers
+    print(json.dumps([{'socket': path, **(answer if answer is not None else {'ok': False, 'error': 'no answer'})}
+                      for path, answer in answers.items()], indent=2))
+    if any(answer is None or not answer.get('ok') for answer in answers.values()):
+        exit(1)
+
+subcommands = {
+    'bench': bench_main,
+    'apply': apply_main,
+    'users': users_main,
+    'keys': keys_main,
+    'stats': stats_main,
+    'status': status_main,
+}
+
+def build_parser():
     parser = argparse.ArgumentParser(description="SSHFS mount utility." + 
                                      "\nBase usage: ssh-mounter -u username -c StrongUserPassword -s remote-server.com -r /home/username -m /mnt/local_path -l")
     parser.add_argument("-u", "--username", help="Username for SSH connection")
@@ -378,6 +1155,26 @@ def main():
                         nargs="?",
                         const=default_log_path
                         )
+    parser.add_argument("--log-max-size",
+                        type=float,
+                        default=10,
+                        help="Rotate log file at size in MB, 0 disables rotation by size, default 10")
+    parser.add_argument("--log-backups",
+                        type=int,
+                        default=5,
+                        help="Number of rotated log files, default 5")
+    parser.add_argument("--log-rotate",
+                        metavar="WHEN",
+                        type=log_rotate_when,
+                        help="Rotate log file by time instead of size, e.g. midnight, H, D")
+    parser.add_argument("--log-json",
+                        action="store_true",
+                        help="Write log file lines as JSON objects")
+    parser.add_argument("--log-repeat-interval",
+                        type=float,
+                        default=60,
+                        help="Service (-p and --supervise) log file suppress identical errors repeated during interval in seconds, " +
+                        "0 disables, default 60")
     parser.add_argument("-c", "--create-remote", help="Create remote user in interactive mode. Input password for user with length > 4.")
     parser.add_argument("-q", "--quiet-mode", action="store_true", help="Quiet mode, disable interactive mode")
     parser.add_argument("-i", "--install-service", action="store_true", help="Install service for automounting remote path throught this script")
@@ -386,23 +1183,153 @@ def main():
                         nargs="?",
                         const=default_service_period,
                         help=f"Service check period in seconds, default {default_service_period} seconds")
-    
+    parser.add_argument("--probe-timeout",
+                        type=float,
+                        default=default_probe_timeout,
+                        help=f"Service max wait time in seconds for mounted path answer, default {default_probe_timeout} seconds")
+    parser.add_argument("--foreground",
+                        action="store_true",
+                        help="With -p or --supervise run sshfs as child process and mount again right after its exit, " +
+                        "without waiting of period, period is min time between mounts of the same path")
+    parser.add_argument("--automount",
+                        action="store_true",
+                        help="With -i or -d install or remove systemd .mount and .automount units instead of service, " +
+                        "remote path mounted on first access and unmounted when idle")
+    parser.add_argument("--idle-timeout",
+                        type=int,
+                        default=default_idle_timeout,
+                        help=f"Unmount automount path after idle seconds, 0 disables, default {default_idle_timeout}")
+    parser.add_argument("--replica",
+                        dest="replicas",
+                        action="append",
+                        default=[],
+                        metavar="SERVER[:WEIGHT]",
+                        help="Other server with the same remote path, can be repeated. Mount is done from the best answering server " +
+                        "and moved to other server, when active server is down")
+    parser.add_argument("--replica-policy",
+                        choices=replica_policies,
+                        default='rtt',
+                        help="Choose replica with the lowest TCP handshake time divided by weight (rtt) " +
+                        "or the first answering server in order -s, --replica (order), default rtt")
+    parser.add_argument("--failback-after",
+                        type=float,
+                        default=default_failback_after,
+                        help="Move mount back to better replica only after it stays better during seconds, " +
+                        f"failed replica is skipped during the same time, default {default_failback_after}")
+    parser.add_argument("--max-backoff",
+                        type=float,
+                        default=default_max_backoff,
+                        help=f"Service max delay between retries of failed mount in seconds, default {default_max_backoff} seconds")
+    parser.add_argument("--metrics-port",
+                        type=int,
+                        help="Service export Prometheus metrics at http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-address",
+                        default='127.0.0.1',
+                        help="Service metrics listen address, default 127.0.0.1")
+    parser.add_argument("--metrics-textfile",
+                        help="Service write Prometheus metrics to file for node_exporter textfile collector, e.g. /var/lib/node_exporter/ssh_mounter.prom")
+    parser.add_argument("--supervise",
+                        metavar="CONFIG",
+                        help="Mount and watch all remote paths from config file in one process, e.g. /etc/ssh-mounter/mounts.toml")
+    parser.add_argument("--services",
+                        metavar="CONFIG",
+                        help="With -i or -d install or remove one service (or automount units with --automount) " +
+                        "for each mount from config file with one systemd reload")
+    parser.add_argument("--batch",
+                        metavar="CONFIG",
+                        help="Mount all remote paths from config file concurrently, print report and exit")
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=default_jobs,
+                        help=f"Max concurrent mounts for --batch and --supervise startup, default {default_jobs}")
+    parser.add_argument("--host-jobs",
+                        type=int,
+                        default=default_host_jobs,
+                        help=f"Max concurrent mounts to one server for --batch and --supervise startup, default {default_host_jobs}")
+    parser.add_argument("--control-persist",
+                        default=default_control_persist,
+                        help=f"Keep shared ssh connection to server open after last command, e.g. 30s, 10m, or no for disable sharing, default {default_control_persist}")
+    parser.add_argument("--precheck-timeout",
+                        type=float,
+                        default=default_precheck_timeout,
+                        help="Max time in seconds of TCP connect to server port 22 before start of ssh or sshfs, " +
+                        f"down server is skipped without process start, 0 disables check, default {default_precheck_timeout}")
+    parser.add_argument("--dns-ttl",
+                        type=float,
+                        default=default_dns_ttl,
+                        help=f"Keep resolved server addresses for precheck for seconds, default {default_dns_ttl}")
+    parser.add_argument("--profile",
+                        choices=list(sshfs_options.PROFILES),
+                        default='default',
+                        help="sshfs tuning profile: " + "; ".join(
+                            f"{name}: {', '.join(options) or 'sshfs defaults'}" for name, options in sshfs_options.PROFILES.items()))
+    parser.add_argument("-o", "--sshfs-option",
+                        dest="sshfs_options",
+                        action="append",
+                        default=[],
+                        metavar="OPTION",
+                        help="Raw sshfs option, overrides profile option with the same name, e.g. -o max_conns=8. Can be repeated")
+    return parser
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in subcommands:
+        subcommands[sys.argv[1]](sys.argv[2:])
+        exit(0)
+
+    parser = build_parser()
     args = parser.parse_args()
+    init_ssh_control(args.control_persist)
+    init_precheck(args)
+
+    if args.services:
+        validate_supervise_args(args, parser)
+        if not args.install_service and not args.delete_service:
+            display_error_with_args("--services requires -i or -d", args, parser)
+            exit(1)
+        exit(0 if install_or_remove_services(args, default_service_period) else 1)
+
+    if args.batch:
+        validate_supervise_args(args, parser)
+        config = load_supervise_config(args.batch, default_service_period)
+        require_packages('ssh', 'sshfs')
+        exit(0 if mount_batch(args, config.mounts) else 1)
+
+    if args.supervise:
+        validate_supervise_args(args, parser)
+        if args.install_service or args.delete_service:
+            install_or_remove_supervisor_service(args, default_service_period)
+            exit(0)
+        require_packages('ssh', 'sshfs')
+        init_metrics(args)
+        supervise(args, default_service_period)
+
     validate_args(args, parser)
 
     service_install_params = True if args.install_service or args.delete_service else False
 
     if args.period and not service_install_params:
-        period = float(args.period)
-        while True:
-            if not check_mounted_path(args):
-                mount_sshfs(args)
-            time.sleep(period)
+        require_packages('sshfs')
+        init_metrics(args)
+        if args.foreground:
+            check_and_create_directory(args)
+            ForegroundSupervisor([args], sshfs_command, check_mounted_path, unmount_sshfs, float(args.period),
+                                 precheck=precheck_server, probe_timeout=args.probe_timeout, max_backoff=args.max_backoff,
+                                 control_name=os.path.abspath(os.path.expanduser(args.local_path)),
+                                 external_logger=logger).run()
+        else:
+            supervisor = Supervisor([args], check_mounted_path, mount_sshfs, unmount_sshfs, float(args.period),
+                                    probe_timeout=args.probe_timeout, max_backoff=args.max_backoff,
+                                    precheck=precheck, control_name=os.path.abspath(os.path.expanduser(args.local_path)),
+                                    external_logger=logger)
+            supervisor.run()
 
     if service_install_params:
         install_or_remove_service(args, default_service_period)
         exit(0)
 
+    require_packages('ssh', 'sshfs')
+
+    choose_replica(args)
     if check_mounted_path(args):
         remote_device = f'{args.username}@{args.servername}:{args.remote_path}'
         logger.log(f"{remote_device} already mounted to {args.local_path}")
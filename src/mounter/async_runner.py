@@ -0,0 +1,124 @@
+import asyncio
+import os
+import shlex
+import subprocess
+import time
+from .logger import Logger
+from . import metrics
+from .system_runner import Runner
+
+
+class _ExitProtocol(asyncio.subprocess.SubprocessStreamProtocol):
+    # Process.wait() also waits for closing of pipes, that can be kept open by background children,
+    # so exit signals separately
+    def __init__(self, loop):
+        super().__init__(limit=2 ** 16, loop=loop)
+        self.exited = loop.create_future()
+
+    def process_exited(self):
+        super().process_exited()
+        if not self.exited.done():
+            self.exited.set_result(True)
+
+
+class AsyncRunner:
+    """ Run commands at asyncio event loop without shell, e.g.
+
+        runner = AsyncRunner(logger)
+        codes = loop.run_until_complete(runner.run_many([['ssh', 'host', 'exit'], 'systemctl is-active sshd']))
+
+    Logging and exclude_errors work the same as at Runner.run
+    """
+    output_grace_period = Runner.output_grace_period
+
+    def __init__(self, external_logger: Logger = ''):
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+
+    async def _read_stdout(self, stream, silent):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            if not silent: self.__logger.log(">>> {}".format(line.rstrip().decode('utf-8', 'replace')))
+
+    async def _read_stderr(self, stream, exclude_errors):
+        while True:
+            err = await stream.readline()
+            if not err:
+                break
+            error_message: str = err.rstrip().decode('utf-8', 'replace')
+            show_err = True
+            for word in exclude_errors:
+                if error_message.find(word) >= 0:
+                    show_err = False
+            if show_err:
+                self.__logger.error(">>> {}".format(error_message))
+
+    async def run(self, command, exclude_errors: list = [], silent = False, exit_on_err: bool = False, timeout: float = None,
+                  env: dict = None):
+        """ Run command without shell
+        Get
+            command: list of arguments or str, str splits by shell rules and leading ~ of arguments is expanded,
+                but runs without shell
+            exclude_errors: list, exclude array list of errors to output in logger
+            timeout: float, kill command after timeout in seconds, by default wait forever
+            env: dict, environment variables added to current environment
+        Return error status Int. Cancel of task kills command.
+        """
+        if isinstance(command, str):
+            argv = [os.path.expanduser(arg) if arg.startswith('~') else arg for arg in shlex.split(command)]
+        else:
+            argv = list(command)
+        command_line = ' '.join(shlex.quote(arg) for arg in argv)
+        if not silent: self.__logger.log("Run command: " + command_line)
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.subprocess_exec(
+            lambda: _ExitProtocol(loop), *argv, stdin=None, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            env={**os.environ, **env} if env else None)
+        readers = [
+            asyncio.ensure_future(self._read_stdout(protocol.stdout, silent)),
+            asyncio.ensure_future(self._read_stderr(protocol.stderr, exclude_errors)),
+        ]
+        try:
+            try:
+                await asyncio.wait_for(asyncio.shield(protocol.exited), timeout)
+            except asyncio.TimeoutError:
+                self.__logger.error("Command timeout after {} seconds: {}".format(timeout, command_line))
+                transport.kill()
+                await protocol.exited
+            return_code = transport.get_returncode()
+            metrics.registry.observe('ssh_mounter_command_duration_seconds', time.monotonic() - started,
+                                     {'command': argv[0] if argv else ''})
+            await asyncio.wait(readers, timeout=self.output_grace_period)
+        except asyncio.CancelledError:
+            if transport.get_returncode() is None:
+                transport.kill()
+            raise
+        finally:
+            for reader in readers:
+                reader.cancel()
+            transport.close()
+
+        if not silent: self.__logger.log("Return code {}".format(return_code))
+        if exit_on_err and return_code != 0: exit(1)
+        return return_code
+
+    async def run_many(self, commands: list, limit: int = 16, **kwargs):
+        """ Run commands concurrently
+        Get
+            commands: list of commands for run
+            limit: max number of commands running at the same time
+            kwargs: arguments for run
+        Return list of error statuses at the same order as commands
+        """
+        semaphore = asyncio.Semaphore(max(1, limit))
+
+        async def run_limited(command):
+            async with semaphore:
+                return await self.run(command, **kwargs)
+
+        return await asyncio.gather(*[run_limited(command) for command in commands])
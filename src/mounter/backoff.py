@@ -0,0 +1,91 @@
+import random
+import time
+
+
+class Backoff():
+    '''
+    Exponential backoff with jitter between retries of one operation.
+    Args:
+        base: delay after first failure in seconds
+        max_delay: max delay in seconds
+    '''
+    def __init__(self, base: float = 5, max_delay: float = 600) -> None:
+        self.base = base
+        self.max_delay = max_delay
+        self.failures = 0
+        self.next_attempt = 0.0
+
+    def ready(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        return now >= self.next_attempt
+
+    def remaining(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.next_attempt - now)
+
+    def failure(self, now: float = None):
+        '''
+        Register failure and schedule next attempt.
+        Returns delay before next attempt in seconds
+        '''
+        now = time.monotonic() if now is None else now
+        delay = min(self.max_delay, self.base * 2 ** self.failures)
+        # equal jitter: keep half of delay, randomize other half, so many hosts don't retry at the same moment
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self.failures += 1
+        self.next_attempt = now + delay
+        return delay
+
+    def success(self):
+        self.failures = 0
+        self.next_attempt = 0.0
+
+
+class CircuitBreaker():
+    '''
+    Stop attempts to server after many failures in a row.
+    After reset_timeout one trial attempt allowed, success closes breaker, failure opens it again.
+    Args:
+        threshold: failures in a row for open breaker
+        reset_timeout: seconds before trial attempt
+    '''
+    closed = 'closed'
+    open = 'open'
+    half_open = 'half-open'
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 300) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = self.closed
+        self.opened_at = 0.0
+
+    def allow(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        if self.state == self.open and now - self.opened_at >= self.reset_timeout:
+            self.state = self.half_open
+            return True
+        return self.state == self.closed
+
+    def remaining(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        if self.state != self.open:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - now)
+
+    def success(self):
+        self.failures = 0
+        self.state = self.closed
+
+    def failure(self, now: float = None):
+        '''
+        Register failure.
+        Returns True if breaker opened by this failure
+        '''
+        now = time.monotonic() if now is None else now
+        self.failures += 1
+        if self.state == self.half_open or (self.state == self.closed and self.failures >= self.threshold):
+            self.state = self.open
+            self.opened_at = now
+            return True
+        return False
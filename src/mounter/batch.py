@@ -0,0 +1,121 @@
+import asyncio
+import time
+from .logger import Logger
+
+
+class BatchResult():
+    def __init__(self, args, status: str, duration: float) -> None:
+        self.args = args
+        self.status = status
+        self.duration = duration
+
+    @property
+    def ok(self):
+        return self.status in BatchMounter.ok_statuses
+
+    def __str__(self):
+        return (f'{self.args.username}@{self.args.servername}:{self.args.remote_path} -> {self.args.local_path}: '
+                f'{self.status} ({self.duration:.2f}s)')
+
+
+class BatchMounter():
+    '''
+    Test connections and mount many remote paths concurrently at one asyncio event loop.
+    Args:
+        check_mounted: function(args, exit_on_err) -> True if mounted, False if not mounted, None if path is busy
+        mount: async function(args) -> True if mounted
+        test_connection: async function(args) -> True if ssh connection works
+        prepare: function(args), e.g. choice of replica, done at executor thread before server limit is taken
+        max_workers: max number of mounts in progress
+        max_per_host: max number of mounts in progress to one server,
+            mounts waiting for server limit do not take place of other servers mounts
+    '''
+    ok_statuses = ('mounted', 'already mounted')
+
+    def __init__(self,
+                 check_mounted,
+                 mount,
+                 test_connection,
+                 prepare=None,
+                 max_workers: int = 8,
+                 max_per_host: int = 2,
+                 external_logger: Logger = '',
+                 ) -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self._check_mounted = check_mounted
+        self._mount = mount
+        self._test_connection = test_connection
+        self._prepare = prepare
+        self._max_workers = max(1, max_workers)
+        self._max_per_host = max(1, max_per_host)
+
+    async def _mount_one(self, args):
+        started = time.monotonic()
+        try:
+            status = await self._process(args)
+        except Exception as e:
+            self.__logger.error(f'Error during mount {args.local_path}: {e}')
+            status = 'error'
+        return BatchResult(args, status, time.monotonic() - started)
+
+    async def _process(self, args):
+        mounted = self._check_mounted(args, exit_on_err=False)
+        if mounted is None:
+            return 'path busy'
+        if mounted:
+            return 'already mounted'
+        if not await self._test_connection(args):
+            return 'connection failed'
+        if not await self._mount(args):
+            return 'mount failed'
+        return 'mounted'
+
+    async def mount_all(self, mounts: list):
+        '''
+        Returns list of BatchResult at the same order as mounts
+        '''
+        workers = asyncio.Semaphore(self._max_workers)
+        host_limits = {}
+
+        async def mount_limited(args):
+            if self._prepare is not None:
+                # server can be changed by prepare, so server limit is taken after it
+                async with workers:
+                    try:
+                        await asyncio.get_running_loop().run_in_executor(None, self._prepare, args)
+                    except Exception as e:
+                        self.__logger.error(f'Error during prepare of {args.local_path}: {e}')
+            host_limit = host_limits.setdefault(args.servername, asyncio.Semaphore(self._max_per_host))
+            # server limit first, so waiting mount does not hold worker
+            async with host_limit:
+                async with workers:
+                    return await self._mount_one(args)
+
+        return await asyncio.gather(*[mount_limited(args) for args in mounts])
+
+    def run(self, mounts: list):
+        '''
+        Mount all paths.
+        Args:
+            mounts: list of argparse.Namespace, e.g. MountsConfig.mounts
+        Returns list of BatchResult at the same order as mounts
+        '''
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(self.mount_all(mounts))
+        finally:
+            loop.close()
+        self.report(results)
+        return results
+
+    def report(self, results: list):
+        for result in results:
+            if result.ok:
+                self.__logger.log(str(result))
+            else:
+                self.__logger.error(str(result))
+        failed = len([result for result in results if not result.ok])
+        self.__logger.log(f'Batch finished: {len(results) - failed} ready, {failed} failed')
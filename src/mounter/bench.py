@@ -0,0 +1,138 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+from .logger import Logger
+
+
+class MountBenchmark():
+    '''
+    Measure throughput and latency of mounted path.
+    All test files are created at temporary directory inside mount and removed after run.
+    Args:
+        local_path: mount point
+        size_mb: size of file for sequential read and write test
+        files: number of files for small files and directory listing tests
+        block_size: read and write block size in bytes
+    '''
+    def __init__(self,
+                 local_path: str,
+                 size_mb: int = 64,
+                 files: int = 200,
+                 block_size: int = 1024 * 1024,
+                 external_logger: Logger = '',
+                 ) -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self.local_path = os.path.expanduser(local_path)
+        self.size = size_mb * 1024 * 1024
+        self.files = files
+        self.block_size = block_size
+        self._work_dir = os.path.join(self.local_path, f'.ssh-mounter-bench-{os.getpid()}')
+
+    def _megabytes_per_second(self, size, seconds):
+        return round(size / 1024 / 1024 / seconds, 2) if seconds > 0 else None
+
+    def sequential_write(self):
+        path = os.path.join(self._work_dir, 'sequential')
+        block = os.urandom(self.block_size)
+        started = time.monotonic()
+        with open(path, 'wb') as f:
+            written = 0
+            while written < self.size:
+                written += f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        return self._megabytes_per_second(written, time.monotonic() - started)
+
+    def sequential_read(self):
+        path = os.path.join(self._work_dir, 'sequential')
+        with open(path, 'rb') as f:
+            # best effort, don't measure local page cache
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            started = time.monotonic()
+            read = 0
+            while True:
+                block = f.read(self.block_size)
+                if not block:
+                    break
+                read += len(block)
+        return self._megabytes_per_second(read, time.monotonic() - started)
+
+    def small_files(self):
+        directory = os.path.join(self._work_dir, 'small')
+        os.makedirs(directory)
+        paths = [os.path.join(directory, f'file-{index}') for index in range(self.files)]
+        result = {}
+        started = time.monotonic()
+        for path in paths:
+            with open(path, 'wb') as f:
+                f.write(b'x')
+        result['create_per_second'] = self._rate(started)
+        started = time.monotonic()
+        for path in paths:
+            os.stat(path)
+        result['stat_per_second'] = self._rate(started)
+        listing = []
+        for _ in range(5):
+            started = time.monotonic()
+            os.listdir(directory)
+            listing.append(time.monotonic() - started)
+        result['listdir_latency_ms'] = round(min(listing) * 1000, 3)
+        started = time.monotonic()
+        for path in paths:
+            os.unlink(path)
+        result['unlink_per_second'] = self._rate(started)
+        os.rmdir(directory)
+        return result
+
+    def _rate(self, started):
+        seconds = time.monotonic() - started
+        return round(self.files / seconds, 2) if seconds > 0 else None
+
+    def run(self):
+        '''
+        Returns dict with results, e.g.
+            {"local_path": "/mnt/x", "write_mb_per_second": 95.1, "read_mb_per_second": 101.3,
+             "create_per_second": 210.5, "stat_per_second": 1800.0, "unlink_per_second": 300.2, "listdir_latency_ms": 4.1}
+        '''
+        if not os.path.ismount(self.local_path):
+            raise ValueError(f'{self.local_path} is not a mount point')
+        self.__logger.log(f'Benchmark {self.local_path}...')
+        os.makedirs(self._work_dir)
+        try:
+            result = {'local_path': self.local_path}
+            result['write_mb_per_second'] = self.sequential_write()
+            result['read_mb_per_second'] = self.sequential_read()
+            result.update(self.small_files())
+        finally:
+            shutil.rmtree(self._work_dir, ignore_errors=True)
+        return result
+
+
+def measure_startup(runs: int = 10, command: list = None):
+    '''
+    Measure start time of ssh-mounter, by default "python -m mounter -h".
+    Args:
+        runs: number of starts
+        command: command for start
+    Returns dict with min, median and max start time in milliseconds
+    '''
+    command = command or [sys.executable, '-m', 'mounter', '-h']
+    durations = []
+    for _ in range(max(1, runs)):
+        started = time.monotonic()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        durations.append((time.monotonic() - started) * 1000)
+    durations.sort()
+    return {
+        'command': ' '.join(command),
+        'runs': len(durations),
+        'min_ms': round(durations[0], 2),
+        'median_ms': round(durations[len(durations) // 2], 2),
+        'max_ms': round(durations[-1], 2),
+    }
@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+
+
+class BinaryResolver():
+    '''
+    Find executables in PATH without spawning "which".
+    Found paths stored at small state file and reused while PATH and binary mtime are the same.
+    Args:
+        state_path: state file path, by default /var/cache/ssh-mounter/binaries.json for root
+            or ~/.cache/ssh-mounter/binaries.json for other users
+    '''
+    def __init__(self, state_path: str = '') -> None:
+        self.state_path = state_path if state_path else self._default_state_path()
+        self._path_env = os.environ.get('PATH', os.defpath)
+        self._state = self._load()
+
+    def _default_state_path(self):
+        if os.geteuid() == 0:
+            cache_dir = '/var/cache/ssh-mounter'
+        else:
+            cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+            cache_dir = os.path.join(cache_home, 'ssh-mounter')
+        return os.path.join(cache_dir, 'binaries.json')
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            if state.get('path') == self._path_env and isinstance(state.get('binaries'), dict):
+                return state
+        except (OSError, ValueError):
+            pass
+        return {'path': self._path_env, 'binaries': {}}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            temp_path = f'{self.state_path}.{os.getpid()}'
+            with open(temp_path, 'w') as f:
+                json.dump(self._state, f)
+            os.replace(temp_path, self.state_path)
+        except OSError:
+            # cache is optional, next start resolves binaries again
+            pass
+
+    def _mtime(self, binary_path: str):
+        try:
+            return os.stat(binary_path).st_mtime
+        except OSError:
+            return None
+
+    def find(self, name: str):
+        '''
+        Args:
+            name: binary name, e.g. sshfs
+        Returns full path to binary or None if it is not installed
+        '''
+        cached = self._state['binaries'].get(name)
+        if cached and cached.get('mtime') is not None and self._mtime(cached['path']) == cached['mtime']:
+            return cached['path']
+        binary_path = shutil.which(name, path=self._path_env)
+        if binary_path:
+            self._state['binaries'][name] = {'path': binary_path, 'mtime': self._mtime(binary_path)}
+        else:
+            self._state['binaries'].pop(name, None)
+        self._save()
+        return binary_path
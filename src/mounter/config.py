@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+
+
+def _import_toml():
+    # imported only for TOML config, it is not needed at each start
+    try:
+        import tomllib
+        return tomllib
+    except ImportError:
+        pass
+    try:
+        import tomli
+        return tomli
+    except ImportError:
+        return None
+
+
+def _import_yaml():
+    try:
+        import yaml
+        return yaml
+    except ImportError:
+        return None
+
+
+class ConfigError(Exception):
+    pass
+
+
+class MountsConfig():
+    '''
+    Mount definitions loaded from a config file, e.g. /etc/ssh-mounter/mounts.toml
+
+        period = 60
+
+        [defaults]
+        ssh_key_path = "~/.ssh/id_rsa"
+
+        [[mount]]
+        username = "username"
+        servername = "remote-server.com"
+        remote_path = "/home/username"
+        local_path = "/mnt/local_path"
+        profile = "throughput"
+        sshfs_options = ["max_conns=8"]
+        replicas = ["replica1.remote-server.com", "replica2.remote-server.com:2"]
+
+    The same structure can be written in .json or .yaml (requires "PyYAML" package) file,
+    "mounts" can be used instead of "mount".
+
+    Every mount is returned as argparse.Namespace with the same fields as the command line arguments,
+    so it can be passed to the same functions as parsed args.
+    '''
+    required_keys = ['username', 'servername', 'remote_path', 'local_path']
+    default_values = {
+        'ssh_key_path': '~/.ssh/id_rsa',
+        'quiet_mode': True,
+        'profile': 'default',
+        'sshfs_options': [],
+        'replicas': [],
+        'replica_policy': 'rtt',
+        'failback_after': 300,
+    }
+
+    def __init__(self, config_path: str, default_period=60) -> None:
+        self.path = os.path.abspath(os.path.expanduser(config_path))
+        content = self._load(self.path)
+        if not isinstance(content, dict):
+            raise ConfigError(f'Config {self.path} must contain a table of settings')
+        self.period = float(content.get('period', default_period))
+        defaults = dict(self.default_values)
+        defaults.update(content.get('defaults', {}))
+        self.mounts = [self._to_args(index, mount, defaults)
+                       for index, mount in enumerate(content.get('mount', content.get('mounts', [])) or [])]
+        if not self.mounts:
+            raise ConfigError(f'Config {self.path} does not contain any [[mount]] definition')
+
+    def _load(self, config_path: str):
+        if not os.path.exists(config_path):
+            raise ConfigError(f'Config file {config_path} does not exist')
+        extension = os.path.splitext(config_path)[1].lower()
+        if extension == '.json':
+            with open(config_path, 'r') as f:
+                return json.load(f)
+        if extension in ('.yaml', '.yml'):
+            yaml = _import_yaml()
+            if yaml is None:
+                raise ConfigError('YAML config requires installed "PyYAML" package, or use .toml or .json config')
+            with open(config_path, 'r') as f:
+                try:
+                    return yaml.safe_load(f)
+                except yaml.YAMLError as e:
+                    raise ConfigError(f'Config {config_path} is not valid YAML: {e}')
+        _toml = _import_toml()
+        if _toml is None:
+            raise ConfigError('TOML config requires python 3.11 or installed "tomli" package, or use .json config')
+        with open(config_path, 'rb') as f:
+            try:
+                return _toml.load(f)
+            except _toml.TOMLDecodeError as e:
+                raise ConfigError(f'Config {config_path} is not valid TOML: {e}')
+
+    def _to_args(self, index: int, mount: dict, defaults: dict):
+        values = dict(defaults)
+        values.update(mount)
+        missing = [key for key in self.required_keys if not values.get(key)]
+        if missing:
+            raise ConfigError(f'Mount #{index + 1} in {self.path} missing required keys: {", ".join(missing)}')
+        return argparse.Namespace(**values)
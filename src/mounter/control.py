@@ -0,0 +1,203 @@
+import glob
+import hashlib
+import json
+import os
+import queue
+import re
+import socket
+import socketserver
+import threading
+from .logger import Logger
+
+default_control_dir = '/run/ssh-mounter/control'
+socket_suffix = '.sock'
+max_request_size = 65536
+
+
+def control_dirs(control_dir: str = default_control_dir):
+    '''
+    Returns control socket directories: system directory and user runtime directory
+    '''
+    dirs = [control_dir]
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir: dirs.append(os.path.join(runtime_dir, 'ssh-mounter', 'control'))
+    return dirs
+
+
+def normalize_path(path: str):
+    '''
+    Returns absolute path without trailing slash, e.g. "~/mnt/" -> "/home/username/mnt", for compare of paths
+    from client and config
+    '''
+    return os.path.abspath(os.path.expanduser(str(path)))
+
+
+def socket_name(name: str):
+    '''
+    Returns file name of control socket for instance name with hash of name, e.g. "/mnt/data" -> "mnt-data-1a2b3c4d.sock",
+    so "/mnt/a-b" and "/mnt/a/b" get other sockets
+    '''
+    readable = re.sub(r'[^a-zA-Z0-9_.\-]+', '-', name).strip('-')[:64]
+    return f'{readable}-{hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]}{socket_suffix}'
+
+
+class ControlServer():
+    '''
+    Unix socket for status and commands of running loop.
+    Request and answer are one JSON line, e.g. {"command": "status"} -> {"ok": true, "mounts": [...]}.
+    Status is answered from server thread, other commands are queued and done by loop at process call,
+    loop is woken through fileno, which must be registered at its poller.
+    Args:
+        name: instance name, used for socket file name
+        status: function() -> dict with instance state
+        commands: dict command -> function(request) -> dict, done at loop thread
+        control_dir: directory for socket, user runtime directory is used if it is not writable
+    '''
+    def __init__(self,
+                 name: str,
+                 status,
+                 commands: dict,
+                 control_dir: str = default_control_dir,
+                 external_logger: Logger = '',
+                 ) -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self._status = status
+        self._commands = commands
+        self._queue = queue.Queue()
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        self._server = None
+        self.path = None
+        for candidate in control_dirs(control_dir):
+            try:
+                os.makedirs(candidate, mode=0o700, exist_ok=True)
+                self.path = os.path.join(candidate, socket_name(name))
+                self._start(self.path)
+                break
+            except OSError as e:
+                self.__logger.error(f'Can not create control socket at {candidate}: {e}')
+                self.path = None
+
+    def _start(self, path: str):
+        if os.path.exists(path):
+            # socket of previous process, which is not running
+            if _request(path, {'command': 'status'}, timeout=0.5) is not None:
+                raise OSError(f'control socket {path} is used by other running process')
+            os.unlink(path)
+        control = self
+
+        class ControlHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline(max_request_size)
+                try:
+                    answer = control._handle(json.loads(line))
+                except ValueError:
+                    answer = {'ok': False, 'error': 'request must be one JSON line'}
+                self.wfile.write(json.dumps(answer).encode('utf-8') + b'\n')
+
+        self._server = socketserver.ThreadingUnixStreamServer(path, ControlHandler)
+        self._server.daemon_threads = True
+        os.chmod(path, 0o600)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def _handle(self, request):
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'request must be JSON object'}
+        command = request.get('command', 'status')
+        if command == 'status':
+            return {'ok': True, 'pid': os.getpid(), **self._status()}
+        if command not in self._commands:
+            return {'ok': False, 'error': f'unknown command {command}, use one of: status, {", ".join(self._commands)}'}
+        local_path = request.get('local_path')
+        if local_path:
+            local_paths = [normalize_path(mount['local_path']) for mount in self._status().get('mounts', [])]
+            if normalize_path(local_path) not in local_paths:
+                return {'ok': False, 'managed': False, 'error': f'{local_path} is not managed by this process'}
+        self._queue.put(request)
+        os.write(self._wake_write, b'x')
+        return {'ok': True, 'queued': command}
+
+    def fileno(self):
+        return self._wake_read
+
+    def process(self):
+        '''
+        Do queued commands, must be called from loop thread
+        '''
+        try:
+            os.read(self._wake_read, 4096)
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = self._commands[request['command']](request)
+                self.__logger.log(f"Control command {request['command']} done: {json.dumps(result)}")
+            except Exception as e:
+                self.__logger.error(f"Control command {request['command']} failed: {e}")
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class _Stale(Exception):
+    pass
+
+
+def _request(path: str, request: dict, timeout: float = 1.0, stale_error: bool = False):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            try:
+                client.connect(path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # socket file of killed process
+                if stale_error: raise _Stale()
+                return None
+            client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            answer = b''
+            while not answer.endswith(b'\n'):
+                chunk = client.recv(65536)
+                if not chunk:
+                    break
+                answer += chunk
+        return json.loads(answer)
+    except (OSError, ValueError):
+        return None
+
+
+def query_all(request: dict = None, timeout: float = 1.0, control_dir: str = default_control_dir):
+    '''
+    Send request to all local instances at the same time.
+    Returns dict socket path -> answer, answer is None if instance does not answer,
+    sockets of not running instances are skipped
+    '''
+    request = request or {'command': 'status'}
+    paths = []
+    for directory in control_dirs(control_dir):
+        paths += sorted(glob.glob(os.path.join(directory, '*' + socket_suffix)))
+    answers = {}
+
+    def query(path):
+        try:
+            answers[path] = _request(path, request, timeout, stale_error=True)
+        except _Stale:
+            pass
+
+    threads = [threading.Thread(target=query, args=(path,)) for path in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {path: answers[path] for path in paths if path in answers}
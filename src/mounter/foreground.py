@@ -0,0 +1,401 @@
+import collections
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from .logger import Logger
+from . import metrics
+from .backoff import Backoff, CircuitBreaker
+from .control import ControlServer, normalize_path
+from .prober import LivenessProber
+from .watcher import MountWatcher
+
+
+class ForegroundMount():
+    '''
+    State of one sshfs process, started with -f as child of ssh-mounter.
+    '''
+    def __init__(self, args, backoff: Backoff, stderr_lines: int = 20) -> None:
+        self.args = args
+        self.backoff = backoff
+        self.process = None
+        self.pidfd = None
+        self.started = None
+        self.last_start = None
+        self.started_at = None
+        self.exit_code = None
+        # sshfs of running child is seen at mount table
+        self.mounted = False
+        self.next_probe = None
+        # lines of the last child, each child gets new deque, so late lines of old child don't mix in
+        self.stderr_tail = collections.deque(maxlen=stderr_lines)
+        self.stderr_reader = None
+
+
+class ForegroundSupervisor():
+    '''
+    Run sshfs processes in foreground mode as children and mount again right after child exit.
+    Exit of child is waited through pidfd, without polling of mount table,
+    if pidfd is not supported, exit is signaled by waiting thread.
+    Mount is up only after sshfs of child is seen at mount table, then it is probed each period
+    and child of hung mount is stopped. Starts after failures are delayed by backoff,
+    servers with many failures in a row are paused by circuit breaker, the same as at Supervisor.
+    Args:
+        mounts: list of argparse.Namespace, e.g. MountsConfig.mounts
+        command: function(args) -> sshfs command line without -f
+        check_mounted: function(args, exit_on_err) -> True if mounted, False if not mounted, None if path is busy
+        unmount: function(local_path, lazy) -> True if unmounted, used for stale mount of exited child
+        period: min time between starts of one mount and time between probes in seconds
+        stderr_lines: number of last stderr lines of child, which are kept for diagnosis
+        precheck: function(args) -> False if server is down, then child is not started
+        probe_timeout: max time in seconds for mount root answer
+        max_backoff: max delay between starts after failures in seconds
+        breaker_threshold: failures in a row to one server before pause all mounts from this server
+        breaker_timeout: pause of server in seconds before trial start
+        control_name: name of control socket for status and remount, unmount commands, empty name disables socket
+    '''
+    def __init__(self,
+                 mounts: list,
+                 command,
+                 check_mounted,
+                 unmount,
+                 period: float = 60,
+                 stderr_lines: int = 20,
+                 precheck=None,
+                 probe_timeout: float = 5,
+                 max_backoff: float = 600,
+                 breaker_threshold: int = 5,
+                 breaker_timeout: float = 300,
+                 control_name: str = '',
+                 external_logger: Logger = '',
+                 ) -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self._command = command
+        self._check_mounted = check_mounted
+        self._unmount = unmount
+        self._period = period
+        self._precheck = precheck
+        self._breaker_threshold = breaker_threshold
+        self._breaker_timeout = breaker_timeout
+        self._breakers = {}
+        self.prober = LivenessProber(probe_timeout, external_logger=self.__logger)
+        self.mounts = [ForegroundMount(args, Backoff(min(5, period), max_backoff), stderr_lines) for args in mounts]
+        # wakes on mount table change, so started child is seen as mounted at once
+        self._watcher = MountWatcher(self.__logger)
+        # waiting threads write to pipe, if pidfd is not supported
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        self._watcher.register(self._wake_read)
+        # paths stopped by control command, they are not started until remount command
+        self._stopped = set()
+        self._control = None
+        if control_name:
+            self._control = ControlServer(control_name, lambda: {'period': self._period, 'mounts': self.status()},
+                                          {'remount': self._remount_command, 'unmount': self._unmount_command},
+                                          external_logger=self.__logger)
+            self._watcher.register(self._control.fileno())
+
+    def _remote_device(self, args):
+        return f'{args.username}@{args.servername}:{args.remote_path}'
+
+    def _labels(self, args):
+        return {'local_path': args.local_path, 'remote': self._remote_device(args)}
+
+    def _breaker(self, servername):
+        if servername not in self._breakers:
+            self._breakers[servername] = CircuitBreaker(self._breaker_threshold, self._breaker_timeout)
+        return self._breakers[servername]
+
+    def _read_stderr(self, tail, stream):
+        for line in iter(stream.readline, b''):
+            message = line.rstrip().decode('utf-8', 'replace')
+            tail.append(message)
+            self.__logger.error(f'>>> {message}')
+        stream.close()
+
+    def _wait_thread(self, process):
+        process.wait()
+        os.write(self._wake_write, b'x')
+
+    def _watch_exit(self, mount):
+        try:
+            mount.pidfd = os.pidfd_open(mount.process.pid)
+        except (AttributeError, OSError):
+            mount.pidfd = None
+        if mount.pidfd is not None:
+            self._watcher.register(mount.pidfd)
+        else:
+            threading.Thread(target=self._wait_thread, args=(mount.process,), daemon=True).start()
+
+    def _failure(self, mount, count_server: bool = True):
+        args = mount.args
+        delay = max(mount.backoff.failure(), mount.last_start + self._period - time.monotonic())
+        self.__logger.error(f'Retry {self._remote_device(args)} at {args.local_path} after {delay:.1f} seconds')
+        breaker = self._breaker(args.servername)
+        if count_server and breaker.failure():
+            self.__logger.error(f'Server {args.servername} failed {breaker.failures} times in a row, '
+                                f'pause mounts for {breaker.reset_timeout} seconds')
+
+    def start(self, mount):
+        '''
+        Start sshfs child for mount, stale mount of previous child is unmounted first.
+        Returns True if child started
+        '''
+        args = mount.args
+        mount.last_start = time.monotonic()
+        mounted = self._check_mounted(args, exit_on_err=False)
+        if mounted is None:
+            self.__logger.error(f'Path {args.local_path} is busy by other device')
+            self._failure(mount, count_server=False)
+            return False
+        if mounted and not self._unmount(args.local_path, lazy=True):
+            self._failure(mount, count_server=False)
+            return False
+        if self._precheck is not None and not self._precheck(args):
+            self._failure(mount)
+            return False
+        argv = shlex.split(self._command(args))
+        argv.insert(1, '-f')
+        self.__logger.log(f"Run command: {' '.join(shlex.quote(arg) for arg in argv)}")
+        metrics.registry.inc('ssh_mounter_remounts_total', self._labels(args))
+        try:
+            mount.process = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            self.__logger.error(f'Can not start sshfs for {args.local_path}: {e}')
+            metrics.registry.inc('ssh_mounter_mount_failures_total', self._labels(args))
+            self._failure(mount)
+            return False
+        mount.started = time.monotonic()
+        mount.started_at = time.time()
+        mount.mounted = False
+        mount.stderr_tail = collections.deque(maxlen=mount.stderr_tail.maxlen)
+        mount.stderr_reader = threading.Thread(target=self._read_stderr, args=(mount.stderr_tail, mount.process.stderr),
+                                               daemon=True)
+        mount.stderr_reader.start()
+        self._watch_exit(mount)
+        self.__logger.log(f'Started sshfs pid {mount.process.pid} for {self._remote_device(args)} at {args.local_path}')
+        return True
+
+    def _confirm(self, mount, now):
+        '''
+        Mark mount up, when sshfs of child is at mount table
+        '''
+        args = mount.args
+        if not self._check_mounted(args, exit_on_err=False):
+            return
+        mount.mounted = True
+        mount.next_probe = now + self._period
+        mount.backoff.success()
+        self._breaker(args.servername).success()
+        labels = self._labels(args)
+        metrics.registry.set('ssh_mounter_mount_up', 1, labels)
+        metrics.registry.set('ssh_mounter_last_mount_duration_seconds', now - mount.started, labels)
+        self.__logger.log(f'Mounted {self._remote_device(args)} to {args.local_path} by sshfs pid {mount.process.pid}')
+
+    def _probe(self, mount, now):
+        '''
+        Stop child of mount, which does not answer, it is started again after backoff
+        '''
+        args = mount.args
+        mount.next_probe = now + self._period
+        result = self.prober.probe(args.local_path)
+        labels = self._labels(args)
+        metrics.registry.set('ssh_mounter_probe_duration_seconds', result.latency, labels)
+        if result.ok:
+            return
+        if result.status == result.timeout:
+            metrics.registry.inc('ssh_mounter_probe_timeouts_total', labels)
+        self.__logger.error(f'Mount {self._remote_device(args)} at {args.local_path} is dead, stop sshfs pid {mount.process.pid}')
+        self._stop_child(mount)
+        self.prober.forget(args.local_path)
+
+    def _reap(self, mount):
+        args = mount.args
+        mount.exit_code = mount.process.wait()
+        if mount.stderr_reader is not None:
+            # last lines of exited child, pipe can be kept open by its ssh process, so wait is short
+            mount.stderr_reader.join(1)
+            mount.stderr_reader = None
+        if mount.pidfd is not None:
+            self._watcher.unregister(mount.pidfd)
+            os.close(mount.pidfd)
+            mount.pidfd = None
+        mount.process = None
+        mount.mounted = False
+        uptime = time.monotonic() - mount.started
+        metrics.registry.set('ssh_mounter_mount_up', 0, self._labels(args))
+        metrics.registry.inc('ssh_mounter_mount_failures_total', self._labels(args))
+        self.__logger.error(f'sshfs for {self._remote_device(args)} at {args.local_path} exited with code {mount.exit_code} '
+                            f'after {uptime:.1f} seconds' +
+                            (', last errors: ' + ' | '.join(mount.stderr_tail) if mount.stderr_tail else ''))
+        if args.local_path not in self._stopped:
+            self._failure(mount)
+        if self._check_mounted(args, exit_on_err=False):
+            self._unmount(args.local_path, lazy=True)
+
+    def status(self):
+        '''
+        Returns list of dicts with pid, exit code of last child and last stderr lines for each mount
+        '''
+        now = time.monotonic()
+        mounts = []
+        for mount in self.mounts:
+            if mount.args.local_path in self._stopped:
+                state = 'stopped'
+            elif mount.process is None:
+                state = 'down'
+            else:
+                state = 'mounted' if mount.mounted else 'starting'
+            breaker = self._breakers.get(mount.args.servername)
+            mounts.append({
+                'local_path': mount.args.local_path,
+                'remote': self._remote_device(mount.args),
+                'state': state,
+                'started_at': mount.started_at,
+                'pid': mount.process.pid if mount.process else None,
+                'last_exit_code': mount.exit_code,
+                'stderr_tail': list(mount.stderr_tail),
+                'backoff': {
+                    'failures': mount.backoff.failures,
+                    'retry_in': round(self._start_wait(mount, now), 1) if mount.process is None else 0,
+                },
+                'breaker': breaker.state if breaker else None,
+                'latency': self.prober.latency(mount.args.local_path),
+            })
+        return mounts
+
+    def _find(self, request, required: bool = False):
+        local_path = request.get('local_path')
+        if not local_path:
+            if required:
+                raise ValueError('local_path is required')
+            return list(self.mounts)
+        found = [mount for mount in self.mounts if normalize_path(mount.args.local_path) == normalize_path(local_path)]
+        if not found:
+            raise ValueError(f'{local_path} is not managed by this process')
+        return found
+
+    def _stop_child(self, mount):
+        if mount.process is None:
+            return
+        mount.process.terminate()
+        try:
+            mount.process.wait(10)
+        except subprocess.TimeoutExpired:
+            mount.process.kill()
+        self._reap(mount)
+
+    def _remount_command(self, request):
+        '''
+        Start child again at once, without waiting of period and backoff
+        '''
+        done = []
+        for mount in self._find(request):
+            self._stopped.discard(mount.args.local_path)
+            self._stop_child(mount)
+            mount.backoff.success()
+            self._breaker(mount.args.servername).success()
+            if self.start(mount):
+                done.append(mount.args.local_path)
+        return {'remounted': done}
+
+    def _unmount_command(self, request):
+        '''
+        Unmount path and stop child, path is not started until remount command.
+        Busy path is left mounted with running child, if request is not lazy
+        '''
+        done = []
+        lazy = bool(request.get('lazy'))
+        for mount in self._find(request, required=True):
+            args = mount.args
+            if not lazy and self._check_mounted(args, exit_on_err=False) and not self._unmount(args.local_path, lazy=False):
+                continue
+            self._stopped.add(args.local_path)
+            self._stop_child(mount)
+            if not self._check_mounted(args, exit_on_err=False):
+                done.append(args.local_path)
+        return {'unmounted': done}
+
+    def _start_wait(self, mount, now):
+        breaker = self._breakers.get(mount.args.servername)
+        waits = [mount.backoff.remaining(now), breaker.remaining(now) if breaker else 0]
+        if mount.last_start is not None:
+            waits.append(mount.last_start + self._period - now)
+        return max(max(waits), 0)
+
+    def _next_wait(self):
+        now = time.monotonic()
+        waits = [self._period]
+        for mount in self.mounts:
+            if mount.args.local_path in self._stopped:
+                continue
+            if mount.process is None:
+                waits.append(self._start_wait(mount, now))
+            elif mount.mounted:
+                waits.append(mount.next_probe - now)
+        return max(min(waits), 0.1)
+
+    def run_once(self, timeout: float = None):
+        '''
+        Handle exited children, check started and running children,
+        start children, which period and backoff are over, then wait for exit of any child or mount table change.
+        '''
+        for mount in self.mounts:
+            if mount.process is not None and mount.process.poll() is not None:
+                self._reap(mount)
+        now = time.monotonic()
+        for mount in self.mounts:
+            if mount.args.local_path in self._stopped:
+                continue
+            if mount.process is not None:
+                if not mount.mounted:
+                    self._confirm(mount, now)
+                elif now >= mount.next_probe:
+                    self._probe(mount, now)
+            elif self._start_wait(mount, now) <= 0 and self._breaker(mount.args.servername).allow(now):
+                self.start(mount)
+        wait = self._next_wait()
+        if timeout is not None:
+            wait = min(wait, timeout)
+        self._watcher.wait(wait)
+        try:
+            os.read(self._wake_read, 4096)
+        except BlockingIOError:
+            pass
+        if self._control is not None:
+            self._control.process()
+
+    def stop(self):
+        '''
+        Terminate children, sshfs unmounts path on exit
+        '''
+        for mount in self.mounts:
+            if mount.process is None:
+                continue
+            mount.process.terminate()
+            try:
+                mount.process.wait(10)
+            except subprocess.TimeoutExpired:
+                mount.process.kill()
+                mount.process.wait()
+
+    def run(self):
+        self.__logger.log(f'Run {len(self.mounts)} sshfs in foreground, min time between starts {self._period} seconds')
+        try:
+            # stop children on service stop, default SIGTERM handler exits without cleanup
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        except ValueError:
+            pass
+        try:
+            while True:
+                self.run_once()
+        finally:
+            self.stop()
+            if self._control is not None:
+                self._control.close()
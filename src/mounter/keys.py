@@ -0,0 +1,156 @@
+import asyncio
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+from .async_runner import AsyncRunner
+from .logger import Logger
+
+
+env_name_pattern = r'^[A-Za-z_][A-Za-z0-9_]*$'
+# SSH_ASKPASS_REQUIRE is supported since OpenSSH 8.4
+askpass_require_version = (8, 4)
+
+
+def openssh_version():
+    '''
+    Returns OpenSSH client version as tuple, e.g. (9, 2), or None if ssh is not OpenSSH
+    '''
+    try:
+        result = subprocess.run(['ssh', '-V'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = re.search(r'OpenSSH_(\d+)\.(\d+)', result.stdout.decode('utf-8', 'replace'))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+class KeyDistributor():
+    '''
+    Install one public key to many user@host targets concurrently.
+    Targets, which already authorize the key, are found by BatchMode ssh probe and skipped.
+    Args:
+        key_path: private key path, public key is key_path + ".pub"
+        jobs: max number of targets in progress
+        timeout: ssh connect timeout and probe timeout in seconds
+        password_env: name of environment variable with password for ssh-copy-id, requires OpenSSH 8.4 or later,
+            by default ssh-copy-id runs with BatchMode and can use only already working authentication
+        accept_new_host_keys: add host keys of unknown servers, instead of failing at host key check
+        ssh_options: additional ssh command line options
+    '''
+    def __init__(self,
+                 key_path: str,
+                 jobs: int = 16,
+                 timeout: float = 10,
+                 password_env: str = '',
+                 accept_new_host_keys: bool = False,
+                 ssh_options: str = '',
+                 external_logger: Logger = '',
+                 ) -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self.__runner = AsyncRunner(self.__logger)
+        self.key_path = os.path.expanduser(key_path)
+        self.jobs = max(1, jobs)
+        self.timeout = timeout
+        self.password_env = password_env
+        self.ssh_options = ssh_options
+        if accept_new_host_keys:
+            self.ssh_options += '-o StrictHostKeyChecking=accept-new '
+
+    def _options(self):
+        return f'{self.ssh_options}-o ConnectTimeout={int(self.timeout)} '
+
+    async def _probe(self, target: str):
+        cmd = (f'ssh {self._options()}-o BatchMode=yes -o IdentitiesOnly=yes '
+               f'-i {shlex.quote(self.key_path)} {shlex.quote(target)} exit')
+        return_code = await self.__runner.run(cmd, silent=True, timeout=self.timeout * 2,
+                                              exclude_errors=['Permission denied', 'Warning: Permanently added'])
+        return return_code == 0
+
+    async def _copy(self, target: str, askpass_env: dict):
+        batch = '' if askpass_env else '-o BatchMode=yes '
+        cmd = (f'ssh-copy-id {self._options()}{batch}-i {shlex.quote(self.key_path + ".pub")} '
+               f'{shlex.quote(target)}')
+        return_code = await self.__runner.run(cmd, silent=True, env=askpass_env,
+                                              exclude_errors=['INFO:', 'Number of key(s) added', 'Now try logging',
+                                                              'and check to make sure', 'Warning: Permanently added'])
+        return return_code == 0
+
+    async def distribute(self, targets: list, askpass_env: dict = None):
+        '''
+        Returns dict target -> status: authorized, installed or failed
+        '''
+        semaphore = asyncio.Semaphore(self.jobs)
+
+        async def distribute_one(target):
+            async with semaphore:
+                if await self._probe(target):
+                    status = 'authorized'
+                elif await self._copy(target, askpass_env):
+                    status = 'installed'
+                else:
+                    status = 'failed'
+            log = self.__logger.error if status == 'failed' else self.__logger.log
+            log(f'Key {self.key_path}.pub at {target}: {status}')
+            return status
+
+        statuses = await asyncio.gather(*[distribute_one(target) for target in targets])
+        return dict(zip(targets, statuses))
+
+    def run(self, targets: list):
+        '''
+        Install key to targets, e.g. ["username@remote-server.com"], duplicated targets are installed once.
+        Returns dict target -> status, see distribute
+        '''
+        targets = list(dict.fromkeys(targets))
+        askpass_dir = None
+        askpass_env = None
+        if self.password_env:
+            # name is written to askpass script
+            if not re.match(env_name_pattern, self.password_env):
+                raise ValueError(f'Invalid environment variable name {self.password_env}')
+            if self.password_env not in os.environ:
+                raise ValueError(f'Environment variable {self.password_env} with password is not set')
+            version = openssh_version()
+            if version is None or version < askpass_require_version:
+                found = '.'.join(str(part) for part in version) if version else 'unknown ssh'
+                raise ValueError(f'Password from environment requires OpenSSH 8.4 or later, found {found}')
+            # ssh reads password from askpass program, password stays at environment, not at command line
+            askpass_dir = tempfile.mkdtemp(prefix='ssh-mounter-')
+            askpass_path = os.path.join(askpass_dir, 'askpass')
+            with open(os.open(askpass_path, os.O_WRONLY | os.O_CREAT, 0o700), 'w') as f:
+                f.write(f'#!/bin/sh\nprintf \'%s\\n\' "${self.password_env}"\n')
+            askpass_env = {'SSH_ASKPASS': askpass_path, 'SSH_ASKPASS_REQUIRE': 'force', 'DISPLAY': os.environ.get('DISPLAY', ':0')}
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.distribute(targets, askpass_env))
+        finally:
+            loop.close()
+            if askpass_dir:
+                shutil.rmtree(askpass_dir, ignore_errors=True)
+
+
+def ensure_keypair(key_path: str, key_type: str = 'ed25519', runner=None):
+    '''
+    Reuse existing key or create new key without passphrase.
+    Public key is restored from private key if only it is missing.
+    Args:
+        key_path: private key path
+        key_type: ssh-keygen key type for new key, e.g. ed25519 or rsa
+        runner: Runner for ssh-keygen
+    Returns True if key is ready
+    '''
+    key_path = os.path.expanduser(key_path)
+    quoted_path = shlex.quote(key_path)
+    if os.path.exists(key_path):
+        if os.path.exists(key_path + '.pub'):
+            return True
+        return runner.run(f'ssh-keygen -y -f {quoted_path} > {shlex.quote(key_path + ".pub")}', silent=True) == 0
+    key_dir = os.path.dirname(key_path)
+    if key_dir:
+        os.makedirs(key_dir, mode=0o700, exist_ok=True)
+    return runner.run(f'ssh-keygen -t {shlex.quote(key_type)} -f {quoted_path} -q -N ""') == 0
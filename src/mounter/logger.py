@@ -1,9 +1,80 @@
 import sys
 import logging
+import logging.handlers
+import atexit
+import json
 import os
+import queue
+import re
+import threading
+import time
+
+# log path -> QueueListener, file written by listener thread, so slow disk never blocks caller
+_file_listeners = {}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps({
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S%z'),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        })
+
+class RepeatFilter(logging.Filter):
+    '''
+    Suppress identical errors repeated during interval, first suppressed-free message
+    after interval reports how many times it was suppressed.
+    Messages are compared without changing counts and delays, e.g. "Retry after 12.3 seconds" and "Retry after 20.1 seconds"
+    are identical, other numbers, e.g. of addresses and paths, are compared.
+    Args:
+        interval: seconds, 0 disables filter
+        max_keys: max number of tracked messages
+    '''
+    number_pattern = re.compile(r'\b\d+(?:\.\d+)?(?= (?:seconds|times)\b)')
+
+    def __init__(self, interval: float = 60, max_keys: int = 1000):
+        super().__init__()
+        self.interval = interval
+        self.max_keys = max_keys
+        self._seen = {}
+        # handler filters are called from every logging thread
+        self._lock = threading.Lock()
+
+    def key(self, record):
+        return (record.levelno, self.number_pattern.sub('N', str(record.msg)))
+
+    def filter(self, record):
+        if not self.interval or record.levelno < logging.ERROR:
+            return True
+        now = time.monotonic()
+        key = self.key(record)
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen['first'] < self.interval:
+                seen['suppressed'] += 1
+                return False
+            if len(self._seen) >= self.max_keys:
+                self._seen = {k: v for k, v in self._seen.items() if now - v['first'] < self.interval}
+            self._seen[key] = {'first': now, 'suppressed': 0}
+        if seen is not None and seen['suppressed']:
+            record.msg = f"{record.getMessage()} (repeated {seen['suppressed']} times in {self.interval} seconds)"
+            record.args = ()
+        return True
 
 class Logger():
-    def __init__(self, log_path='', timestamp=True):
+    def __init__(self, log_path='', timestamp=True,
+                 max_bytes=10 * 1024 * 1024, backup_count=5, rotate_when='',
+                 json_format=False, repeat_interval=None):
+        '''
+        Args:
+            log_path: log file path, by default log only to console
+            max_bytes: rotate log file at size, 0 disables rotation by size
+            backup_count: number of rotated log files
+            rotate_when: rotate log file by time instead of size, e.g. midnight, H, D
+            json_format: write log file lines as JSON objects
+            repeat_interval: suppress identical errors at log file during interval in seconds, use it for services,
+                by default console and log file show all errors
+        '''
         if timestamp:
             __log_formatter = logging.Formatter('%(levelname)s %(asctime)s :: %(message)s', 
                                         datefmt='%d/%m/%Y %H:%M:%S')
@@ -20,14 +91,40 @@ class Logger():
 
         if log_path and not self.file_handler_exists(log_path):
             #Setup File handler
-            __file_handler = logging.FileHandler(log_path)
-            __file_handler.setFormatter(__log_formatter)
+            if rotate_when:
+                __file_handler = logging.handlers.TimedRotatingFileHandler(log_path, when=rotate_when, backupCount=backup_count)
+            elif max_bytes:
+                __file_handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count)
+            else:
+                __file_handler = logging.FileHandler(log_path)
+            __file_handler.setFormatter(JsonFormatter() if json_format else __log_formatter)
             __file_handler.setLevel(logging.INFO)
-            self.__logger.addHandler(__file_handler)
+            __log_queue = queue.Queue(-1)
+            __listener = logging.handlers.QueueListener(__log_queue, __file_handler)
+            __listener.start()
+            atexit.register(__listener.stop)
+            _file_listeners[os.path.abspath(log_path)] = __listener
+            self.__logger.addHandler(logging.handlers.QueueHandler(__log_queue))
 
         if not self.stream_handler_exists():
             self.__logger.addHandler(__stream_handler)
 
+        if repeat_interval is not None:
+            for handler in self.__logger.handlers:
+                if not isinstance(handler, logging.handlers.QueueHandler):
+                    continue
+                repeat_filter = self.repeat_filter(handler)
+                if repeat_filter is None:
+                    handler.addFilter(RepeatFilter(repeat_interval))
+                else:
+                    repeat_filter.interval = repeat_interval
+
+    def repeat_filter(self, handler):
+        for log_filter in handler.filters:
+            if isinstance(log_filter, RepeatFilter):
+                return log_filter
+        return None
+
     def set_console_formatter(self, timestamp=True):
         if timestamp:
             new_formatter = logging.Formatter('%(levelname)s %(asctime)s :: %(message)s', 
@@ -40,6 +137,8 @@ class Logger():
                 handler.setFormatter(new_formatter)
 
     def file_handler_exists(self, log_path):
+        if os.path.abspath(log_path) in _file_listeners:
+            return True
         for handler in self.__logger.handlers:
             if isinstance(handler, logging.FileHandler) and handler.baseFilename == os.path.abspath(log_path):
                 return True
@@ -0,0 +1,139 @@
+import os
+import threading
+
+# name: (type, help)
+METRICS = {
+    'ssh_mounter_mount_up': ('gauge', 'Mount state, 1 if mounted and answers probe'),
+    'ssh_mounter_remounts_total': ('counter', 'Number of mount attempts after start'),
+    'ssh_mounter_mount_failures_total': ('counter', 'Number of failed mount attempts'),
+    'ssh_mounter_last_mount_duration_seconds': ('gauge', 'Duration of last mount attempt'),
+    'ssh_mounter_failovers_total': ('counter', 'Number of mount moves to other replica server'),
+    'ssh_mounter_probe_duration_seconds': ('gauge', 'Duration of last liveness probe'),
+    'ssh_mounter_probe_timeouts_total': ('counter', 'Number of liveness probes without answer in time'),
+    'ssh_mounter_ssh_test_duration_seconds': ('histogram', 'Duration of ssh connection test'),
+    'ssh_mounter_command_duration_seconds': ('histogram', 'Duration of external commands'),
+}
+
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels_line(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Metrics():
+    '''
+    Minimal Prometheus metrics registry, exported as text format through HTTP or textfile collector file.
+    Args:
+        buckets: histogram buckets in seconds
+    '''
+    def __init__(self, buckets: tuple = default_buckets) -> None:
+        self._buckets = buckets
+        self._values = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.textfile_path = ''
+
+    def _key(self, name, labels):
+        if name not in METRICS:
+            raise KeyError(f'Unknown metric {name}')
+        return (name, tuple(sorted((labels or {}).items())))
+
+    def inc(self, name: str, labels: dict = None, value: float = 1):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name: str, value: float, labels: dict = None):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def observe(self, name: str, value: float, labels: dict = None):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self._buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self._buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def forget(self, labels: dict):
+        '''
+        Remove series of all metrics, which have all given labels, e.g. {"local_path": "/mnt/data"} of removed mount
+        '''
+        items = set(labels.items())
+        with self._lock:
+            self._values = {key: value for key, value in self._values.items() if not items <= set(key[1])}
+            self._histograms = {key: value for key, value in self._histograms.items() if not items <= set(key[1])}
+
+    def render(self):
+        '''
+        Returns metrics at Prometheus text exposition format
+        '''
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text) in METRICS.items():
+                values = [(labels, value) for (key_name, labels), value in self._values.items() if key_name == name]
+                histograms = [(labels, value) for (key_name, labels), value in self._histograms.items() if key_name == name]
+                if not values and not histograms:
+                    continue
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in sorted(values):
+                    lines.append(f'{name}{_labels_line(labels)} {value}')
+                for labels, histogram in sorted(histograms, key=lambda item: item[0]):
+                    for bound, count in zip(self._buckets, histogram['buckets']):
+                        lines.append(f'{name}_bucket{_labels_line(labels + (("le", bound),))} {count}')
+                    lines.append(f'{name}_bucket{_labels_line(labels + (("le", "+Inf"),))} {histogram["count"]}')
+                    lines.append(f'{name}_sum{_labels_line(labels)} {histogram["sum"]}')
+                    lines.append(f'{name}_count{_labels_line(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str = ''):
+        '''
+        Write metrics for node_exporter textfile collector, file replaced atomically
+        '''
+        path = path or self.textfile_path
+        if not path:
+            return
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+    def serve(self, port: int, address: str = '127.0.0.1'):
+        '''
+        Start HTTP server with /metrics at background thread.
+        Returns server
+        '''
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = HTTPServer((address, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+registry = Metrics()
@@ -0,0 +1,90 @@
+import os
+import re
+import select
+
+_octal_escape = re.compile(r'\\([0-7]{3})')
+
+
+def unescape(value: str):
+    '''
+    Decode octal escapes from /proc/mounts, e.g. "/mnt/my\\040dir" -> "/mnt/my dir"
+    '''
+    return _octal_escape.sub(lambda match: chr(int(match.group(1), 8)), value)
+
+
+class MountTable():
+    '''
+    Mount table indexed by mount point.
+    Table parsed once and parsed again only when kernel marks /proc/self/mounts as changed.
+    '''
+    mounts_path = '/proc/self/mounts'
+
+    def __init__(self) -> None:
+        self._file = open(self.mounts_path, 'r')
+        self._poller = None
+        try:
+            self._poller = select.poll()
+            self._poller.register(self._file, select.POLLPRI | select.POLLERR)
+        except AttributeError:
+            self._poller = None
+        self._mounts = {}
+        self._types = {}
+        self._read()
+
+    def _read(self):
+        self._file.seek(0)
+        mounts = {}
+        types = {}
+        for line in self._file.read().splitlines():
+            parts = line.split()
+            if len(parts) < 3:
+                continue
+            # last mount wins, the same as visible mount for stacked mount points
+            local_path = unescape(parts[1])
+            mounts[local_path] = unescape(parts[0])
+            types[local_path] = parts[2]
+        self._mounts = mounts
+        self._types = types
+
+    def changed(self):
+        '''
+        Returns True if kernel signaled mount table change since last read
+        '''
+        if self._poller is None:
+            return True
+        return bool(self._poller.poll(0))
+
+    def refresh(self, force: bool = False):
+        if force or self.changed():
+            self._read()
+
+    def get(self, local_path: str):
+        '''
+        Args:
+            local_path: mount point
+        Returns:
+            mounted device or None
+        '''
+        self.refresh()
+        return self._mounts.get(os.path.abspath(os.path.expanduser(local_path)))
+
+    def fs_type(self, local_path: str):
+        '''
+        Returns file system type of mount point, e.g. fuse.sshfs, or None
+        '''
+        self.refresh()
+        return self._types.get(os.path.abspath(os.path.expanduser(local_path)))
+
+    def mounts_of_type(self, fs_type: str):
+        '''
+        Returns dict mount point -> device of all mounts with file system type, e.g. fuse.sshfs
+        '''
+        self.refresh()
+        return {local_path: device for local_path, device in self._mounts.items() if self._types.get(local_path) == fs_type}
+
+    def items(self):
+        self.refresh()
+        return self._mounts.items()
+
+    def close(self):
+        self._file.close()
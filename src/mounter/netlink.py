@@ -0,0 +1,91 @@
+import errno
+import socket
+from .logger import Logger
+from .precheck import DnsCache
+
+# rtnetlink multicast groups, see linux/rtnetlink.h
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+
+unreachable_errors = (errno.ENETUNREACH, errno.EHOSTUNREACH, errno.EADDRNOTAVAIL, errno.ENETDOWN)
+
+
+class NetworkWatcher():
+    '''
+    Receive kernel link, address and route changes through rtnetlink socket
+    and check if route to server exists.
+    Route check is UDP connect, it only asks kernel for route and sends nothing.
+    Args:
+        port: server port for route check
+        dns_cache: DnsCache shared with precheck, it is expired after network change
+    '''
+    groups = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_IFADDR | RTMGRP_IPV6_ROUTE
+
+    def __init__(self, port: int = 22, dns_cache: DnsCache = None, external_logger: Logger = '') -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self.port = port
+        self.dns_cache = dns_cache if dns_cache is not None else DnsCache()
+        self._socket = None
+        try:
+            self._socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            self._socket.bind((0, self.groups))
+            self._socket.setblocking(False)
+        except (OSError, AttributeError) as e:
+            self.__logger.error(f'Network events not available, network changes are found at period check: {e}')
+            self.close()
+
+    def fileno(self):
+        return self._socket.fileno() if self._socket is not None else None
+
+    def drain(self):
+        '''
+        Read all pending events.
+        Returns number of received messages
+        '''
+        count = 0
+        if self._socket is None:
+            return count
+        while True:
+            try:
+                self._socket.recv(65536)
+                count += 1
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                # ENOBUFS: events lost at overflow, next check sees current state anyway
+                if e.errno == errno.ENOBUFS:
+                    count += 1
+                    continue
+                break
+        if count:
+            self.dns_cache.expire()
+        return count
+
+    def reachable(self, servername: str):
+        '''
+        Returns False if kernel has no route to any address of server,
+        True if route exists or server address is unknown
+        '''
+        addresses = self.dns_cache.resolve(servername, self.port)
+        if not addresses:
+            return True
+        for family, address in addresses:
+            try:
+                with socket.socket(family, socket.SOCK_DGRAM) as probe:
+                    probe.connect(address)
+                return True
+            except OSError as e:
+                if e.errno not in unreachable_errors:
+                    return True
+        return False
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = None
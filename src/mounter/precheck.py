@@ -0,0 +1,195 @@
+import errno
+import select
+import socket
+import subprocess
+import threading
+import time
+
+# errors, which mean that server can't be reached now
+down_errors = (errno.ECONNREFUSED, errno.ENETUNREACH, errno.EHOSTUNREACH, errno.ETIMEDOUT, errno.ENETDOWN, errno.EHOSTDOWN)
+
+
+class DnsCache():
+    '''
+    Resolved addresses of servers, kept for ttl seconds.
+    Python resolver does not return record TTL, so one ttl is used for all records.
+    Failed lookups are kept for negative_ttl seconds, so down resolver is not asked at each check.
+    Args:
+        ttl: seconds, 0 disables cache
+        negative_ttl: seconds
+    '''
+    def __init__(self, ttl: float = 60, negative_ttl: float = 10) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, servername: str, port: int = 22):
+        '''
+        Returns list of (family, sockaddr), empty list if server name is not resolved
+        '''
+        now = time.monotonic()
+        key = (servername, port)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and now < entry[0]:
+            return entry[1]
+        try:
+            infos = socket.getaddrinfo(servername, port, type=socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys((info[0], info[4]) for info in infos))
+            expires = now + self.ttl
+        except (socket.gaierror, UnicodeError):
+            addresses = entry[1] if entry is not None else []
+            expires = now + self.negative_ttl
+        with self._lock:
+            self._entries[key] = (expires, addresses)
+        return addresses
+
+    def expire(self):
+        '''
+        Resolve all servers again at next lookup, e.g. after network change.
+        Old addresses are kept if lookup fails, resolver is often not reachable without network
+        '''
+        with self._lock:
+            self._entries = {key: (0, addresses) for key, (_, addresses) in self._entries.items()}
+
+    def forget(self, servername: str = None):
+        with self._lock:
+            if servername is None:
+                self._entries.clear()
+            else:
+                self._entries = {key: value for key, value in self._entries.items() if key[0] != servername}
+
+
+def ssh_destination(servername: str, port: int = None):
+    '''
+    Returns (hostname, port) which ssh connects to for server name, with HostName and Port of ssh config,
+    None if ssh connects through ProxyJump or ProxyCommand, so server can't be checked directly.
+    Server name and port, 22 by default, are returned if ssh config can't be read
+    '''
+    command = ['ssh', '-G'] + (['-p', str(port)] if port else []) + ['--', servername]
+    fallback = (servername, port or 22)
+    try:
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return fallback
+    if result.returncode != 0:
+        return fallback
+    config = {}
+    for line in result.stdout.decode('utf-8', 'replace').splitlines():
+        key, _, value = line.partition(' ')
+        config.setdefault(key.lower(), value.strip())
+    if config.get('proxyjump', 'none') != 'none' or config.get('proxycommand', 'none') != 'none':
+        return None
+    try:
+        return config.get('hostname', servername), int(config.get('port', port or 22))
+    except ValueError:
+        return fallback
+
+
+class TcpPrecheck():
+    '''
+    Check that server accepts TCP connections before start of ssh or sshfs process.
+    Host and port are taken from ssh config, see ssh_destination, servers behind proxy are not checked.
+    ssh config is read by one "ssh -G" process per server for process lifetime, or until forget_destinations,
+    so following checks start no process. Config is not parsed in-process, Include and Match are applied only by ssh.
+    Connect is non-blocking and limited by timeout, connection is closed right after it is established.
+    Args:
+        timeout: max connect time in seconds for all addresses of server, 0 disables check,
+            then all servers are reported as reachable with unknown handshake time
+        dns_cache: DnsCache, by default new cache with 60 seconds ttl
+        destination: function(servername, port) -> (hostname, port) or None, ssh_destination by default
+    '''
+    def __init__(self, timeout: float = 1.0, dns_cache: DnsCache = None, destination=ssh_destination) -> None:
+        self.timeout = timeout
+        self.dns_cache = dns_cache if dns_cache is not None else DnsCache()
+        self._destination = destination
+        self._destinations = {}
+        self._lock = threading.Lock()
+
+    def destination(self, servername: str, port: int = None):
+        '''
+        Returns (hostname, port) to check for server, None if server can't be checked
+        '''
+        key = (servername, port)
+        with self._lock:
+            if key in self._destinations:
+                return self._destinations[key]
+        destination = self._destination(servername, port)
+        with self._lock:
+            self._destinations[key] = destination
+        return destination
+
+    def forget_destinations(self):
+        '''
+        Read ssh config again at next check, e.g. after reload of mounts
+        '''
+        with self._lock:
+            self._destinations.clear()
+
+    def _connect(self, family, address, timeout):
+        with socket.socket(family, socket.SOCK_STREAM) as probe:
+            probe.setblocking(False)
+            code = probe.connect_ex(address)
+            if code in (errno.EINPROGRESS, errno.EAGAIN):
+                poller = select.poll()
+                poller.register(probe, select.POLLOUT)
+                if not poller.poll(max(timeout, 0) * 1000):
+                    return errno.ETIMEDOUT
+                code = probe.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            return code
+
+    def connect_time(self, servername: str, port: int = None):
+        '''
+        Returns TCP handshake time in seconds to the first answered address of server, or None if server is down,
+        infinity if server can't be checked, so it is used only when other servers are down
+        '''
+        if self.timeout <= 0:
+            return float('inf')
+        destination = self.destination(servername, port)
+        if destination is None:
+            return float('inf')
+        deadline = time.monotonic() + self.timeout
+        for family, address in self.dns_cache.resolve(*destination):
+            started = time.monotonic()
+            if started >= deadline:
+                break
+            try:
+                code = self._connect(family, address, deadline - started)
+            except OSError as e:
+                code = e.errno
+            if code == 0:
+                return time.monotonic() - started
+        return None
+
+    def check(self, servername: str, port: int = None):
+        '''
+        Args:
+            port: port from ssh or sshfs options, overrides port of ssh config
+        Returns (True, '') if server accepts connection or can't be checked, e.g. server is behind proxy,
+        (False, reason) if server is down or unreachable
+        '''
+        if self.timeout <= 0:
+            return True, ''
+        destination = self.destination(servername, port)
+        if destination is None:
+            return True, ''
+        addresses = self.dns_cache.resolve(*destination)
+        if not addresses:
+            return True, ''
+        deadline = time.monotonic() + self.timeout
+        reasons = []
+        for family, address in addresses:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                reasons.append(f'{address[0]}: {errno.errorcode[errno.ETIMEDOUT]}')
+                break
+            try:
+                code = self._connect(family, address, remaining)
+            except OSError as e:
+                code = e.errno
+            if code == 0 or code not in down_errors:
+                return True, ''
+            reasons.append(f'{address[0]}: {errno.errorcode.get(code, code)}')
+        return False, f'{servername} port {destination[1]} is not reachable ({", ".join(reasons)})'
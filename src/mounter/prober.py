@@ -0,0 +1,101 @@
+import collections
+import os
+import threading
+import time
+from .logger import Logger
+
+
+class ProbeResult():
+    alive = 'alive'
+    timeout = 'timeout'
+    error = 'error'
+
+    def __init__(self, status: str, latency: float, error: Exception = None) -> None:
+        self.status = status
+        self.latency = latency
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status == self.alive
+
+
+class LivenessProber():
+    '''
+    Check that mount answers on stat in time.
+    Stat runs at separate daemon thread, because stat on hung FUSE mount blocks forever
+    in uninterruptible state, only thread is lost in this case, not the caller.
+    Args:
+        timeout: max wait time for answer in seconds
+        history: number of stored latencies per mount
+    '''
+    def __init__(self, timeout: float = 5, history: int = 100, external_logger: Logger = '') -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self.timeout = timeout
+        self._history = history
+        self._pending = {}
+        self._latencies = {}
+
+    def probe(self, local_path: str):
+        '''
+        Args:
+            local_path: mount point
+        Returns ProbeResult
+        '''
+        pending = self._pending.get(local_path)
+        if pending is not None and pending.is_alive():
+            # previous probe still hung, don't stack new threads
+            return self._record(local_path, ProbeResult(ProbeResult.timeout, self.timeout))
+        result = {}
+
+        def stat_path():
+            try:
+                os.stat(local_path)
+            except OSError as e:
+                result['error'] = e
+
+        started = time.monotonic()
+        thread = threading.Thread(target=stat_path, daemon=True)
+        self._pending[local_path] = thread
+        thread.start()
+        thread.join(self.timeout)
+        latency = time.monotonic() - started
+        if thread.is_alive():
+            self.__logger.error(f'Mount {local_path} not responding after {self.timeout} seconds')
+            return self._record(local_path, ProbeResult(ProbeResult.timeout, latency))
+        if 'error' in result:
+            self.__logger.error(f'Mount {local_path} not available: {result["error"]}')
+            return self._record(local_path, ProbeResult(ProbeResult.error, latency, result['error']))
+        return self._record(local_path, ProbeResult(ProbeResult.alive, latency))
+
+    def _record(self, local_path: str, result: ProbeResult):
+        if local_path not in self._latencies:
+            self._latencies[local_path] = collections.deque(maxlen=self._history)
+        self._latencies[local_path].append(result.latency)
+        return result
+
+    def forget(self, local_path: str, latencies: bool = False):
+        '''
+        Forget hung probe of unmounted path, so new mount at the same path is probed again
+        Args:
+            latencies: also forget latency history, e.g. of mount removed from config
+        '''
+        self._pending.pop(local_path, None)
+        if latencies:
+            self._latencies.pop(local_path, None)
+
+    def latency(self, local_path: str):
+        '''
+        Returns dict with last, average and max probe latency in seconds or None if path was not probed
+        '''
+        latencies = self._latencies.get(local_path)
+        if not latencies:
+            return None
+        return {
+            'last': latencies[-1],
+            'avg': sum(latencies) / len(latencies),
+            'max': max(latencies),
+        }
@@ -0,0 +1,125 @@
+import glob
+import os
+import shlex
+from .mount_table import MountTable
+from .replicas import remote_devices
+
+
+class Action():
+    mount = 'mount'
+    unmount = 'unmount'
+    install_unit = 'install unit'
+    remove_unit = 'remove unit'
+    conflict = 'conflict'
+
+    def __init__(self, kind: str, target: str, reason: str = '', args=None, content: str = '') -> None:
+        self.kind = kind
+        self.target = target
+        self.reason = reason
+        self.args = args
+        self.content = content
+
+    def as_dict(self):
+        return {'action': self.kind, 'target': self.target, 'reason': self.reason}
+
+    def __str__(self):
+        return f'{self.kind} {self.target}: {self.reason}'
+
+
+def installed_units(units_dir: str = '/etc/systemd/system', pattern: str = '*@ssh-mounter.service'):
+    '''
+    Returns dict unit file name -> content of installed units
+    '''
+    units = {}
+    for unit_path in glob.glob(os.path.join(units_dir, pattern)):
+        try:
+            with open(unit_path, 'r') as f:
+                units[os.path.basename(unit_path)] = f.read()
+        except OSError:
+            continue
+    return units
+
+
+def unit_local_path(content: str):
+    '''
+    Returns local path from "-m" argument of unit ExecStart or None
+    '''
+    for line in content.splitlines():
+        if not line.startswith('ExecStart='):
+            continue
+        argv = shlex.split(line[len('ExecStart='):])
+        for index, arg in enumerate(argv[:-1]):
+            if arg in ('-m', '--local-path'):
+                return os.path.abspath(os.path.expanduser(argv[index + 1]))
+    return None
+
+
+class Reconciler():
+    '''
+    Compare desired mounts with live mount table and installed units, plan minimal set of actions.
+    Args:
+        mount_table: MountTable, by default new table
+        fs_type: file system type of managed mounts
+    '''
+    def __init__(self, mount_table: MountTable = None, fs_type: str = 'fuse.sshfs') -> None:
+        self._mount_table = mount_table if mount_table is not None else MountTable()
+        self._fs_type = fs_type
+
+    def _remote_device(self, args):
+        return f'{args.username}@{args.servername}:{args.remote_path}'
+
+    def plan(self, desired_mounts: list, desired_units: dict = None, current_units: dict = None, prune: bool = False):
+        '''
+        Args:
+            desired_mounts: list of argparse.Namespace, e.g. MountsConfig.mounts
+            desired_units: unit file name -> content, None if units are not managed,
+                managed units mount paths by itself, so mount actions are not planned
+            current_units: installed unit file name -> content, see installed_units
+            prune: unmount mounts of the same file system type, which are not desired
+        Returns list of Action: conflicts first, then unit removals, unmounts, unit installs and mounts.
+        Units are removed before unmounts, otherwise running service of removed unit mounts path again
+        '''
+        conflicts = []
+        unmounts = []
+        removals = []
+        installs = []
+        mounts = []
+        desired_paths = {}
+        for args in desired_mounts:
+            desired_paths[os.path.abspath(os.path.expanduser(args.local_path))] = args
+        live = self._mount_table.mounts_of_type(self._fs_type)
+
+        for local_path, args in desired_paths.items():
+            expected = self._remote_device(args)
+            device = self._mount_table.get(local_path)
+            if device and any(remote_device in device for remote_device in remote_devices(args)):
+                continue
+            if device and local_path not in live:
+                conflicts.append(Action(Action.conflict, local_path, f'{device} already mounted', args))
+                continue
+            if device:
+                unmounts.append(Action(Action.unmount, local_path, f'{device} mounted instead of {expected}', args))
+            if desired_units is None:
+                mounts.append(Action(Action.mount, local_path, f'{expected} not mounted', args))
+
+        if desired_units is not None:
+            current_units = current_units if current_units is not None else {}
+            for unit, content in desired_units.items():
+                if current_units.get(unit) != content:
+                    reason = 'changed' if unit in current_units else 'not installed'
+                    installs.append(Action(Action.install_unit, unit, reason, content=content))
+            for unit, content in current_units.items():
+                if unit in desired_units:
+                    continue
+                removals.append(Action(Action.remove_unit, unit, 'not in config'))
+                local_path = unit_local_path(content)
+                if local_path in live and local_path not in desired_paths:
+                    unmounts.append(Action(Action.unmount, local_path, f'unit {unit} removed'))
+
+        if prune:
+            planned = set(action.target for action in unmounts)
+            for local_path, device in live.items():
+                if local_path not in desired_paths and local_path not in planned:
+                    unmounts.append(Action(Action.unmount, local_path, f'{device} not in config'))
+
+        return conflicts + removals + unmounts + installs + mounts
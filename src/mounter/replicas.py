@@ -0,0 +1,170 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .logger import Logger
+from .precheck import TcpPrecheck
+
+policies = ('rtt', 'order')
+
+
+def parse_replica(value: str):
+    '''
+    Returns (servername, weight) from "server" or "server:weight", e.g. "replica.example.com:2"
+    '''
+    servername, separator, weight = str(value).rpartition(':')
+    if not separator:
+        return str(value), 1.0
+    weight = float(weight)
+    if weight <= 0:
+        raise ValueError(f'Replica {value} weight must be positive')
+    return servername, weight
+
+
+def main_servername(args):
+    '''
+    Returns server from -s or config, args.servername can be changed to active replica
+    '''
+    return getattr(args, 'main_servername', args.servername)
+
+
+def set_active_replica(args, servername: str):
+    if not hasattr(args, 'main_servername'):
+        args.main_servername = args.servername
+    args.servername = servername
+
+
+def replica_servers(args):
+    '''
+    Returns list of (servername, weight): main server first, then replicas from args.replicas
+    '''
+    servers = [(main_servername(args), 1.0)]
+    for value in getattr(args, 'replicas', None) or []:
+        servername, weight = parse_replica(value)
+        if servername == servers[0][0]:
+            servers[0] = (servername, weight)
+        elif servername not in [server for server, _ in servers]:
+            servers.append((servername, weight))
+    return servers
+
+
+def remote_devices(args):
+    '''
+    Returns dict remote device -> servername for main server and every replica, e.g. {"user@host:/path": "host"}
+    '''
+    return {f'{args.username}@{servername}:{args.remote_path}': servername for servername, _ in replica_servers(args)}
+
+
+class ReplicaSelector():
+    '''
+    Choose server for mount from replicas of the same remote path.
+    rtt policy chooses server with the lowest handshake time divided by weight,
+    order policy chooses the first healthy server from list.
+    Active server is changed at once when it is down or failed,
+    and moved back to better server only after it stays better during hysteresis seconds.
+    Args:
+        servers: list of (servername, weight), see replica_servers
+        policy: rtt or order
+        hysteresis: seconds, also time for skip of server after mount failure
+        better_ratio: for rtt policy, server is better if its score is below active score multiplied by ratio
+        precheck: TcpPrecheck for handshake time
+    '''
+    def __init__(self,
+                 servers: list,
+                 policy: str = 'rtt',
+                 hysteresis: float = 300,
+                 better_ratio: float = 0.8,
+                 precheck: TcpPrecheck = None,
+                 external_logger: Logger = '',
+                 ) -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        if policy not in policies:
+            raise ValueError(f'Unknown replica policy {policy}, use one of {", ".join(policies)}')
+        self.servers = servers
+        self.policy = policy
+        self.hysteresis = hysteresis
+        self.better_ratio = better_ratio
+        self.precheck = precheck if precheck is not None else TcpPrecheck()
+        self.rtts = {}
+        self.measured_at = None
+        self._failed_until = {}
+        self._better_since = {}
+
+    def measure(self):
+        '''
+        Measure handshake time to all servers at the same time.
+        Returns dict servername -> seconds or None if server is down
+        '''
+        names = [servername for servername, _ in self.servers]
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            self.rtts = dict(zip(names, executor.map(self.precheck.connect_time, names)))
+        self.measured_at = time.monotonic()
+        return self.rtts
+
+    def failback_due(self, now: float = None):
+        '''
+        Returns True if alive mount should be compared with other servers again,
+        servers are measured at most once per hysteresis seconds for it, not at each check of mount
+        '''
+        now = time.monotonic() if now is None else now
+        return self.measured_at is None or now - self.measured_at >= self.hysteresis
+
+    def failure(self, servername: str, now: float = None):
+        '''
+        Skip server during hysteresis seconds after mount failure
+        '''
+        now = time.monotonic() if now is None else now
+        self._failed_until[servername] = now + self.hysteresis
+
+    def _healthy(self, now):
+        healthy = [(servername, weight) for servername, weight in self.servers
+                   if self.rtts.get(servername) is not None and self._failed_until.get(servername, 0) <= now]
+        if not healthy:
+            # all servers failed recently, try servers, which answer at least
+            healthy = [(servername, weight) for servername, weight in self.servers if self.rtts.get(servername) is not None]
+        return healthy
+
+    def _score(self, servername, weight):
+        if self.policy == 'order':
+            return [name for name, _ in self.servers].index(servername)
+        return self.rtts[servername] / weight
+
+    def _is_better(self, candidate, active):
+        if self.policy == 'order':
+            return candidate[1] < active[1]
+        return candidate[1] < active[1] * self.better_ratio
+
+    def choose(self, active: str = None, active_alive: bool = False, now: float = None):
+        '''
+        Args:
+            active: server of current mount, None if path is not mounted
+            active_alive: mount answers, so active server is kept even if handshake to it failed
+        Returns servername for mount, active server if it should be kept, None if all servers are down
+        '''
+        now = time.monotonic() if now is None else now
+        self.measure()
+        scores = sorted(((servername, self._score(servername, weight)) for servername, weight in self._healthy(now)),
+                        key=lambda item: item[1])
+        if not scores:
+            return active
+        best = scores[0]
+        current = next((item for item in scores if item[0] == active), None)
+        if active is None:
+            return best[0]
+        if current is None and active_alive:
+            return active
+        if current is None:
+            self.__logger.error(f'Replica {active} is down or failed, fail over to {best[0]}')
+            self._better_since.clear()
+            return best[0]
+        if best[0] == active or not self._is_better(best, current):
+            self._better_since.clear()
+            return active
+        since = self._better_since.setdefault(best[0], now)
+        self._better_since = {best[0]: since}
+        if now - since < self.hysteresis:
+            return active
+        self.__logger.log(f'Replica {best[0]} is better than {active} during {self.hysteresis} seconds, move mount to it')
+        self._better_since.clear()
+        return best[0]
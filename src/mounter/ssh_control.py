@@ -0,0 +1,57 @@
+import os
+from .logger import Logger
+
+
+class SshControl():
+    '''
+    Shared multiplexed ssh connection per user@host through ControlMaster socket.
+    First ssh command opens master connection, next commands reuse it without new handshake.
+    Args:
+        control_persist: how long master connection stays open after last command, e.g. 10m, or "no" for disable
+        control_dir: directory for control sockets
+    '''
+    default_control_dir = '/run/ssh-mounter'
+
+    def __init__(self,
+                 control_persist: str = '10m',
+                 control_dir: str = default_control_dir,
+                 external_logger: Logger = '',
+                 ) -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self.control_persist = str(control_persist)
+        self.control_dir = None
+        if self.enabled:
+            self.control_dir = self._prepare_dir(control_dir)
+
+    @property
+    def enabled(self):
+        return self.control_persist.lower() not in ('no', 'false', '0', '')
+
+    def _prepare_dir(self, control_dir: str):
+        runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+        candidates = [control_dir]
+        if runtime_dir: candidates.append(os.path.join(runtime_dir, 'ssh-mounter'))
+        for candidate in candidates:
+            try:
+                os.makedirs(candidate, mode=0o700, exist_ok=True)
+                if os.access(candidate, os.W_OK):
+                    return candidate
+            except OSError:
+                continue
+        self.__logger.error(f'Can not create ssh control directory {control_dir}, ssh connections will not be shared')
+        return None
+
+    def options(self):
+        '''
+        Returns ssh command line options, e.g. "-o ControlMaster=auto -o ControlPath=/run/ssh-mounter/%C ..."
+        or empty string if connection sharing disabled
+        '''
+        if not self.enabled or not self.control_dir:
+            return ''
+        # %C is hash of local host, remote user, host and port, so path is short enough for unix socket
+        control_path = os.path.join(self.control_dir, '%C')
+        return (f'-o ControlMaster=auto -o ControlPath={control_path} '
+                f'-o ControlPersist={self.control_persist}')
@@ -0,0 +1,75 @@
+import re
+
+option_pattern = r"^[a-zA-Z0-9_.@:=/+\-]+$"
+
+# Named sshfs tuning profiles, each option passes to sshfs as "-o option"
+PROFILES = {
+    'default': [],
+    # large sequential copies: no page cache double buffering, parallel connections, fast cipher
+    'throughput': [
+        'direct_io',
+        'max_read=131072',
+        'max_conns=4',
+        'Ciphers=aes128-gcm@openssh.com',
+        'Compression=no',
+    ],
+    # interactive work on fast links: cache everything, keep connection alive
+    'low-latency': [
+        'cache=yes',
+        'kernel_cache',
+        'Compression=no',
+        'reconnect',
+        'ServerAliveInterval=15',
+    ],
+    # many small files and directory listings
+    'metadata-heavy': [
+        'cache=yes',
+        'kernel_cache',
+        'dcache_timeout=120',
+        'max_conns=4',
+        'reconnect',
+    ],
+    # slow or lossy links
+    'wan': [
+        'cache=yes',
+        'Compression=yes',
+        'reconnect',
+        'ServerAliveInterval=15',
+        'ServerAliveCountMax=3',
+    ],
+}
+
+
+def validate_option(option: str):
+    return bool(option) and re.match(option_pattern, option) is not None
+
+
+def option_name(option: str):
+    return option.split('=', 1)[0]
+
+
+def option_value(options: list, name: str):
+    '''
+    Returns value of the last option with name, case is ignored as by ssh, e.g. "port" for ['Port=2222'] -> "2222",
+    None if option is not set
+    '''
+    values = [option.split('=', 1)[1] for option in options
+              if '=' in option and option_name(option).lower() == name.lower()]
+    return values[-1] if values else None
+
+
+def build_options(profile: str = 'default', extra_options: list = None):
+    '''
+    Merge profile options with raw options, raw options override profile options with the same name.
+    Args:
+        profile: profile name from PROFILES
+        extra_options: list of raw sshfs options, e.g. ['max_conns=8', 'allow_other']
+    Returns:
+        list of sshfs options
+    '''
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown sshfs profile {profile}, available: {", ".join(PROFILES)}')
+    extra_options = extra_options or []
+    overridden = set(option_name(option) for option in extra_options)
+    options = [option for option in PROFILES[profile] if option_name(option) not in overridden]
+    return options + list(extra_options)
@@ -0,0 +1,156 @@
+import os
+import time
+from .mount_table import unescape
+
+counter_keys = ('read_bytes', 'write_bytes', 'read_ops', 'write_ops')
+
+
+def mount_devices(mountinfo_path: str = '/proc/self/mountinfo'):
+    '''
+    Returns dict mount point -> {"device": "0:52", "fs_type": "fuse.sshfs", "source": "user@host:/path"}
+    '''
+    mounts = {}
+    with open(mountinfo_path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if '-' not in parts:
+                continue
+            separator = parts.index('-')
+            if separator < 5 or len(parts) < separator + 3:
+                continue
+            mounts[unescape(parts[4])] = {
+                'device': parts[2],
+                'fs_type': parts[separator + 1],
+                'source': unescape(parts[separator + 2]),
+            }
+    return mounts
+
+
+def fuse_connection(device: str, connections_dir: str = '/sys/fs/fuse/connections'):
+    '''
+    Returns dict with state of FUSE connection, e.g. {"waiting": 3, "max_background": 12}, or None.
+    Connection directory is named by kernel device number, for FUSE major 0 it is equal to minor.
+    '''
+    major, _, minor = device.partition(':')
+    connection_dir = os.path.join(connections_dir, str((int(major) << 20) | int(minor)))
+    if not os.path.isdir(connection_dir):
+        return None
+    result = {}
+    for name in ('waiting', 'max_background', 'congestion_threshold'):
+        try:
+            with open(os.path.join(connection_dir, name), 'r') as f:
+                result[name] = int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+    return result
+
+
+def sshfs_pids(proc_dir: str = '/proc'):
+    '''
+    Returns dict mount point -> pid of sshfs process, found by sshfs command line
+    '''
+    pids = {}
+    for pid in os.listdir(proc_dir):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc_dir, pid, 'cmdline'), 'rb') as f:
+                argv = [arg.decode('utf-8', 'replace') for arg in f.read().split(b'\0') if arg]
+        except OSError:
+            continue
+        if not argv or os.path.basename(argv[0]) != 'sshfs':
+            continue
+        # mount point is the first argument after remote path, which is not an option
+        positional = [arg for index, arg in enumerate(argv[1:], 1)
+                      if not arg.startswith('-') and argv[index - 1] != '-o']
+        if len(positional) >= 2:
+            pids[os.path.abspath(os.path.expanduser(positional[1]))] = int(pid)
+    return pids
+
+
+def process_io(pid: int, proc_dir: str = '/proc'):
+    '''
+    Returns I/O counters of process from /proc/<pid>/io, or None if process is gone or not accessible.
+    For sshfs it is traffic through ssh pipe and FUSE device together.
+    '''
+    try:
+        with open(os.path.join(proc_dir, str(pid), 'io'), 'r') as f:
+            values = dict(line.split(':', 1) for line in f.read().splitlines() if ':' in line)
+    except OSError:
+        return None
+    return {
+        'read_bytes': int(values.get('rchar', 0)),
+        'write_bytes': int(values.get('wchar', 0)),
+        'read_ops': int(values.get('syscr', 0)),
+        'write_ops': int(values.get('syscw', 0)),
+    }
+
+
+class MountStats():
+    '''
+    I/O counters and rates of sshfs mounts.
+    /proc/self/mountstats has no counters for FUSE, so counters are taken from sshfs process
+    and queue state from /sys/fs/fuse/connections.
+    Args:
+        fs_type: file system type of mounts
+    '''
+    def __init__(self, fs_type: str = 'fuse.sshfs') -> None:
+        self.fs_type = fs_type
+
+    def sample(self, local_paths: list = None):
+        '''
+        Args:
+            local_paths: mount points, by default all mounts of fs_type
+        Returns dict mount point -> {"source", "device", "pid", "read_bytes", "write_bytes", "read_ops", "write_ops", "fuse"}
+        '''
+        mounts = mount_devices()
+        if local_paths:
+            paths = [os.path.abspath(os.path.expanduser(local_path)) for local_path in local_paths]
+        else:
+            paths = [local_path for local_path, mount in mounts.items() if mount['fs_type'] == self.fs_type]
+        pids = sshfs_pids()
+        result = {}
+        for local_path in paths:
+            mount = mounts.get(local_path)
+            if mount is None:
+                continue
+            pid = pids.get(local_path)
+            counters = process_io(pid) if pid else None
+            result[local_path] = {
+                'source': mount['source'],
+                'device': mount['device'],
+                'pid': pid,
+                **(counters or {key: None for key in counter_keys}),
+                'fuse': fuse_connection(mount['device']),
+            }
+        return result
+
+    def rates(self, window: float = 1.0, local_paths: list = None):
+        '''
+        Sample counters twice with window seconds between and calculate rates per second.
+        Returns list of dicts, sorted by total bytes per second, the most loaded mount first, e.g.
+            [{"local_path": "/mnt/x", "source": "user@host:/data", "read_bytes_per_second": 1048576.0, ...,
+              "total_bytes_per_second": 1050000.0, "fuse": {"waiting": 2, ...}}]
+        '''
+        first = self.sample(local_paths)
+        started = time.monotonic()
+        time.sleep(window)
+        second = self.sample(list(first.keys()) or local_paths)
+        seconds = max(time.monotonic() - started, 1e-6)
+        result = []
+        for local_path, current in second.items():
+            previous = first.get(local_path)
+            item = {'local_path': local_path, 'source': current['source'], 'pid': current['pid']}
+            for key in counter_keys:
+                if previous is None or previous['pid'] != current['pid'] or None in (previous[key], current[key]):
+                    item[f'{key}_per_second'] = None
+                else:
+                    item[f'{key}_per_second'] = round((current[key] - previous[key]) / seconds, 2)
+            if item['read_bytes_per_second'] is None:
+                item['total_bytes_per_second'] = None
+            else:
+                item['total_bytes_per_second'] = round(item['read_bytes_per_second'] + item['write_bytes_per_second'], 2)
+            item['fuse'] = current['fuse']
+            result.append(item)
+        result.sort(key=lambda item: item['total_bytes_per_second'] or 0, reverse=True)
+        return result
@@ -0,0 +1,460 @@
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .logger import Logger
+from . import metrics
+from .watcher import MountWatcher
+from .netlink import NetworkWatcher
+from .prober import LivenessProber
+from .backoff import Backoff, CircuitBreaker
+from .precheck import TcpPrecheck
+from .replicas import ReplicaSelector, replica_servers, set_active_replica
+from .control import ControlServer, normalize_path
+
+
+class Supervisor():
+    '''
+    Watch many mounts from one process.
+    Failed mounts retried with exponential backoff, servers with many failures in a row
+    paused by circuit breaker, process never exits on mount failures.
+    Alive mounts are probed once per period each, due probes run at the same time.
+    Args:
+        mounts: list of argparse.Namespace, e.g. MountsConfig.mounts
+        check_mounted: function(args, exit_on_err) -> True if mounted, False if not mounted, None if path is busy
+        mount: function(args, exit_on_err) -> True if mounted
+        unmount: function(local_path, lazy) -> True if unmounted, used for recovery of hung mounts
+        period: max time between checks in seconds, mount table changes trigger check immediately
+        probe_timeout: max time in seconds for mount root answer, hung mounts lazy unmounted and mounted again
+        max_backoff: max delay between mount retries in seconds
+        breaker_threshold: failures in a row to one server before pause all mounts from this server
+        breaker_timeout: pause of server in seconds before trial mount
+        watch_network: check mounts at once after link, address or route changes,
+            checks of server without route are paused until route is back
+        precheck: TcpPrecheck for handshake time of replicas, mounts with args.replicas
+            are mounted from the best replica and moved on failure, see ReplicaSelector
+        control_name: name of control socket for status and remount, unmount and reload commands,
+            empty name disables socket, see ControlServer
+        reload: function() -> list of mounts for reload command, None if reload is not supported
+    '''
+    def __init__(self,
+                 mounts: list,
+                 check_mounted,
+                 mount,
+                 unmount=None,
+                 period: float = 60,
+                 probe_timeout: float = 5,
+                 max_backoff: float = 600,
+                 breaker_threshold: int = 5,
+                 breaker_timeout: float = 300,
+                 watch_network: bool = True,
+                 precheck: TcpPrecheck = None,
+                 control_name: str = '',
+                 reload=None,
+                 external_logger: Logger = '',
+                 ) -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self._mounts = []
+        self._check_mounted = check_mounted
+        self._mount = mount
+        self._unmount = unmount
+        self._period = period
+        self._watcher = MountWatcher(self.__logger)
+        self.prober = LivenessProber(probe_timeout, external_logger=self.__logger)
+        self._max_backoff = max_backoff
+        self._precheck = precheck
+        self._backoffs = {}
+        self._breaker_threshold = breaker_threshold
+        self._breaker_timeout = breaker_timeout
+        self._breakers = {}
+        # replicas of the same remote path, active replica is args.servername
+        self._selectors = {}
+        # local path -> {"checked_at", "error", "error_at"}, entries are replaced, not changed, for reading from control thread
+        self._states = {}
+        # paths unmounted by control command, they are not mounted until remount command
+        self._stopped = set()
+        # local path -> (time of next probe, result of last probe)
+        self._probes = {}
+        self._add_mounts(mounts)
+        self._network = None
+        self._offline = set()
+        if watch_network:
+            self._network = NetworkWatcher(dns_cache=precheck.dns_cache if precheck is not None else None,
+                                           external_logger=self.__logger)
+            self._watcher.register(self._network.fileno())
+        self._reload = reload
+        self._control = None
+        if control_name:
+            commands = {'remount': self._remount_command, 'unmount': self._unmount_command}
+            if reload is not None:
+                commands['reload'] = self._reload_command
+            self._control = ControlServer(control_name, self.status, commands, external_logger=self.__logger)
+            self._watcher.register(self._control.fileno())
+
+    def _add_mounts(self, mounts):
+        for args in mounts:
+            self._backoffs[args.local_path] = Backoff(min(5, self._period), self._max_backoff)
+            servers = replica_servers(args)
+            for servername, _ in servers:
+                self._breaker(servername)
+            if len(servers) > 1:
+                self._selectors[args.local_path] = ReplicaSelector(
+                    servers, getattr(args, 'replica_policy', 'rtt'), getattr(args, 'failback_after', 300),
+                    precheck=self._precheck, external_logger=self.__logger)
+            self._states[args.local_path] = {'checked_at': None, 'error': '', 'error_at': None}
+        self._mounts = self._mounts + list(mounts)
+
+    def _remote_device(self, args):
+        return f'{args.username}@{args.servername}:{args.remote_path}'
+
+    def check(self, args):
+        '''
+        Check one mount and mount it if it is not mounted.
+        Returns True if mount is alive after check
+        '''
+        if args.local_path in self._stopped:
+            return False
+        alive = self._check(args)
+        metrics.registry.set('ssh_mounter_mount_up', 1 if alive else 0, self._labels(args))
+        state = dict(self._states[args.local_path])
+        state['checked_at'] = time.time()
+        state['alive'] = alive
+        self._states[args.local_path] = state
+        return alive
+
+    def _error(self, args, message):
+        state = dict(self._states[args.local_path])
+        state['error'] = message
+        state['error_at'] = time.time()
+        self._states[args.local_path] = state
+
+    def _labels(self, args):
+        return {'local_path': args.local_path, 'remote': self._remote_device(args)}
+
+    def _probe(self, args):
+        result = self.prober.probe(args.local_path)
+        labels = self._labels(args)
+        metrics.registry.set('ssh_mounter_probe_duration_seconds', result.latency, labels)
+        if result.status == result.timeout:
+            metrics.registry.inc('ssh_mounter_probe_timeouts_total', labels)
+        return result.ok
+
+    def _probe_due(self):
+        '''
+        Probe mounted paths, which probe time came, at the same time, so hung mounts don't delay each other
+        '''
+        now = time.monotonic()
+        due = [args for args in self._mounts
+               if args.local_path not in self._stopped and self._probes.get(args.local_path, (0, True))[0] <= now
+               and self._check_mounted(args, exit_on_err=False)]
+        if not due:
+            return
+        with ThreadPoolExecutor(max_workers=min(len(due), 32)) as executor:
+            results = list(executor.map(self._probe, due))
+        next_probe = time.monotonic() + self._period
+        for args, ok in zip(due, results):
+            self._probes[args.local_path] = (next_probe, ok)
+
+    def _forget_probe(self, local_path, latencies: bool = False):
+        self._probes.pop(local_path, None)
+        self.prober.forget(local_path, latencies=latencies)
+
+    def _mount_timed(self, args):
+        labels = self._labels(args)
+        started = time.monotonic()
+        mounted = self._mount(args, exit_on_err=False)
+        metrics.registry.set('ssh_mounter_last_mount_duration_seconds', time.monotonic() - started, labels)
+        metrics.registry.inc('ssh_mounter_remounts_total', labels)
+        if not mounted:
+            metrics.registry.inc('ssh_mounter_mount_failures_total', labels)
+        return mounted
+
+    def _server_online(self, servername):
+        '''
+        Returns False if there is no route to server.
+        When route is back, backoff and breaker of server are reset, so mounts are checked at once.
+        '''
+        if self._network is None:
+            return True
+        online = self._network.reachable(servername)
+        if not online and servername not in self._offline:
+            self._offline.add(servername)
+            self.__logger.error(f'No route to server {servername}, pause checks until network change')
+        elif online and servername in self._offline:
+            self._offline.discard(servername)
+            self.__logger.log(f'Route to server {servername} is back, check mounts')
+            self._breaker(servername).success()
+            for args in self._mounts:
+                if args.servername == servername:
+                    self._backoffs[args.local_path].success()
+        return online
+
+    def _check(self, args):
+        backoff = self._backoffs[args.local_path]
+        selector = self._selectors.get(args.local_path)
+        servers = [servername for servername, _ in selector.servers] if selector else [args.servername]
+        if not [servername for servername in servers if self._server_online(servername)]:
+            self._error(args, f'no route to server {args.servername}')
+            return False
+        try:
+            mounted = self._check_mounted(args, exit_on_err=False)
+            if not mounted:
+                self._probes.pop(args.local_path, None)
+            if mounted:
+                # not probed mount is just mounted
+                if self._probes.get(args.local_path, (0, True))[1]:
+                    if selector is None or not self._move_back(args, selector):
+                        return True
+                elif not self._recover(args):
+                    return False
+                mounted = False
+            if not backoff.ready():
+                return False
+            if mounted is None:
+                self._error(args, f'path {args.local_path} is busy by other device')
+                backoff.failure()
+                return False
+            if selector is not None:
+                self._choose_replica(args, selector)
+            if not self._breaker(args.servername).allow():
+                return False
+            if self._mount_timed(args):
+                backoff.success()
+                self._breaker(args.servername).success()
+                return True
+            self._error(args, f'mount of {self._remote_device(args)} failed')
+        except Exception as e:
+            self._error(args, str(e))
+            self.__logger.error(f'Error during check {self._remote_device(args)} at {args.local_path}: {e}')
+        if selector is not None:
+            selector.failure(args.servername)
+        delay = backoff.failure()
+        self.__logger.error(f'Retry {self._remote_device(args)} at {args.local_path} after {delay:.1f} seconds')
+        breaker = self._breaker(args.servername)
+        if breaker.failure():
+            self.__logger.error(f'Server {args.servername} failed {breaker.failures} times in a row, '
+                                f'pause mounts for {breaker.reset_timeout} seconds')
+        return False
+
+    def _breaker(self, servername):
+        if servername not in self._breakers:
+            self._breakers[servername] = CircuitBreaker(self._breaker_threshold, self._breaker_timeout)
+        return self._breakers[servername]
+
+    def _choose_replica(self, args, selector):
+        servername = selector.choose()
+        if servername is None or servername == args.servername:
+            return
+        self.__logger.log(f'Mount {args.local_path} from replica {servername} instead of {args.servername}')
+        metrics.registry.inc('ssh_mounter_failovers_total', {'local_path': args.local_path})
+        set_active_replica(args, servername)
+
+    def _move_back(self, args, selector):
+        '''
+        Unmount alive mount, if other replica was better during hysteresis window.
+        Returns True if path unmounted for mount from other replica
+        '''
+        if not selector.failback_due():
+            return False
+        servername = selector.choose(args.servername, active_alive=True)
+        if servername is None or servername == args.servername:
+            return False
+        if self._unmount is None or not self._unmount(args.local_path, lazy=True):
+            return False
+        self._forget_probe(args.local_path)
+        metrics.registry.inc('ssh_mounter_failovers_total', {'local_path': args.local_path})
+        set_active_replica(args, servername)
+        return True
+
+    def _recover(self, args):
+        '''
+        Lazy unmount dead mount, so it can be mounted again.
+        Returns True if path unmounted
+        '''
+        self._error(args, f'mount {self._remote_device(args)} does not answer')
+        if self._unmount is None:
+            return False
+        self.__logger.error(f'Mount {self._remote_device(args)} at {args.local_path} is dead, unmount it')
+        if not self._unmount(args.local_path, lazy=True):
+            return False
+        self._forget_probe(args.local_path)
+        return True
+
+    def check_all(self):
+        self._probe_due()
+        for args in self._mounts:
+            self.check(args)
+
+    def status(self):
+        '''
+        Returns dict with state of each mount, safe for call from other thread
+        '''
+        now = time.monotonic()
+        mounts = []
+        for args in list(self._mounts):
+            state = self._states.get(args.local_path, {})
+            backoff = self._backoffs.get(args.local_path)
+            breaker = self._breakers.get(args.servername)
+            if args.local_path in self._stopped:
+                mount_state = 'stopped'
+            elif args.servername in self._offline:
+                mount_state = 'offline'
+            elif state.get('alive'):
+                mount_state = 'mounted'
+            elif state.get('checked_at') is None:
+                mount_state = 'unknown'
+            else:
+                mount_state = 'down'
+            mounts.append({
+                'local_path': args.local_path,
+                'remote': self._remote_device(args),
+                'state': mount_state,
+                'checked_at': state.get('checked_at'),
+                'last_error': state.get('error', ''),
+                'last_error_at': state.get('error_at'),
+                'backoff': {
+                    'failures': backoff.failures if backoff else 0,
+                    'retry_in': round(backoff.remaining(now), 1) if backoff and backoff.failures else 0,
+                },
+                'breaker': breaker.state if breaker else None,
+                'latency': self.prober.latency(args.local_path),
+            })
+        return {'period': self._period, 'mounts': mounts}
+
+    def _find(self, request, required: bool = False):
+        local_path = request.get('local_path')
+        if not local_path:
+            if required:
+                raise ValueError('local_path is required')
+            return list(self._mounts)
+        found = [args for args in self._mounts if normalize_path(args.local_path) == normalize_path(local_path)]
+        if not found:
+            raise ValueError(f'{local_path} is not managed by this process')
+        return found
+
+    def _definition(self, args):
+        definition = dict(vars(args))
+        definition['servername'] = definition.pop('main_servername', args.servername)
+        return definition
+
+    def _remount_command(self, request):
+        '''
+        Mount again at once, without waiting of backoff, alive mount is unmounted first
+        '''
+        done = []
+        for args in self._find(request):
+            self._stopped.discard(args.local_path)
+            self._backoffs[args.local_path].success()
+            self._breaker(args.servername).success()
+            if self._check_mounted(args, exit_on_err=False) and self._unmount is not None:
+                self._unmount(args.local_path, lazy=True)
+                self._forget_probe(args.local_path)
+            if self.check(args):
+                done.append(args.local_path)
+        return {'remounted': done}
+
+    def _unmount_command(self, request):
+        '''
+        Unmount path and stop its checks until remount command
+        '''
+        done = []
+        for args in self._find(request, required=True):
+            self._stopped.add(args.local_path)
+            metrics.registry.set('ssh_mounter_mount_up', 0, self._labels(args))
+            if self._check_mounted(args, exit_on_err=False) and self._unmount is not None:
+                if self._unmount(args.local_path, lazy=bool(request.get('lazy'))):
+                    done.append(args.local_path)
+        return {'unmounted': done}
+
+    def _reload_command(self, request):
+        '''
+        Read mounts again, removed mounts are unmounted, new mounts are checked at once
+        '''
+        mounts = self._reload()
+        if self._precheck is not None:
+            self._precheck.forget_destinations()
+        new_paths = set(args.local_path for args in mounts)
+        removed = [args for args in self._mounts if args.local_path not in new_paths]
+        for args in removed:
+            if self._check_mounted(args, exit_on_err=False) and self._unmount is not None:
+                self._unmount(args.local_path, lazy=True)
+            self._stopped.discard(args.local_path)
+            self._forget(args)
+        current = {args.local_path: args for args in self._mounts if args.local_path in new_paths}
+        added = []
+        changed = []
+        for args in mounts:
+            old = current.get(args.local_path)
+            if old is None:
+                added.append(args)
+            elif self._definition(old) != self._definition(args):
+                # old mount is unmounted with old args, new args see it as other device
+                if self._check_mounted(old, exit_on_err=False) and self._unmount is not None:
+                    self._unmount(old.local_path, lazy=True)
+                self._forget(old)
+                changed.append(args)
+        changed_paths = set(args.local_path for args in changed)
+        self._mounts = [args for args in current.values() if args.local_path not in changed_paths]
+        self._add_mounts(added + changed)
+        # servers of removed mounts
+        servernames = set(servername for args in self._mounts for servername, _ in replica_servers(args))
+        self._breakers = {servername: breaker for servername, breaker in self._breakers.items() if servername in servernames}
+        self._offline &= servernames
+        for args in added + changed:
+            selector = self._selectors.get(args.local_path)
+            if selector is not None and not self._check_mounted(args, exit_on_err=False):
+                self._choose_replica(args, selector)
+        return {'removed': [args.local_path for args in removed], 'changed': [args.local_path for args in changed],
+                'mounts': len(self._mounts)}
+
+    def _forget(self, args):
+        '''
+        Drop state, probe and metrics of removed or changed mount
+        '''
+        for state in (self._backoffs, self._selectors, self._states):
+            state.pop(args.local_path, None)
+        self._forget_probe(args.local_path, latencies=True)
+        metrics.registry.forget({'local_path': args.local_path})
+
+    def _write_metrics(self):
+        try:
+            metrics.registry.write_textfile()
+        except OSError as e:
+            self.__logger.error(f'Error during write metrics to {metrics.registry.textfile_path}: {e}')
+
+    def _next_wait(self):
+        now = time.monotonic()
+        wait = self._period
+        for next_probe, _ in self._probes.values():
+            wait = min(wait, next_probe - now)
+        for args in self._mounts:
+            if args.servername in self._offline:
+                continue
+            backoff = self._backoffs[args.local_path]
+            if backoff.failures:
+                breaker = self._breaker(args.servername)
+                wait = min(wait, max(backoff.remaining(), breaker.remaining()))
+        return max(wait, 0.1)
+
+    def run(self):
+        self.__logger.log(f'Supervise {len(self._mounts)} mounts with period {self._period} seconds')
+        try:
+            # remove control socket on service stop, default SIGTERM handler exits without cleanup
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        except ValueError:
+            pass
+        try:
+            while True:
+                self.check_all()
+                self._write_metrics()
+                self._watcher.wait(self._next_wait())
+                if self._network is not None:
+                    self._network.drain()
+                if self._control is not None:
+                    self._control.process()
+        finally:
+            if self._control is not None:
+                self._control.close()
@@ -1,47 +1,124 @@
+import os
+import signal
 import subprocess
+import threading
 import time
 from .logger import Logger
+from . import metrics
 
 class Runner:
+    # max wait for output of background children, that keeps pipes open after command exit
+    output_grace_period = 0.2
+
     def __init__(self, external_logger: Logger = ''):
         if external_logger == '':
             self.__logger = Logger()
         else:
             self.__logger = external_logger
+        # running process -> True if it is started at own session
+        self._processes = {}
+        self._processes_lock = threading.Lock()
+
+    def _read_stdout(self, stream, silent, output=None):
+        for line in iter(stream.readline, b''):
+            line = line.rstrip().decode('utf-8', 'replace')
+            if output is not None: output.append(line)
+            if not silent: self.__logger.log(">>> {}".format(line))
+        stream.close()
+
+    def _write_stdin(self, stream, data):
+        try:
+            stream.write(data)
+        except (BrokenPipeError, OSError):
+            pass
+        finally:
+            try:
+                stream.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    def _read_stderr(self, stream, exclude_errors):
+        for err in iter(stream.readline, b''):
+            error_message: str = err.rstrip().decode('utf-8', 'replace')
+            show_err = True
+            for word in exclude_errors:
+                if error_message.find(word) >= 0:
+                    show_err = False
+            if show_err:
+                self.__logger.error(">>> {}".format(error_message))
+        stream.close()
 
-    def run(self, bashCommand: str, exclude_errors: list = [], silent = False, exit_on_err: bool = False):
+    def _kill(self, process, own_session):
+        # command runs at own session, so shell and its children, e.g. ssh of sshfs, are killed together
+        try:
+            if own_session:
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    def run(self, bashCommand: str, exclude_errors: list = [], silent = False, exit_on_err: bool = False, timeout: float = None,
+            input: str = None, output: list = None, interactive: bool = False):
         """ Run commands in shell
-        Get 
-            command: str, 
+        Get
+            command: str,
             logger: Logger, by deafult import from logger
             exclude_errors: list, exclude array list of errors to output in logger
+            timeout: float, kill command after timeout in seconds, by default wait forever
+            input: str, written to command stdin, never logged, use it for secrets instead of command line
+            output: list, stdout lines are appended to it
+            interactive: command can ask password at terminal, so it is not started at own session
+                and only shell is killed by timeout and cancel
         Return error status from shell Int
         """
         if not silent: self.__logger.log("Run command: " + bashCommand)
-        process = subprocess.Popen(bashCommand, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        while True:
-            line = process.stdout.readline()
-            err = process.stderr.readline()
-            if not line and not err:
-                break
-            elif line:
-                if not silent: self.__logger.log(">>> {}".format(line.rstrip()))
-            elif err:
-                error_message: str = err.rstrip().decode('utf-8')
-                show_err = True
-                for word in exclude_errors:
-                    if error_message.find(word) >= 0:
-                        show_err = False
-                if show_err:
-                    self.__logger.error(">>> {}".format(error_message))
-        # Wait until process terminates (without using p.wait())
-        while process.poll() is None:
-        # Process hasn't exited yet, let's wait some
-            time.sleep(0.5)
-
-        # Get return code from process
-        return_code = process.returncode
+        started = time.monotonic()
+        process = subprocess.Popen(bashCommand, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True,
+                                   stdin=subprocess.PIPE if input is not None else None,
+                                   start_new_session=not interactive)
+        with self._processes_lock:
+            self._processes[process] = not interactive
+        # Read both streams at the same time, so full pipe never blocks the command
+        readers = [
+            threading.Thread(target=self._read_stdout, args=(process.stdout, silent, output), daemon=True),
+            threading.Thread(target=self._read_stderr, args=(process.stderr, exclude_errors), daemon=True),
+        ]
+        if input is not None:
+            readers.append(threading.Thread(target=self._write_stdin, args=(process.stdin, input.encode('utf-8')), daemon=True))
+        for reader in readers:
+            reader.start()
+        try:
+            return_code = process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.__logger.error("Command timeout after {} seconds: {}".format(timeout, bashCommand))
+            self._kill(process, not interactive)
+            return_code = process.wait()
+        except KeyboardInterrupt:
+            # own session does not get terminal interrupt
+            self._kill(process, not interactive)
+            raise
+        finally:
+            with self._processes_lock:
+                self._processes.pop(process, None)
+        command_name = bashCommand.split()[0] if bashCommand.split() else ''
+        metrics.registry.observe('ssh_mounter_command_duration_seconds', time.monotonic() - started, {'command': command_name})
+        output_deadline = time.monotonic() + self.output_grace_period
+        for reader in readers:
+            reader.join(max(0, output_deadline - time.monotonic()))
 
         if not silent: self.__logger.log("Return code {}".format(return_code))
         if exit_on_err and return_code != 0: exit(1)
-        return return_code
\ No newline at end of file
+        return return_code
+
+    def cancel(self):
+        """ Kill all commands started by this runner and still running
+        Return number of killed commands
+        """
+        with self._processes_lock:
+            processes = list(self._processes.items())
+        for process, own_session in processes:
+            if process.poll() is None:
+                self._kill(process, own_session)
+        return len(processes)
+
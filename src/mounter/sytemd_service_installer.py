@@ -8,6 +8,7 @@ class ServiceInstaller():
                  quiet_mode: bool =False, 
                  external_logger: Logger = '',
                  external_runner: Runner = '',
+                 units_dir: str = '/etc/systemd/system',
                  ) -> None:
         if external_logger == '':
             self.__logger = Logger()
@@ -16,9 +17,10 @@ class ServiceInstaller():
         if external_runner == '':
             self.__runner = Runner()
         else:
-            self.__runner = external_logger
+            self.__runner = external_runner
         self._path_pattern = r"^/([a-zA-Z0-9_.\-]+/?)+$"
         self._quiet_mode = quiet_mode
+        self._units_dir = units_dir
 
     def _input_path(self, message, pattern, deafult_path = '', left_part=False):
         path = input(message)
@@ -89,6 +91,221 @@ Alias={service_name}.service
 """
         return service_content
 
+    def unit_name_from_path(self, path: str):
+        '''
+        Escape path to unit name the same way as "systemd-escape --path", e.g. /mnt/my dir -> mnt-my\\x20dir
+        '''
+        path = os.path.normpath(path).strip('/')
+        if not path:
+            return '-'
+        escaped = ''
+        for index, char in enumerate(path):
+            if char == '/':
+                escaped += '-'
+            elif char.isascii() and (char.isalnum() or char in ':_' or (char == '.' and index > 0)):
+                escaped += char
+            else:
+                escaped += ''.join(f'\\x{byte:02x}' for byte in char.encode('utf-8'))
+        return escaped
+
+    def prepare_mount(
+            self,
+            what: str,
+            where: str,
+            options: list,
+            description: str,
+            fs_type: str ='fuse.sshfs'):
+        '''
+        Prepare .mount unit content, unit name must be equal to escaped "where", see unit_name_from_path.
+        Args:
+            what: mounted device, e.g. user@server:/home/user
+            where: absolute local path, e.g. /mnt/user
+            options: list of mount options, e.g. ['IdentityFile=/root/.ssh/id_rsa', 'reconnect']
+            description: e.g. My mount description
+            fs_type: e.g. fuse.sshfs
+        Returns:
+            str: Prepared multistring content
+        '''
+        options = ['_netdev'] + [option for option in options if option != '_netdev']
+        mount_content = f"""[Unit]
+Description={description}
+After=network-online.target
+Wants=network-online.target
+
+[Mount]
+What={what}
+Where={where}
+Type={fs_type}
+Options={','.join(options)}
+TimeoutSec=30
+"""
+        return mount_content
+
+    def prepare_automount(
+            self,
+            where: str,
+            description: str,
+            idle_timeout: int =300):
+        '''
+        Prepare .automount unit content, mount created on first access and unmounted when idle.
+        Args:
+            where: absolute local path, e.g. /mnt/user
+            description: e.g. My mount description
+            idle_timeout: unmount after idle seconds, 0 disables, the same as x-systemd.idle-timeout at fstab
+        Returns:
+            str: Prepared multistring content
+        '''
+        automount_content = f"""[Unit]
+Description={description}
+After=network-online.target
+Wants=network-online.target
+
+[Automount]
+Where={where}
+TimeoutIdleSec={idle_timeout}
+
+[Install]
+WantedBy=multi-user.target
+"""
+        return automount_content
+
+    def install_automount(self, unit_name: str, mount_content: str, automount_content: str):
+        '''
+        Install .mount and .automount units, enable and start .automount.
+        Args:
+            unit_name: escaped mount path, see unit_name_from_path
+            mount_content: content from prepare_mount
+            automount_content: content from prepare_automount
+        Returns True if all right
+        '''
+        mount_path = f"{self._units_dir}/{unit_name}.mount"
+        automount_path = f"{self._units_dir}/{unit_name}.automount"
+        for unit_path in (mount_path, automount_path):
+            if os.path.exists(unit_path):
+                self.__logger.error(f'{unit_path} already exist')
+                return
+        for unit_path, content in ((mount_path, mount_content), (automount_path, automount_content)):
+            with open(unit_path, 'w') as f:
+                self.__logger.log(f'Write {os.path.basename(unit_path)} to {unit_path}...')
+                f.write(content)
+
+        self.__logger.log('Reload systemd daemon...')
+        self.__runner.run("systemctl daemon-reload", exit_on_err=True)
+        self.__logger.log(f'Enable and start {unit_name}.automount...')
+        self.__runner.run(f"systemctl enable --now {unit_name}.automount", exit_on_err=True)
+        return True
+
+    def remove_automount(self, unit_name: str):
+        '''
+        Stop and remove .automount and .mount units.
+        Args:
+            unit_name: escaped mount path, see unit_name_from_path
+        Returns True if all right
+        '''
+        mount_path = f"{self._units_dir}/{unit_name}.mount"
+        automount_path = f"{self._units_dir}/{unit_name}.automount"
+        if not os.path.exists(automount_path) and not os.path.exists(mount_path):
+            self.__logger.error(f'{automount_path} not exist')
+            return
+
+        self.__logger.log(f'Stop and disable {unit_name}.automount...')
+        self.__runner.run(f"systemctl disable --now {unit_name}.automount", exit_on_err=False)
+        self.__runner.run(f"systemctl stop {unit_name}.mount", exit_on_err=False)
+        for unit_path in (automount_path, mount_path):
+            if os.path.exists(unit_path):
+                os.remove(unit_path)
+        self.__logger.log('Reload systemd daemon...')
+        self.__runner.run("systemctl daemon-reload", exit_on_err=True)
+        return True
+
+    def install_many(self, units: dict, start_units: list = None):
+        '''
+        Install many units with one daemon-reload and one systemctl call for enable and start.
+        Unchanged units skipped, on error all written units restored to previous state.
+        Args:
+            units: unit file name -> content, e.g. {"home-user@ssh-mounter.service": "..."}
+            start_units: units for enable and start, by default all units with [Install] section
+        Returns True if all right
+        '''
+        if start_units is None:
+            start_units = [unit for unit, content in units.items() if '[Install]' in content]
+        previous = {}
+        for unit, content in units.items():
+            unit_path = f"{self._units_dir}/{unit}"
+            if os.path.exists(unit_path):
+                with open(unit_path, 'r') as f:
+                    old_content = f.read()
+                if old_content == content:
+                    continue
+                previous[unit] = old_content
+            else:
+                previous[unit] = None
+        if not previous:
+            self.__logger.log(f'All {len(units)} units unchanged')
+            return True
+
+        try:
+            for unit in previous:
+                unit_path = f"{self._units_dir}/{unit}"
+                self.__logger.log(f'Write {unit} to {unit_path}...')
+                with open(unit_path, 'w') as f:
+                    f.write(units[unit])
+        except OSError as e:
+            self.__logger.error(f'Error during write units: {e}')
+            self._rollback(previous)
+            return False
+
+        self.__logger.log(f'Reload systemd daemon for {len(previous)} changed units...')
+        if self.__runner.run("systemctl daemon-reload") != 0:
+            self._rollback(previous)
+            return False
+        new_units = [unit for unit in start_units if unit in previous and previous[unit] is None]
+        changed_units = [unit for unit in start_units if unit in previous and previous[unit] is not None]
+        if new_units:
+            self.__logger.log(f'Enable and start {len(new_units)} units...')
+            if self.__runner.run(f"systemctl enable --now {' '.join(new_units)}") != 0:
+                self.__runner.run(f"systemctl disable --now {' '.join(new_units)}")
+                self._rollback(previous)
+                return False
+        if changed_units:
+            self.__logger.log(f'Restart {len(changed_units)} changed units...')
+            self.__runner.run(f"systemctl enable {' '.join(changed_units)}")
+            self.__runner.run(f"systemctl try-restart {' '.join(changed_units)}")
+        return True
+
+    def _rollback(self, previous: dict):
+        self.__logger.error(f'Rollback {len(previous)} units...')
+        for unit, old_content in previous.items():
+            unit_path = f"{self._units_dir}/{unit}"
+            if old_content is None:
+                if os.path.exists(unit_path):
+                    os.remove(unit_path)
+            else:
+                with open(unit_path, 'w') as f:
+                    f.write(old_content)
+        self.__runner.run("systemctl daemon-reload")
+
+    def remove_many(self, units: list):
+        '''
+        Stop, disable and remove many units with one systemctl call and one daemon-reload.
+        Args:
+            units: unit file names, e.g. ["home-user@ssh-mounter.service"]
+        Returns True if all right
+        '''
+        existing = [unit for unit in units if os.path.exists(f"{self._units_dir}/{unit}")]
+        if not existing:
+            self.__logger.log('Nothing to remove')
+            return True
+        self.__logger.log(f'Stop and disable {len(existing)} units...')
+        if self.__runner.run(f"systemctl disable --now {' '.join(existing)}") != 0:
+            self.__logger.error('Units not disabled, unit files kept')
+            return False
+        for unit in existing:
+            os.remove(f"{self._units_dir}/{unit}")
+        self.__logger.log('Reload systemd daemon...')
+        self.__runner.run("systemctl daemon-reload", exit_on_err=True)
+        return True
+
     def install(self, service_name: str, service_content: str):
         '''
         Install systemd service.
@@ -113,7 +330,7 @@ Alias={service_name}.service
         Returns True if all right
         '''
         service_name = f'{service_name}.service'
-        service_path = f"/etc/systemd/system/{service_name}"
+        service_path = f"{self._units_dir}/{service_name}"
 
         if os.path.exists(service_path):
             self.__logger.error(f'{service_path} already exist')
@@ -144,7 +361,7 @@ Alias={service_name}.service
         Returns True if all right
         '''
         service_name = f'{service_name}.service'
-        service_path = f"/etc/systemd/system/{service_name}"
+        service_path = f"{self._units_dir}/{service_name}"
         if not os.path.exists(service_path):
             self.__logger.error(f'{service_path} not exist')
             return
@@ -0,0 +1,133 @@
+import csv
+import os
+import re
+import secrets
+from .config import ConfigError, _import_yaml
+
+username_pattern = re.compile(r'^[a-z_][a-z0-9_.-]{0,31}$')
+result_marker = 'ssh-mounter-user'
+
+
+class RemoteUser():
+    def __init__(self, username: str, password: str) -> None:
+        self.username = username
+        self.password = password
+
+    def __repr__(self):
+        # password never shown at logs and tracebacks
+        return f'RemoteUser({self.username!r})'
+
+
+def _validate(index: int, username, password, path: str):
+    username = str(username or '').strip()
+    password = '' if password is None else str(password)
+    if not username_pattern.match(username):
+        raise ConfigError(f'User #{index + 1} in {path} has invalid username "{username}"')
+    if len(password) < 5:
+        raise ConfigError(f'User {username} in {path} must have password length > 4')
+    if '\n' in password or '\r' in password:
+        raise ConfigError(f'User {username} in {path} has password with line break')
+    return RemoteUser(username, password)
+
+
+def load_users(users_path: str):
+    '''
+    Load users list from .csv or .yaml file (YAML requires "PyYAML" package).
+
+    CSV: "username,password" lines, header line is optional.
+    YAML: list of {username, password} or the same list at "users" key.
+
+    Returns list of RemoteUser
+    '''
+    path = os.path.abspath(os.path.expanduser(users_path))
+    if not os.path.exists(path):
+        raise ConfigError(f'Users file {path} does not exist')
+    extension = os.path.splitext(path)[1].lower()
+    rows = []
+    if extension in ('.yaml', '.yml'):
+        yaml = _import_yaml()
+        if yaml is None:
+            raise ConfigError('YAML users list requires installed "PyYAML" package, or use .csv file')
+        with open(path, 'r') as f:
+            try:
+                content = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ConfigError(f'Users file {path} is not valid YAML: {e}')
+        if isinstance(content, dict):
+            content = content.get('users')
+        if not isinstance(content, list):
+            raise ConfigError(f'Users file {path} must contain a list of users')
+        for user in content:
+            if not isinstance(user, dict):
+                raise ConfigError(f'Users file {path} must contain username and password for each user')
+            rows.append((user.get('username'), user.get('password')))
+    else:
+        with open(path, 'r', newline='') as f:
+            for row in csv.reader(f):
+                if not row or not row[0].strip() or row[0].strip().startswith('#'):
+                    continue
+                if not rows and row[0].strip().lower() == 'username':
+                    continue
+                rows.append((row[0], row[1] if len(row) > 1 else None))
+    users = [_validate(index, username, password, path) for index, (username, password) in enumerate(rows)]
+    if not users:
+        raise ConfigError(f'Users file {path} does not contain any user')
+    names = [user.username for user in users]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        raise ConfigError(f'Users file {path} contains duplicated users: {", ".join(duplicates)}')
+    return users
+
+
+def provision_script(users: list, sudo: bool = False):
+    '''
+    Shell script for "sh -s" at remote server, it must be sent through stdin, so passwords are never at argv.
+    Script creates missing users, then sets passwords of created users with one chpasswd call
+    and prints "ssh-mounter-user <username> <status>" line for each user.
+    Args:
+        users: list of RemoteUser
+        sudo: run useradd and chpasswd with "sudo -n", admin must have sudo without password
+    '''
+    # heredoc delimiter, which can't be equal to any line of users list
+    end = f'SSH_MOUNTER_{secrets.token_hex(8)}'
+    usernames = '\n'.join(user.username for user in users)
+    passwords = '\n'.join(f'{user.username}:{user.password}' for user in users)
+    return f'''SUDO='{"sudo -n" if sudo else ""}'
+created=''
+while read -r user; do
+    if id "$user" >/dev/null 2>&1; then
+        echo "{result_marker} $user exists"
+    elif $SUDO useradd -m "$user"; then
+        created="$created $user"
+    else
+        echo "{result_marker} $user failed"
+    fi
+done <<'{end}'
+{usernames}
+{end}
+[ -z "$created" ] && exit 0
+if while IFS= read -r line; do
+    case " $created " in *" ${{line%%:*}} "*) printf '%s\\n' "$line";; esac
+done <<'{end}' | $SUDO chpasswd
+{passwords}
+{end}
+then
+    status=created
+else
+    status=password-failed
+fi
+for user in $created; do echo "{result_marker} $user $status"; done
+'''
+
+
+def parse_results(lines: list, users: list):
+    '''
+    Returns dict username -> status: created, exists, failed, password-failed or unknown,
+    unknown if script did not report user, e.g. connection was lost
+    '''
+    results = {user.username: 'unknown' for user in users}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 3 and parts[0] == result_marker and parts[1] in results:
+            results[parts[1]] = parts[2]
+    return results
@@ -0,0 +1,69 @@
+import select
+import time
+from .logger import Logger
+
+
+class MountWatcher():
+    '''
+    Wait for mount table changes instead of sleeping full period.
+    Kernel marks /proc/self/mountinfo with POLLPRI|POLLERR on every mount or unmount.
+    '''
+    mountinfo_path = '/proc/self/mountinfo'
+
+    def __init__(self, external_logger: Logger = '') -> None:
+        if external_logger == '':
+            self.__logger = Logger()
+        else:
+            self.__logger = external_logger
+        self._poller = None
+        self._mountinfo = None
+        try:
+            self._poller = select.poll()
+        except AttributeError as e:
+            self.__logger.error(f'Mount table events not available, fallback to period check: {e}')
+            return
+        try:
+            self._mountinfo = open(self.mountinfo_path, 'r')
+            self._mountinfo.read()
+            self._poller.register(self._mountinfo, select.POLLPRI | select.POLLERR)
+        except OSError as e:
+            self.__logger.error(f'Mount table events not available, fallback to period check: {e}')
+            if self._mountinfo is not None:
+                self._mountinfo.close()
+            self._mountinfo = None
+
+    def register(self, fd):
+        '''
+        Wake wait also on readable fd, e.g. NetworkWatcher socket
+        '''
+        if self._poller is not None and fd is not None:
+            self._poller.register(fd, select.POLLIN)
+
+    def unregister(self, fd):
+        if self._poller is not None and fd is not None:
+            self._poller.unregister(fd)
+
+    def wait(self, timeout: float):
+        '''
+        Wait until mount table changed, registered fd is readable or timeout expired.
+        Args:
+            timeout: max wait time in seconds
+        Returns True if mount table changed or registered fd is readable
+        '''
+        if self._poller is None:
+            time.sleep(timeout)
+            return False
+        events = self._poller.poll(timeout * 1000)
+        if not events:
+            return False
+        if self._mountinfo is not None and any(fd == self._mountinfo.fileno() for fd, _ in events):
+            # re-read file for re-arm event
+            self._mountinfo.seek(0)
+            self._mountinfo.read()
+        return True
+
+    def close(self):
+        if self._mountinfo is not None:
+            self._mountinfo.close()
+        self._mountinfo = None
+        self._poller = None
@@ -0,0 +1,70 @@
+import pytest
+from mounter.backoff import Backoff, CircuitBreaker
+
+
+def test_backoff_delay_grows_with_jitter():
+    backoff = Backoff(base=4, max_delay=100)
+    for failures in range(4):
+        delay = backoff.failure(now=0)
+        full = 4 * 2 ** failures
+        assert full / 2 <= delay <= full
+    assert backoff.failures == 4
+
+
+def test_backoff_delay_capped():
+    backoff = Backoff(base=4, max_delay=10)
+    for _ in range(10):
+        delay = backoff.failure(now=0)
+    assert 5 <= delay <= 10
+
+
+def test_backoff_ready_after_delay():
+    backoff = Backoff(base=4)
+    assert backoff.ready(now=0)
+    delay = backoff.failure(now=100)
+    assert not backoff.ready(now=100)
+    assert backoff.remaining(now=100) == pytest.approx(delay)
+    assert backoff.ready(now=100 + delay)
+    assert backoff.remaining(now=200) == 0
+
+
+def test_backoff_success_resets():
+    backoff = Backoff(base=4)
+    backoff.failure(now=100)
+    backoff.success()
+    assert backoff.failures == 0
+    assert backoff.ready(now=100)
+
+
+def test_breaker_opens_at_threshold():
+    breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+    assert not breaker.failure(now=0)
+    assert not breaker.failure(now=0)
+    assert breaker.allow(now=0)
+    assert breaker.failure(now=10)
+    assert breaker.state == CircuitBreaker.open
+    assert not breaker.allow(now=20)
+    assert breaker.remaining(now=20) == 50
+
+
+def test_breaker_trial_after_timeout():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+    breaker.failure(now=0)
+    assert breaker.allow(now=60)
+    assert breaker.state == CircuitBreaker.half_open
+    # only one trial attempt
+    assert not breaker.allow(now=61)
+    breaker.success()
+    assert breaker.state == CircuitBreaker.closed
+    assert breaker.allow(now=61)
+
+
+def test_breaker_failed_trial_opens_again():
+    breaker = CircuitBreaker(threshold=5, reset_timeout=60)
+    for _ in range(5):
+        breaker.failure(now=0)
+    assert breaker.allow(now=60)
+    assert breaker.failure(now=61)
+    assert breaker.state == CircuitBreaker.open
+    assert not breaker.allow(now=100)
+    assert breaker.allow(now=121)
@@ -0,0 +1,96 @@
+import json
+import pytest
+from mounter.config import MountsConfig, ConfigError
+from mounter.__main__ import read_supervise_config
+
+
+def write_config(tmp_path, content, name='mounts.json'):
+    path = tmp_path / name
+    if name.endswith('.json'):
+        path.write_text(json.dumps(content))
+    else:
+        path.write_text(content)
+    return str(path)
+
+
+def mount(**values):
+    result = {'username': 'user', 'servername': 'remote-server.com', 'remote_path': '/data', 'local_path': '/mnt/data'}
+    result.update(values)
+    return result
+
+
+def test_json_mounts_get_defaults(tmp_path):
+    config = MountsConfig(write_config(tmp_path, {'period': 30, 'defaults': {'profile': 'wan'}, 'mounts': [mount()]}))
+    assert config.period == 30
+    assert len(config.mounts) == 1
+    args = config.mounts[0]
+    assert args.servername == 'remote-server.com'
+    assert args.profile == 'wan'
+    assert args.ssh_key_path == '~/.ssh/id_rsa'
+    assert args.replicas == []
+
+
+def test_toml_mounts(tmp_path):
+    path = write_config(tmp_path, '''
+period = 15
+
+[[mount]]
+username = "user"
+servername = "remote-server.com"
+remote_path = "/data"
+local_path = "/mnt/data"
+sshfs_options = ["max_conns=8"]
+''', name='mounts.toml')
+    config = MountsConfig(path, default_period=60)
+    assert config.period == 15
+    assert config.mounts[0].sshfs_options == ['max_conns=8']
+
+
+def test_default_period(tmp_path):
+    assert MountsConfig(write_config(tmp_path, {'mounts': [mount()]}), default_period=45).period == 45
+
+
+def test_missing_keys(tmp_path):
+    with pytest.raises(ConfigError, match='missing required keys: servername'):
+        MountsConfig(write_config(tmp_path, {'mounts': [mount(servername='')]}))
+
+
+def test_no_mounts(tmp_path):
+    with pytest.raises(ConfigError, match='does not contain'):
+        MountsConfig(write_config(tmp_path, {'period': 30}))
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(ConfigError, match='does not exist'):
+        MountsConfig(str(tmp_path / 'missing.json'))
+
+
+def test_invalid_toml(tmp_path):
+    with pytest.raises(ConfigError, match='not valid TOML'):
+        MountsConfig(write_config(tmp_path, '[[mount]\n', name='mounts.toml'))
+
+
+def test_valid_supervise_config(tmp_path):
+    config = read_supervise_config(write_config(tmp_path, {'mounts': [mount(), mount(local_path='/mnt/other')]}), 60)
+    assert [args.local_path for args in config.mounts] == ['/mnt/data', '/mnt/other']
+
+
+@pytest.mark.parametrize('values', [
+    {'username': 'user;reboot'},
+    {'servername': 'bad host'},
+    {'remote_path': '/data $(id)'},
+    {'ssh_key_path': '~/.ssh/id rsa'},
+    {'period': 0},
+    {'profile': 'unknown'},
+    {'sshfs_options': ['ok', 'bad option']},
+    {'replicas': ['replica.remote-server.com:0']},
+])
+def test_invalid_mount(tmp_path, values):
+    with pytest.raises(ConfigError, match='Invalid mount'):
+        read_supervise_config(write_config(tmp_path, {'mounts': [mount(**values)]}), 60)
+
+
+def test_duplicate_local_path(tmp_path):
+    path = write_config(tmp_path, {'mounts': [mount(), mount(servername='other-server.com', local_path='/mnt/data/')]})
+    with pytest.raises(ConfigError, match='same local path: /mnt/data'):
+        read_supervise_config(path, 60)
@@ -0,0 +1,60 @@
+import os
+import queue
+import pytest
+from mounter.control import ControlServer, socket_name
+
+
+@pytest.fixture
+def control():
+    server = object.__new__(ControlServer)
+    server._status = lambda: {'mounts': [{'local_path': '/mnt/data'}, {'local_path': '/mnt/other/'}, {'local_path': '~/mnt'}]}
+    server._commands = {'remount': lambda request: {}, 'unmount': lambda request: {}}
+    server._queue = queue.Queue()
+    server._wake_read, server._wake_write = os.pipe()
+    yield server
+    os.close(server._wake_read)
+    os.close(server._wake_write)
+
+
+def test_socket_name_unambiguous():
+    assert socket_name('/mnt/a-b') != socket_name('/mnt/a/b')
+    assert socket_name('/mnt/data').startswith('mnt-data-')
+    assert socket_name('/mnt/data').endswith('.sock')
+
+
+def test_status(control):
+    answer = control._handle({'command': 'status'})
+    assert answer['ok']
+    assert answer['pid'] == os.getpid()
+    assert len(answer['mounts']) == 3
+
+
+def test_default_command_is_status(control):
+    assert control._handle({})['ok']
+
+
+def test_not_object(control):
+    assert control._handle(['status']) == {'ok': False, 'error': 'request must be JSON object'}
+
+
+def test_unknown_command(control):
+    answer = control._handle({'command': 'restart'})
+    assert not answer['ok']
+    assert 'status, remount, unmount' in answer['error']
+
+
+def test_command_queued(control):
+    assert control._handle({'command': 'remount', 'local_path': '/mnt/other'}) == {'ok': True, 'queued': 'remount'}
+    assert control._queue.get_nowait()['local_path'] == '/mnt/other'
+    assert os.read(control._wake_read, 1) == b'x'
+
+
+def test_unmanaged_path(control):
+    answer = control._handle({'command': 'unmount', 'local_path': '/mnt/foreign'})
+    assert answer['managed'] is False
+    assert control._queue.empty()
+
+
+def test_config_path_normalized(control):
+    answer = control._handle({'command': 'remount', 'local_path': os.path.expanduser('~/mnt/')})
+    assert answer == {'ok': True, 'queued': 'remount'}
@@ -0,0 +1,29 @@
+import argparse
+import logging
+from mounter.foreground import ForegroundSupervisor
+
+
+def failing_sshfs(tmp_path):
+    script = tmp_path / 'sshfs'
+    script.write_text('#!/bin/sh\necho boom >&2\nexit 3\n')
+    script.chmod(0o755)
+    return str(script)
+
+
+def test_stderr_tail_of_exited_child(tmp_path, caplog):
+    script = failing_sshfs(tmp_path)
+    args = argparse.Namespace(username='user', servername='server.com', remote_path='/data',
+                              local_path=str(tmp_path / 'mnt'))
+    supervisor = ForegroundSupervisor([args], lambda args: script, lambda args, exit_on_err: False,
+                                      lambda local_path, lazy: True, period=0.1)
+    mount = supervisor.mounts[0]
+    for _ in range(2):
+        caplog.clear()
+        with caplog.at_level(logging.ERROR):
+            assert supervisor.start(mount)
+            mount.process.wait()
+            supervisor._reap(mount)
+        assert mount.exit_code == 3
+        assert list(mount.stderr_tail) == ['boom']
+        assert any('last errors: boom' in message for message in caplog.messages)
+        assert supervisor.status()[0]['stderr_tail'] == ['boom']
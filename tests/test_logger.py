@@ -0,0 +1,88 @@
+import argparse
+import logging
+import pytest
+from mounter import logger as logger_module
+from mounter.logger import RepeatFilter
+from mounter.__main__ import log_rotate_when
+
+
+def record(message, level=logging.ERROR, args=()):
+    return logging.LogRecord('test', level, __file__, 1, message, args, None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(logger_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_repeated_error_suppressed(clock):
+    repeat_filter = RepeatFilter(interval=60)
+    assert repeat_filter.filter(record('Mount /mnt/data failed'))
+    assert not repeat_filter.filter(record('Mount /mnt/data failed'))
+    assert repeat_filter.filter(record('Mount /mnt/other failed'))
+
+
+def test_numbers_ignored(clock):
+    repeat_filter = RepeatFilter(interval=60)
+    assert repeat_filter.filter(record('Retry after 12.3 seconds'))
+    assert not repeat_filter.filter(record('Retry after 20 seconds'))
+
+
+def test_different_mounts_not_merged(clock):
+    repeat_filter = RepeatFilter(interval=60)
+    assert repeat_filter.filter(record('Not mounted user@10.0.0.1:/data to /mnt/backup1'))
+    assert repeat_filter.filter(record('Not mounted user@10.0.0.2:/data to /mnt/backup2'))
+    assert repeat_filter.filter(record('Retry user@10.0.0.2:/data at /mnt/backup2 after 5.2 seconds'))
+    assert not repeat_filter.filter(record('Retry user@10.0.0.2:/data at /mnt/backup2 after 9.8 seconds'))
+    assert repeat_filter.filter(record('Retry user@10.0.0.1:/data at /mnt/backup1 after 9.8 seconds'))
+
+
+def test_template_is_compared(clock):
+    repeat_filter = RepeatFilter(interval=60)
+    assert repeat_filter.filter(record('Mount %s failed', args=('/mnt/data',)))
+    assert not repeat_filter.filter(record('Mount %s failed', args=('/mnt/other',)))
+
+
+def test_count_reported_after_interval(clock):
+    repeat_filter = RepeatFilter(interval=60)
+    repeat_filter.filter(record('Server down'))
+    for _ in range(3):
+        assert not repeat_filter.filter(record('Server down'))
+    clock[0] += 61
+    message = record('Server down')
+    assert repeat_filter.filter(message)
+    assert message.getMessage() == 'Server down (repeated 3 times in 60 seconds)'
+
+
+def test_info_not_filtered(clock):
+    repeat_filter = RepeatFilter(interval=60)
+    assert repeat_filter.filter(record('Mounted', level=logging.INFO))
+    assert repeat_filter.filter(record('Mounted', level=logging.INFO))
+
+
+def test_zero_interval_disables(clock):
+    repeat_filter = RepeatFilter(interval=0)
+    assert repeat_filter.filter(record('Server down'))
+    assert repeat_filter.filter(record('Server down'))
+
+
+def test_max_keys_drops_old_messages(clock):
+    repeat_filter = RepeatFilter(interval=60, max_keys=2)
+    repeat_filter.filter(record('first'))
+    clock[0] += 61
+    repeat_filter.filter(record('second'))
+    repeat_filter.filter(record('third'))
+    assert len(repeat_filter._seen) == 2
+
+
+@pytest.mark.parametrize('value', ['midnight', 'H', 'd', 'W0', 'w6'])
+def test_valid_log_rotate(value):
+    assert log_rotate_when(value) == value
+
+
+@pytest.mark.parametrize('value', ['hourly', 'W7', '', 'H1'])
+def test_invalid_log_rotate(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        log_rotate_when(value)
@@ -0,0 +1,36 @@
+import pytest
+from mounter.metrics import Metrics
+
+
+def test_render_labels_escaped():
+    metrics = Metrics()
+    metrics.set('ssh_mounter_mount_up', 1, {'local_path': '/mnt/"data"'})
+    assert 'ssh_mounter_mount_up{local_path="/mnt/\\"data\\""} 1' in metrics.render()
+
+
+def test_unknown_metric():
+    with pytest.raises(KeyError):
+        Metrics().inc('ssh_mounter_unknown_total')
+
+
+def test_histogram():
+    metrics = Metrics(buckets=(0.1, 1))
+    metrics.observe('ssh_mounter_command_duration_seconds', 0.5, {'command': 'ssh'})
+    text = metrics.render()
+    assert 'ssh_mounter_command_duration_seconds_bucket{command="ssh",le="0.1"} 0' in text
+    assert 'ssh_mounter_command_duration_seconds_bucket{command="ssh",le="1"} 1' in text
+    assert 'ssh_mounter_command_duration_seconds_count{command="ssh"} 1' in text
+
+
+def test_forget_removed_mount():
+    metrics = Metrics()
+    for local_path in ('/mnt/a', '/mnt/b'):
+        labels = {'local_path': local_path, 'remote': 'user@server.com:/data'}
+        metrics.set('ssh_mounter_mount_up', 1, labels)
+        metrics.inc('ssh_mounter_remounts_total', labels)
+    metrics.observe('ssh_mounter_command_duration_seconds', 0.5, {'command': 'ssh'})
+    metrics.forget({'local_path': '/mnt/a'})
+    text = metrics.render()
+    assert '/mnt/a' not in text
+    assert 'ssh_mounter_mount_up{local_path="/mnt/b"' in text
+    assert 'command="ssh"' in text
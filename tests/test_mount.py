@@ -0,0 +1,39 @@
+import argparse
+from mounter import __main__ as main_module
+
+
+class FakeRunner():
+    def __init__(self, return_code=0):
+        self.return_code = return_code
+        self.calls = []
+
+    def run(self, command, timeout=None, **kwargs):
+        self.calls.append((command, timeout))
+        return self.return_code
+
+
+def mount_args():
+    return argparse.Namespace(username='user', servername='server.com', remote_path='/data', local_path='/mnt/data',
+                              ssh_key_path='', profile='default', sshfs_options=[])
+
+
+def test_service_mount_has_timeout(monkeypatch):
+    runner = FakeRunner()
+    monkeypatch.setattr(main_module, 'runner', runner)
+    monkeypatch.setattr(main_module, 'precheck', None)
+    assert main_module.mount_sshfs(mount_args(), exit_on_err=False)
+    assert runner.calls == [('sshfs user@server.com:/data /mnt/data', main_module.default_command_timeout)]
+
+
+def test_interactive_mount_waits(monkeypatch):
+    runner = FakeRunner()
+    monkeypatch.setattr(main_module, 'runner', runner)
+    monkeypatch.setattr(main_module, 'precheck', None)
+    assert main_module.mount_sshfs(mount_args())
+    assert runner.calls[0][1] is None
+
+
+def test_failed_service_mount(monkeypatch):
+    monkeypatch.setattr(main_module, 'runner', FakeRunner(return_code=1))
+    monkeypatch.setattr(main_module, 'precheck', None)
+    assert not main_module.mount_sshfs(mount_args(), exit_on_err=False)
@@ -0,0 +1,78 @@
+import argparse
+import socket
+from mounter import precheck as precheck_module
+from mounter.precheck import DnsCache, TcpPrecheck
+
+
+def closed_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def test_open_port():
+    with socket.socket() as server:
+        server.bind(('127.0.0.1', 0))
+        server.listen()
+        port = server.getsockname()[1]
+        precheck = TcpPrecheck(destination=lambda servername, port_option: ('127.0.0.1', port))
+        assert precheck.check('server.com') == (True, '')
+        assert precheck.connect_time('server.com') is not None
+
+
+def test_closed_port():
+    port = closed_port()
+    precheck = TcpPrecheck(destination=lambda servername, port_option: ('127.0.0.1', port))
+    reachable, reason = precheck.check('server.com')
+    assert not reachable
+    assert f'port {port}' in reason
+    assert precheck.connect_time('server.com') is None
+
+
+def test_port_option_passed_to_destination():
+    asked = []
+    precheck = TcpPrecheck(destination=lambda servername, port: asked.append((servername, port)) or None)
+    precheck.check('server.com', 2222)
+    precheck.check('server.com', 2222)
+    assert asked == [('server.com', 2222)]
+
+
+def test_destination_kept_without_dns_cache():
+    asked = []
+    precheck = TcpPrecheck(dns_cache=DnsCache(ttl=0), destination=lambda servername, port: asked.append(servername))
+    for _ in range(3):
+        precheck.check('server.com')
+    assert asked == ['server.com']
+    precheck.forget_destinations()
+    precheck.check('server.com')
+    assert asked == ['server.com', 'server.com']
+
+
+def test_proxied_server_not_checked():
+    precheck = TcpPrecheck(destination=lambda servername, port: None)
+    assert precheck.check('jump-host') == (True, '')
+    assert precheck.connect_time('jump-host') == float('inf')
+
+
+def test_dns_cache_keeps_addresses_when_resolver_fails(monkeypatch):
+    answers = [[(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', 22))]]
+
+    def getaddrinfo(*args, **kwargs):
+        if not answers:
+            raise socket.gaierror('resolver not reachable')
+        return answers.pop()
+
+    monkeypatch.setattr(precheck_module.socket, 'getaddrinfo', getaddrinfo)
+    cache = DnsCache(ttl=60)
+    assert cache.resolve('server.com') == [(socket.AF_INET, ('192.0.2.1', 22))]
+    cache.expire()
+    assert cache.resolve('server.com') == [(socket.AF_INET, ('192.0.2.1', 22))]
+    cache.forget('server.com')
+    assert cache.resolve('server.com') == []
+
+
+def test_precheck_server_without_init(monkeypatch):
+    from mounter import __main__ as main_module
+    monkeypatch.setattr(main_module, 'precheck', None)
+    args = argparse.Namespace(servername='server.com', profile='default', sshfs_options=[])
+    assert main_module.precheck_server(args)
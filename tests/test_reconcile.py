@@ -0,0 +1,92 @@
+import argparse
+from mounter.reconcile import Action, Reconciler, unit_local_path
+
+
+class FakeMountTable():
+    def __init__(self, mounts: dict) -> None:
+        # mount point -> (device, fs_type)
+        self._mounts = mounts
+
+    def get(self, local_path):
+        mount = self._mounts.get(local_path)
+        return mount[0] if mount else None
+
+    def mounts_of_type(self, fs_type):
+        return {local_path: device for local_path, (device, mount_type) in self._mounts.items() if mount_type == fs_type}
+
+
+def mount(local_path, servername='server.com', remote_path='/data', replicas=None):
+    return argparse.Namespace(username='user', servername=servername, remote_path=remote_path,
+                              local_path=local_path, replicas=replicas or [])
+
+
+def unit(local_path):
+    return f'[Service]\nExecStart=/usr/bin/ssh-mounter -u user -s server.com -r /data -m {local_path} -p 60\n'
+
+
+def plan(mounts, desired, **kwargs):
+    return [(action.kind, action.target) for action in Reconciler(FakeMountTable(mounts)).plan(desired, **kwargs)]
+
+
+def test_mount_missing_paths():
+    assert plan({}, [mount('/mnt/a'), mount('/mnt/b')]) == [(Action.mount, '/mnt/a'), (Action.mount, '/mnt/b')]
+
+
+def test_mounted_path_kept():
+    assert plan({'/mnt/a': ('user@server.com:/data', 'fuse.sshfs')}, [mount('/mnt/a')]) == []
+
+
+def test_mounted_replica_kept():
+    mounts = {'/mnt/a': ('user@replica.com:/data', 'fuse.sshfs')}
+    assert plan(mounts, [mount('/mnt/a', replicas=['replica.com:2'])]) == []
+
+
+def test_other_device_unmounted_before_mount():
+    mounts = {'/mnt/a': ('user@old.com:/data', 'fuse.sshfs')}
+    assert plan(mounts, [mount('/mnt/a')]) == [(Action.unmount, '/mnt/a'), (Action.mount, '/mnt/a')]
+
+
+def test_foreign_mount_conflict():
+    mounts = {'/mnt/a': ('/dev/sdb1', 'ext4')}
+    assert plan(mounts, [mount('/mnt/a')]) == [(Action.conflict, '/mnt/a')]
+
+
+def test_units_replace_mount_actions():
+    actions = plan({}, [mount('/mnt/a')], desired_units={'a.service': unit('/mnt/a')}, current_units={})
+    assert actions == [(Action.install_unit, 'a.service')]
+
+
+def test_unchanged_unit_skipped():
+    units = {'a.service': unit('/mnt/a')}
+    assert plan({}, [mount('/mnt/a')], desired_units=units, current_units=dict(units)) == []
+
+
+def test_removed_unit_stopped_before_unmount():
+    mounts = {'/mnt/old': ('user@server.com:/data', 'fuse.sshfs'), '/mnt/b': ('user@other.com:/data', 'fuse.sshfs')}
+    actions = plan(mounts, [mount('/mnt/a'), mount('/mnt/b')],
+                   desired_units={'a.service': unit('/mnt/a'), 'b.service': unit('/mnt/b')},
+                   current_units={'old.service': unit('/mnt/old'), 'b.service': unit('/mnt/b')})
+    assert actions == [
+        (Action.remove_unit, 'old.service'),
+        (Action.unmount, '/mnt/b'),
+        (Action.unmount, '/mnt/old'),
+        (Action.install_unit, 'a.service'),
+    ]
+
+
+def test_conflicts_first():
+    mounts = {'/mnt/a': ('user@old.com:/data', 'fuse.sshfs'), '/mnt/b': ('/dev/sdb1', 'ext4')}
+    actions = plan(mounts, [mount('/mnt/a'), mount('/mnt/b')])
+    assert actions[0] == (Action.conflict, '/mnt/b')
+    assert actions[1:] == [(Action.unmount, '/mnt/a'), (Action.mount, '/mnt/a')]
+
+
+def test_prune_unmounts_only_sshfs_mounts():
+    mounts = {'/mnt/extra': ('user@server.com:/x', 'fuse.sshfs'), '/home': ('/dev/sda2', 'ext4')}
+    assert plan(mounts, [], prune=True) == [(Action.unmount, '/mnt/extra')]
+    assert plan(mounts, []) == []
+
+
+def test_unit_local_path():
+    assert unit_local_path(unit('/mnt/a')) == '/mnt/a'
+    assert unit_local_path('[Service]\nExecStart=/usr/bin/true\n') is None
@@ -0,0 +1,116 @@
+import argparse
+import pytest
+from mounter.precheck import TcpPrecheck
+from mounter.replicas import (ReplicaSelector, parse_replica, replica_servers, remote_devices, set_active_replica,
+                              main_servername)
+
+
+class FakePrecheck():
+    def __init__(self, rtts: dict) -> None:
+        # servername -> handshake seconds, None if server is down
+        self.rtts = rtts
+
+    def connect_time(self, servername):
+        return self.rtts.get(servername)
+
+
+def mount(**values):
+    args = argparse.Namespace(username='user', servername='main.com', remote_path='/data', local_path='/mnt/data',
+                              replicas=['replica.com', 'far.com:2'])
+    vars(args).update(values)
+    return args
+
+
+def selector(rtts, policy='rtt', hysteresis=300):
+    return ReplicaSelector([('main.com', 1.0), ('replica.com', 1.0), ('far.com', 2.0)], policy, hysteresis,
+                           precheck=FakePrecheck(rtts))
+
+
+def test_parse_replica():
+    assert parse_replica('replica.com') == ('replica.com', 1.0)
+    assert parse_replica('replica.com:2.5') == ('replica.com', 2.5)
+    with pytest.raises(ValueError):
+        parse_replica('replica.com:0')
+    with pytest.raises(ValueError):
+        parse_replica('replica.com:fast')
+
+
+def test_replica_servers():
+    args = mount(replicas=['replica.com', 'main.com:3', 'replica.com:2'])
+    assert replica_servers(args) == [('main.com', 3.0), ('replica.com', 1.0)]
+
+
+def test_active_replica_keeps_main_server():
+    args = mount()
+    set_active_replica(args, 'replica.com')
+    assert args.servername == 'replica.com'
+    assert main_servername(args) == 'main.com'
+    assert replica_servers(args)[0] == ('main.com', 1.0)
+    assert remote_devices(args)['user@far.com:/data'] == 'far.com'
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError, match='Unknown replica policy'):
+        selector({}, policy='random')
+
+
+def test_rtt_policy_uses_weight():
+    assert selector({'main.com': 0.05, 'replica.com': 0.04, 'far.com': 0.06}).choose() == 'far.com'
+
+
+def test_order_policy():
+    assert selector({'main.com': 0.05, 'replica.com': 0.01}, policy='order').choose() == 'main.com'
+    assert selector({'main.com': None, 'replica.com': 0.01}, policy='order').choose() == 'replica.com'
+
+
+def test_all_down():
+    assert selector({}).choose() is None
+    assert selector({}).choose('main.com') == 'main.com'
+
+
+def test_fail_over_at_once():
+    replicas = selector({'main.com': None, 'replica.com': 0.05, 'far.com': 0.2})
+    assert replicas.choose('main.com', now=0) == 'replica.com'
+
+
+def test_alive_mount_kept_without_handshake():
+    replicas = selector({'main.com': None, 'replica.com': 0.05})
+    assert replicas.choose('main.com', active_alive=True, now=0) == 'main.com'
+
+
+def test_failed_server_skipped():
+    replicas = selector({'main.com': 0.01, 'replica.com': 0.05})
+    replicas.failure('main.com', now=0)
+    assert replicas.choose(now=10) == 'replica.com'
+    assert replicas.choose(now=301) == 'main.com'
+
+
+def test_move_back_after_hysteresis():
+    replicas = selector({'main.com': 0.01, 'replica.com': 0.05})
+    assert replicas.choose('replica.com', now=0) == 'replica.com'
+    assert replicas.choose('replica.com', now=200) == 'replica.com'
+    assert replicas.choose('replica.com', now=300) == 'main.com'
+
+
+def test_small_difference_kept():
+    replicas = selector({'main.com': 0.045, 'replica.com': 0.05})
+    assert replicas.choose('replica.com', now=0) == 'replica.com'
+    assert replicas.choose('replica.com', now=1000) == 'replica.com'
+
+
+def test_failback_rate_limited():
+    replicas = selector({'main.com': 0.01})
+    assert replicas.failback_due(now=0)
+    replicas.choose('main.com', active_alive=True)
+    measured_at = replicas.measured_at
+    assert not replicas.failback_due(now=measured_at + 299)
+    assert replicas.failback_due(now=measured_at + 301)
+
+
+def test_disabled_precheck_keeps_order():
+    precheck = TcpPrecheck(timeout=0)
+    assert precheck.check('main.com') == (True, '')
+    replicas = ReplicaSelector([('main.com', 1.0), ('replica.com', 2.0)], precheck=precheck)
+    assert replicas.choose() == 'main.com'
+    assert replicas.choose('replica.com', now=0) == 'replica.com'
+    assert replicas.choose('replica.com', now=1000) == 'replica.com'
@@ -0,0 +1,93 @@
+import pytest
+from mounter.sytemd_service_installer import ServiceInstaller
+
+
+class FakeRunner():
+    def __init__(self, failed=()):
+        # commands starting with any of failed prefixes return 1
+        self.failed = failed
+        self.calls = []
+
+    def run(self, command, **kwargs):
+        self.calls.append(command)
+        return 1 if command.startswith(tuple(self.failed)) else 0
+
+
+@pytest.fixture
+def units_dir(tmp_path):
+    (tmp_path / 'old.service').write_text('[Service]\nExecStart=/bin/old\n[Install]\n')
+    (tmp_path / 'same.service').write_text('[Service]\nExecStart=/bin/same\n[Install]\n')
+    return tmp_path
+
+
+def installer(units_dir, runner):
+    return ServiceInstaller(quiet_mode=True, external_runner=runner, units_dir=str(units_dir))
+
+
+def test_unchanged_units_skipped(units_dir):
+    runner = FakeRunner()
+    units = {'same.service': (units_dir / 'same.service').read_text()}
+    assert installer(units_dir, runner).install_many(units)
+    assert runner.calls == []
+
+
+def test_install_many_single_reload(units_dir):
+    runner = FakeRunner()
+    units = {
+        'a.service': '[Service]\nExecStart=/bin/a\n[Install]\n',
+        'b.service': '[Service]\nExecStart=/bin/b\n[Install]\n',
+        'old.service': '[Service]\nExecStart=/bin/new\n[Install]\n',
+        'same.service': (units_dir / 'same.service').read_text(),
+    }
+    assert installer(units_dir, runner).install_many(units)
+    assert runner.calls == [
+        'systemctl daemon-reload',
+        'systemctl enable --now a.service b.service',
+        'systemctl enable old.service',
+        'systemctl try-restart old.service',
+    ]
+    assert (units_dir / 'a.service').exists()
+    assert (units_dir / 'old.service').read_text() == units['old.service']
+
+
+def test_failed_start_rolled_back(units_dir):
+    runner = FakeRunner(failed=['systemctl enable --now'])
+    units = {'a.service': '[Service]\nExecStart=/bin/a\n[Install]\n',
+             'old.service': '[Service]\nExecStart=/bin/new\n[Install]\n'}
+    assert not installer(units_dir, runner).install_many(units)
+    assert not (units_dir / 'a.service').exists()
+    assert (units_dir / 'old.service').read_text() == '[Service]\nExecStart=/bin/old\n[Install]\n'
+    assert runner.calls == [
+        'systemctl daemon-reload',
+        'systemctl enable --now a.service',
+        'systemctl disable --now a.service',
+        'systemctl daemon-reload',
+    ]
+
+
+def test_failed_reload_rolled_back(units_dir):
+    runner = FakeRunner(failed=['systemctl daemon-reload'])
+    assert not installer(units_dir, runner).install_many({'a.service': '[Service]\n'})
+    assert not (units_dir / 'a.service').exists()
+    assert runner.calls == ['systemctl daemon-reload', 'systemctl daemon-reload']
+
+
+def test_remove_many(units_dir):
+    runner = FakeRunner()
+    assert installer(units_dir, runner).remove_many(['old.service', 'missing.service'])
+    assert not (units_dir / 'old.service').exists()
+    assert (units_dir / 'same.service').exists()
+    assert runner.calls == ['systemctl disable --now old.service', 'systemctl daemon-reload']
+
+
+def test_remove_many_keeps_files_when_disable_failed(units_dir):
+    runner = FakeRunner(failed=['systemctl disable'])
+    assert not installer(units_dir, runner).remove_many(['old.service'])
+    assert (units_dir / 'old.service').exists()
+    assert runner.calls == ['systemctl disable --now old.service']
+
+
+def test_nothing_to_remove(units_dir):
+    runner = FakeRunner()
+    assert installer(units_dir, runner).remove_many(['missing.service'])
+    assert runner.calls == []
@@ -0,0 +1,38 @@
+import pytest
+from mounter import sshfs_options
+
+
+@pytest.mark.parametrize('option', ['allow_other', 'max_conns=8', 'Ciphers=aes128-gcm@openssh.com', 'IdentityFile=/home/user/.ssh/id_rsa'])
+def test_valid_option(option):
+    assert sshfs_options.validate_option(option)
+
+
+@pytest.mark.parametrize('option', ['', 'a b', 'x;reboot', 'ProxyCommand=$(id)', "a'b", None])
+def test_invalid_option(option):
+    assert not sshfs_options.validate_option(option)
+
+
+def test_option_name():
+    assert sshfs_options.option_name('max_conns=8') == 'max_conns'
+    assert sshfs_options.option_name('allow_other') == 'allow_other'
+
+
+def test_profile_options():
+    assert sshfs_options.build_options('default') == []
+    assert 'max_conns=4' in sshfs_options.build_options('throughput')
+
+
+def test_raw_option_overrides_profile():
+    options = sshfs_options.build_options('throughput', ['max_conns=8', 'allow_other'])
+    assert 'max_conns=4' not in options
+    assert options[-2:] == ['max_conns=8', 'allow_other']
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError, match='Unknown sshfs profile'):
+        sshfs_options.build_options('fastest')
+
+
+def test_option_value():
+    assert sshfs_options.option_value(['Port=22', 'allow_other', 'port=2222'], 'port') == '2222'
+    assert sshfs_options.option_value(['allow_other'], 'port') is None
@@ -0,0 +1,64 @@
+import argparse
+import os
+import threading
+import time
+from mounter.prober import ProbeResult
+from mounter.supervisor import Supervisor
+
+
+def mounts(count):
+    return [argparse.Namespace(username='user', servername='server.com', remote_path='/data', local_path=f'/mnt/data{index}')
+            for index in range(count)]
+
+
+class SlowProber():
+    def __init__(self, delay: float, ok: bool = True) -> None:
+        self.delay = delay
+        self.ok = ok
+        self.probed = []
+        self._lock = threading.Lock()
+
+    def probe(self, local_path):
+        time.sleep(self.delay)
+        with self._lock:
+            self.probed.append(local_path)
+        return ProbeResult(ProbeResult.alive if self.ok else ProbeResult.timeout, self.delay)
+
+    def forget(self, local_path, latencies=False):
+        pass
+
+    def latency(self, local_path):
+        return None
+
+
+def supervisor(count, period=60):
+    return Supervisor(mounts(count), lambda args, exit_on_err: True, lambda args, exit_on_err: True,
+                      lambda local_path, lazy: True, period=period, watch_network=False)
+
+
+def test_due_probes_run_at_the_same_time():
+    watcher = supervisor(10)
+    watcher.prober = SlowProber(0.2, ok=False)
+    started = time.monotonic()
+    watcher.check_all()
+    assert time.monotonic() - started < 1
+    assert len(watcher.prober.probed) == 10
+
+
+def test_mount_probed_once_per_period():
+    watcher = supervisor(3, period=0.3)
+    watcher.prober = SlowProber(0)
+    watcher.check_all()
+    watcher.check_all()
+    assert len(watcher.prober.probed) == 3
+    assert [mount['state'] for mount in watcher.status()['mounts']] == ['mounted'] * 3
+    time.sleep(0.3)
+    watcher.check_all()
+    assert len(watcher.prober.probed) == 6
+
+
+def test_find_normalizes_paths():
+    watcher = Supervisor([argparse.Namespace(username='user', servername='server.com', remote_path='/data',
+                                             local_path='~/mnt')],
+                         lambda args, exit_on_err: False, lambda args, exit_on_err: True, watch_network=False)
+    assert watcher._find({'local_path': os.path.expanduser('~/mnt')})[0].local_path == '~/mnt'
@@ -0,0 +1,34 @@
+import time
+from mounter.system_runner import Runner
+
+
+def test_output_and_input():
+    output = []
+    assert Runner().run('cat', silent=True, input='secret\n', output=output) == 0
+    assert output == ['secret']
+
+
+def test_timeout_kills_command():
+    started = time.monotonic()
+    assert Runner().run('sleep 5', silent=True, timeout=0.2) != 0
+    assert time.monotonic() - started < 2
+
+
+def running(pid):
+    # killed child can stay zombie until init reaps it
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def test_timeout_kills_process_group(tmp_path):
+    pid_path = tmp_path / 'pid'
+    # shell waits for background child, so only killing whole group stops the child
+    Runner().run(f'sleep 30 & echo $! > {pid_path}; wait', silent=True, timeout=0.5)
+    child = int(pid_path.read_text())
+    deadline = time.monotonic() + 2
+    while running(child) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not running(child)
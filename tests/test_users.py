@@ -0,0 +1,56 @@
+import os
+import subprocess
+import pytest
+from mounter.users import RemoteUser, parse_results, provision_script, result_marker
+
+
+@pytest.fixture
+def fake_bin(tmp_path):
+    # alice exists, useradd fails for bob, chpasswd saves its input
+    scripts = {
+        'id': '[ "$1" = alice ]',
+        'useradd': '[ "$2" != bob ]',
+        'chpasswd': f'cat > {tmp_path}/passwords; exit ${{CHPASSWD_CODE:-0}}',
+    }
+    for name, body in scripts.items():
+        path = tmp_path / name
+        path.write_text(f'#!/bin/sh\n{body}\n')
+        path.chmod(0o755)
+    return tmp_path
+
+
+def provision(fake_bin, users, chpasswd_code=0):
+    env = dict(os.environ, PATH=f'{fake_bin}:{os.environ["PATH"]}', CHPASSWD_CODE=str(chpasswd_code))
+    result = subprocess.run(['sh', '-s'], input=provision_script(users), env=env, capture_output=True, text=True,
+                            check=True)
+    return parse_results(result.stdout.splitlines(), users)
+
+
+def users():
+    return [RemoteUser('alice', 'pass-a'), RemoteUser('bob', 'pass-b'), RemoteUser('carol', 'pass:c $x')]
+
+
+def test_provision(fake_bin):
+    assert provision(fake_bin, users()) == {'alice': 'exists', 'bob': 'failed', 'carol': 'created'}
+    # only created users get password, special characters kept
+    assert (fake_bin / 'passwords').read_text() == 'carol:pass:c $x\n'
+
+
+def test_password_failed(fake_bin):
+    assert provision(fake_bin, users(), chpasswd_code=1)['carol'] == 'password-failed'
+
+
+def test_nothing_created(fake_bin):
+    assert provision(fake_bin, [RemoteUser('alice', 'pass-a')]) == {'alice': 'exists'}
+    assert not (fake_bin / 'passwords').exists()
+
+
+def test_sudo():
+    assert "SUDO='sudo -n'" in provision_script(users(), sudo=True)
+    assert "SUDO=''" in provision_script(users())
+
+
+def test_parse_results():
+    lines = [f'{result_marker} alice created', 'useradd: warning', f'{result_marker} mallory created',
+             f'{result_marker} bob']
+    assert parse_results(lines, users()) == {'alice': 'created', 'bob': 'unknown', 'carol': 'unknown'}